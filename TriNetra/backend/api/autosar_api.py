@@ -1,31 +1,37 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
 from datetime import datetime, timedelta
-import sqlite3
 import sys
 import os
-import random
-import json
 import re
+import json
+import time
+import argparse
+import math
+import sqlite3
 import numpy as np
+import pandas as pd
 
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
 from config import Config
+from utils.db_pool import get_pool
+from utils.response_cache import cached_response
+from utils.job_queue import get_job_queue, QueueFullError
+from utils.time_utils import from_epoch
+from models.transaction_batch import TransactionBatch, REQUIRED_FIELDS, OPTIONAL_FIELDS
+from models.sar_aggregate import SARAggregate, HIGH_RISK_COUNTRIES, ML_HIGH_RISK_COUNTRIES
+from data.enrichment import ENRICHMENT_SELECT, ENRICHMENT_JOIN, COUNTRY_RISK_LEVELS, fill_missing_enrichment, attach_enrichment
+from data.heatmap import HEATMAP_ZOOM_LEVELS, DEFAULT_HEATMAP_ZOOM, ALL_SCENARIOS, query_heatmap_cells
+from data.flows import query_flow_matrix
 
 autosar_bp = Blueprint('autosar', __name__)
 
-base_dir = os.path.dirname(__file__)
-with open(os.path.join(base_dir, "../data/simplemap.json"), "r", encoding="utf-8") as f:
-    india_cities = json.load(f)
+# Transactions returned alongside a SAR report (the report itself covers all of them)
+DEFAULT_SAR_TRANSACTION_LIMIT = 50
+
+# Scenarios/account groups accepted by one /generate/batch call
+MAX_SAR_BATCH_SIZE = 200
 
-def random_india_location():
-    """Pick a random city from the simplemap JSON"""
-    city = random.choice(india_cities)
-    return {
-        "lat": float(city["lat"]),
-        "lon": float(city["lng"]),
-        "city": city["city"]
-    }
 class AutoSARGenerator:
     """Enhanced Automated Suspicious Activity Report Generator with ML-powered analysis"""
     
@@ -100,19 +106,28 @@ class AutoSARGenerator:
     
     def generate_sar_report(self, pattern_data, transactions):
         """Generate enhanced SAR report with ML-powered analysis"""
+        return self.build_sar_report(pattern_data, SARAggregate().update(TransactionBatch(transactions)))
+    
+    def generate_sar_report_from_batches(self, pattern_data, batches):
+        """Generate a SAR report from TransactionBatch chunks in ts_epoch order"""
+        aggregate = SARAggregate()
+        for batch in batches:
+            aggregate.update(batch)
+        return self.build_sar_report(pattern_data, aggregate)
+    
+    def build_sar_report(self, pattern_data, agg):
+        """Assemble the SAR report from merged SARAggregate statistics"""
         pattern_type = pattern_data.get('scenario', 'unknown')
         template = self.templates.get(pattern_type, self.templates['terrorist_financing'])
         
         # Enhanced ML-powered analysis
-        ml_analysis = self.perform_ml_analysis(transactions, pattern_type)
-        location_analysis = self.analyze_transaction_locations(transactions)
-        risk_assessment = self.enhanced_risk_assessment(transactions, pattern_type)
+        ml_analysis = self.perform_ml_analysis(agg, pattern_type)
+        location_analysis = self.analyze_transaction_locations(agg)
+        risk_assessment = self.enhanced_risk_assessment(agg, pattern_type)
         
         # Calculate enhanced statistics
-        total_amount = sum(float(t.get('amount', 0)) for t in transactions)
-        avg_amount = total_amount / len(transactions) if transactions else 0
-        suspicious_count = len([t for t in transactions if float(t.get('suspicious_score', 0)) > 0.5])
-        critical_count = len([t for t in transactions if float(t.get('suspicious_score', 0)) > 0.8])
+        total_amount = agg.amount_sum
+        avg_amount = total_amount / agg.count if agg.count else 0
         
         # Generate comprehensive report
         report = {
@@ -126,17 +141,18 @@ class AutoSARGenerator:
             # Enhanced details section
             'details': {
                 'pattern_type': pattern_type,
-                'total_transactions': len(transactions),
-                'suspicious_transactions': suspicious_count,
-                'critical_transactions': critical_count,
+                'total_transactions': agg.count,
+                'suspicious_transactions': agg.suspicious_count,
+                'critical_transactions': agg.critical_count,
                 'total_amount': round(total_amount, 2),
                 'average_amount': round(avg_amount, 2),
-                'median_amount': self._calculate_median_amount(transactions),
-                'time_period': self._calculate_time_period(transactions),
-                'accounts_involved': self._get_unique_accounts(transactions),
+                'median_amount': self._calculate_median_amount(agg),
+                'time_period': self._calculate_time_period(agg),
+                'accounts_involved': self._get_unique_accounts(agg),
                 'geographic_spread': location_analysis['geographic_summary'],
-                'transaction_velocity': self._calculate_velocity(transactions),
-                'amount_distribution': self._analyze_amount_distribution(transactions)
+                'transaction_velocity': self._calculate_velocity(agg),
+                'account_velocity': agg.activity.summary(),
+                'amount_distribution': self._analyze_amount_distribution(agg)
             },
             
             # ML-powered money laundering detection
@@ -151,13 +167,14 @@ class AutoSARGenerator:
             
             # Enhanced evidence section
             'evidence': {
-                'transaction_ids': [t.get('transaction_id', t.get('id', '')) for t in transactions[:15]],
-                'pattern_indicators': self._identify_indicators(pattern_type, transactions),
+                'transaction_ids': list(agg.transaction_ids),
+                'pattern_indicators': self._identify_indicators(pattern_type),
                 'risk_factors': risk_assessment['risk_factors'],
                 'suspicious_patterns': ml_analysis['suspicious_patterns'],
+                'circular_flows': agg.cycles.cycles(),
                 'location_red_flags': location_analysis['red_flags'],
-                'timing_anomalies': self._detect_timing_anomalies(transactions),
-                'amount_anomalies': self._detect_amount_anomalies(transactions)
+                'timing_anomalies': self._detect_timing_anomalies(agg),
+                'amount_anomalies': self._detect_amount_anomalies(agg)
             },
             
             # Location and Aadhar analysis
@@ -194,7 +211,7 @@ class AutoSARGenerator:
             
             # Quality metrics
             'quality_metrics': {
-                'data_completeness': self._assess_data_completeness(transactions),
+                'data_completeness': self._assess_data_completeness(agg),
                 'analysis_confidence': ml_analysis['analysis_confidence'],
                 'false_positive_probability': ml_analysis['false_positive_probability'],
                 'investigation_priority': risk_assessment['investigation_priority']
@@ -203,21 +220,17 @@ class AutoSARGenerator:
         
         return report
     
-    def perform_ml_analysis(self, transactions, pattern_type):
+    def perform_ml_analysis(self, agg, pattern_type):
         """Perform ML-powered money laundering type detection"""
-        if not transactions:
+        if not agg.count:
             return self._default_ml_analysis()
         
-        # Calculate base features for ML analysis
-        amounts = [float(t.get('amount', 0)) for t in transactions]
-        suspicion_scores = [float(t.get('suspicious_score', 0)) for t in transactions]
-        
         # Detect multiple money laundering types
         detected_types = []
         confidence_scores = {}
         
         for ml_type, config in self.ml_detection_types.items():
-            confidence = self._calculate_ml_confidence(transactions, ml_type, config)
+            confidence = self._calculate_ml_confidence(agg, ml_type, config)
             if confidence > 0.5:  # Threshold for detection
                 detected_types.append(ml_type)
                 confidence_scores[ml_type] = round(confidence, 3)
@@ -232,13 +245,13 @@ class AutoSARGenerator:
         overall_confidence = max(confidence_scores.values()) if confidence_scores else 0.5
         
         # Pattern complexity analysis
-        pattern_complexity = self._analyze_pattern_complexity(transactions)
+        pattern_complexity = self._analyze_pattern_complexity(agg)
         
         # Evasion indicators
-        evasion_indicators = self._detect_evasion_indicators(transactions)
+        evasion_indicators = self._detect_evasion_indicators(agg)
         
         # Suspicious patterns
-        suspicious_patterns = self._identify_suspicious_patterns(transactions)
+        suspicious_patterns = self._identify_suspicious_patterns(agg)
         
         return {
             'detected_types': detected_types,
@@ -253,62 +266,46 @@ class AutoSARGenerator:
             'false_positive_probability': max(0.05, 1.0 - overall_confidence)
         }
     
-    def analyze_transaction_locations(self, transactions):
+    def analyze_transaction_locations(self, agg):
         """Analyze transaction locations and Aadhar-based geographic data"""
-        if not transactions:
+        if not agg.count:
             return self._default_location_analysis()
         
-        # Extract location data
-        locations = []
-        countries = []
-        states = []
-        cities = []
-        
-        for tx in transactions:
-            if 'aadhar_location' in tx:
-                loc = tx['aadhar_location']
-                locations.append(loc)
-                countries.append(loc.get('country', 'Unknown'))
-                states.append(loc.get('state', 'Unknown'))
-                cities.append(loc.get('city', 'Unknown'))
-            elif 'from_location' in tx:
-                locations.append(tx['from_location'])
-                cities.append(tx['from_location'].get('city', 'Unknown'))
-        
-        # Analyze high-risk locations
-        high_risk_countries = ['Pakistan', 'Afghanistan', 'Iran', 'North Korea']
-        high_risk_locations = [loc for loc in locations if loc.get('country') in high_risk_countries]
+        # Location counts; legacy from_location fallbacks carry a city only
+        location_count = agg.location_count
+        aadhar_count = location_count - agg.fallback_location_count
+        high_risk_count = agg.high_risk_location_count
         
         # Cross-border activity analysis
-        unique_countries = list(set(countries))
+        unique_countries = list(agg.country_counts)
         cross_border_activity = {
             'total_countries': len(unique_countries),
             'countries': unique_countries,
-            'high_risk_countries': [c for c in unique_countries if c in high_risk_countries],
-            'cross_border_ratio': len(unique_countries) / len(transactions) if transactions else 0
+            'high_risk_countries': [c for c in unique_countries if c in HIGH_RISK_COUNTRIES],
+            'cross_border_ratio': len(unique_countries) / agg.count
         }
         
         # Geographic clustering analysis
-        clustering_analysis = self._analyze_geographic_clustering(locations)
+        clustering_analysis = self._analyze_geographic_clustering(agg)
         
         # Aadhar region analysis
-        aadhar_analysis = self._analyze_aadhar_regions(states, cities)
+        aadhar_analysis = self._analyze_aadhar_regions(agg.state_counts, aadhar_count)
         
         # Calculate geographic risk score
-        geographic_risk_score = self._calculate_geographic_risk_score(locations, high_risk_locations, cross_border_activity)
+        geographic_risk_score = self._calculate_geographic_risk_score(location_count, high_risk_count, cross_border_activity)
         
         # Geographic summary
         geographic_summary = {
-            'total_locations': len(locations),
+            'total_locations': location_count,
             'unique_countries': len(unique_countries),
-            'unique_states': len(set(states)),
-            'unique_cities': len(set(cities)),
-            'high_risk_percentage': (len(high_risk_locations) / len(locations) * 100) if locations else 0
+            'unique_states': len(agg.state_counts),
+            'unique_cities': len(agg.city_counts),
+            'high_risk_percentage': (high_risk_count / location_count * 100) if location_count else 0
         }
         
         # Red flags
         red_flags = []
-        if len(high_risk_locations) > len(locations) * 0.3:
+        if high_risk_count > location_count * 0.3:
             red_flags.append('High concentration of transactions in high-risk countries')
         if len(unique_countries) > 5:
             red_flags.append('Transactions spanning multiple countries')
@@ -316,7 +313,8 @@ class AutoSARGenerator:
             red_flags.append('High cross-border transaction activity')
         
         return {
-            'high_risk_locations': high_risk_locations,
+            # First MAX_HIGH_RISK_LOCATIONS matches; the percentage above covers all of them
+            'high_risk_locations': list(agg.high_risk_locations),
             'cross_border_activity': cross_border_activity,
             'clustering_analysis': clustering_analysis,
             'aadhar_analysis': aadhar_analysis,
@@ -325,49 +323,44 @@ class AutoSARGenerator:
             'red_flags': red_flags
         }
     
-    def enhanced_risk_assessment(self, transactions, pattern_type):
+    def enhanced_risk_assessment(self, agg, pattern_type):
         """Perform enhanced risk assessment"""
-        if not transactions:
+        if not agg.count:
             return self._default_risk_assessment()
         
         risk_factors = []
         risk_score = 0.0
         
         # Amount-based risk factors
-        amounts = [float(t.get('amount', 0)) for t in transactions]
-        if amounts:
-            max_amount = max(amounts)
-            avg_amount = sum(amounts) / len(amounts)
-            
-            if max_amount > 100000:  # Large amounts
-                risk_factors.append('Large individual transaction amounts detected')
-                risk_score += 0.15
-            
-            if avg_amount > 50000:  # High average
-                risk_factors.append('High average transaction amounts')
-                risk_score += 0.10
+        max_amount = agg.amount_max
+        avg_amount = agg.amount_mean
+        
+        if max_amount > 100000:  # Large amounts
+            risk_factors.append('Large individual transaction amounts detected')
+            risk_score += 0.15
+        
+        if avg_amount > 50000:  # High average
+            risk_factors.append('High average transaction amounts')
+            risk_score += 0.10
         
         # Frequency-based risk factors
-        if len(transactions) > 100:
+        if agg.count > 100:
             risk_factors.append('High transaction frequency')
             risk_score += 0.10
-        elif len(transactions) > 50:
+        elif agg.count > 50:
             risk_factors.append('Moderate transaction frequency')
             risk_score += 0.05
         
         # Suspicion score analysis
-        suspicion_scores = [float(t.get('suspicious_score', 0)) for t in transactions]
-        if suspicion_scores:
-            avg_suspicion = sum(suspicion_scores) / len(suspicion_scores)
-            high_suspicion_count = len([s for s in suspicion_scores if s > 0.8])
-            
-            if avg_suspicion > 0.7:
-                risk_factors.append('High average suspicion score')
-                risk_score += 0.20
-            
-            if high_suspicion_count > len(transactions) * 0.3:
-                risk_factors.append('High concentration of critical risk transactions')
-                risk_score += 0.25
+        avg_suspicion = agg.suspicion_sum / agg.count
+        
+        if avg_suspicion > 0.7:
+            risk_factors.append('High average suspicion score')
+            risk_score += 0.20
+        
+        if agg.critical_count > agg.count * 0.3:
+            risk_factors.append('High concentration of critical risk transactions')
+            risk_score += 0.25
         
         # Pattern-specific risk factors
         template = self.templates.get(pattern_type, {})
@@ -377,7 +370,7 @@ class AutoSARGenerator:
             risk_score += 0.10
         
         # Normalize risk score
-        risk_score = min(risk_score, 1.0)
+        risk_score = min(float(risk_score), 1.0)
         
         # Determine investigation priority
         if risk_score > 0.8:
@@ -399,97 +392,82 @@ class AutoSARGenerator:
             'compliance_score': round(compliance_score, 3)
         }
     
-    def _calculate_ml_confidence(self, transactions, ml_type, config):
+    def _method_share(self, agg, names):
+        """Share of transactions whose method mentions any of names"""
+        matched = sum(count for method, count in agg.method_counts.items()
+                      if any(name in str(method) for name in names))
+        return matched / agg.count
+    
+    def _calculate_ml_confidence(self, agg, ml_type, config):
         """Calculate confidence score for specific ML type detection"""
-        if not transactions:
+        if not agg.count:
             return 0.0
         
         confidence = 0.0
-        indicators = config['indicators']
         
         # Analyze transaction patterns for specific ML type indicators
         if ml_type == 'crypto_laundering':
             # Look for crypto-related patterns
             crypto_methods = ['Cryptocurrency', 'Bitcoin', 'Ethereum', 'USDT']
-            crypto_count = sum(1 for t in transactions if any(method in str(t.get('transaction_method', '')) for method in crypto_methods))
-            confidence += (crypto_count / len(transactions)) * 0.4
+            confidence += self._method_share(agg, crypto_methods) * 0.4
             
             # Multiple exchanges indicator
-            if len(set(t.get('from_account', '') for t in transactions)) > 10:
+            if len(agg.from_accounts) > 10:
                 confidence += 0.2
             
         elif ml_type == 'terrorist_financing':
             # Small amounts clustering
-            amounts = [float(t.get('amount', 0)) for t in transactions]
-            small_amounts = [a for a in amounts if a < 10000]
-            confidence += (len(small_amounts) / len(amounts)) * 0.3
+            confidence += agg.small_count / agg.count * 0.3
             
             # Geographic clustering from high-risk regions
-            high_risk_countries = ['Pakistan', 'Afghanistan', 'Iran']
-            high_risk_count = 0
-            for t in transactions:
-                if 'aadhar_location' in t and t['aadhar_location'].get('country') in high_risk_countries:
-                    high_risk_count += 1
-            confidence += (high_risk_count / len(transactions)) * 0.4
+            high_risk_count = sum(agg.country_counts.get(c, 0) for c in ML_HIGH_RISK_COUNTRIES)
+            confidence += high_risk_count / agg.count * 0.4
             
         elif ml_type == 'trafficking_laundering':
             # Cash-intensive patterns
             cash_methods = ['Cash Deposit', 'Hawala', 'Money Order']
-            cash_count = sum(1 for t in transactions if any(method in str(t.get('transaction_method', '')) for method in cash_methods))
-            confidence += (cash_count / len(transactions)) * 0.3
+            confidence += self._method_share(agg, cash_methods) * 0.3
             
         elif ml_type == 'smurfing_structuring':
-            # Below-threshold patterns
-            amounts = [float(t.get('amount', 0)) for t in transactions]
-            below_threshold = [a for a in amounts if 9000 <= a <= 10000]  # Just below $10k reporting threshold
-            confidence += (len(below_threshold) / len(amounts)) * 0.5
+            # Below-threshold patterns, just below $10k reporting threshold
+            confidence += agg.threshold_count / agg.count * 0.5
         
         # Apply risk multiplier
         confidence *= config.get('risk_multiplier', 1.0)
         
         # Add baseline suspicion score component
-        avg_suspicion = sum(float(t.get('suspicious_score', 0)) for t in transactions) / len(transactions)
-        confidence += avg_suspicion * 0.3
+        confidence += agg.suspicion_sum / agg.count * 0.3
         
         return min(confidence, 1.0)
     
-    def _analyze_pattern_complexity(self, transactions):
+    def _analyze_pattern_complexity(self, agg):
         """Analyze the complexity of transaction patterns"""
-        if not transactions:
+        if not agg.count:
             return {'score': 0.0, 'level': 'LOW'}
         
         complexity_score = 0.0
         
-        # Number of unique accounts
-        accounts = set()
-        for t in transactions:
-            accounts.add(t.get('from_account', ''))
-            accounts.add(t.get('to_account', ''))
-        
-        account_complexity = min(len(accounts) / 20, 1.0)  # Normalize to max 20 accounts
+        # Number of unique accounts (sender and receiver side)
+        account_count = len(agg.accounts)
+        account_complexity = min(account_count / 20, 1.0)  # Normalize to max 20 accounts
         complexity_score += account_complexity * 0.3
         
         # Transaction method diversity
-        methods = set(t.get('transaction_method', '') for t in transactions)
-        method_complexity = min(len(methods) / 5, 1.0)  # Normalize to max 5 methods
+        method_count = len(agg.method_counts)
+        method_complexity = min(method_count / 5, 1.0)  # Normalize to max 5 methods
         complexity_score += method_complexity * 0.2
         
         # Geographic spread
-        countries = set()
-        for t in transactions:
-            if 'aadhar_location' in t:
-                countries.add(t['aadhar_location'].get('country', ''))
-        
-        geographic_complexity = min(len(countries) / 5, 1.0)  # Normalize to max 5 countries
+        country_count = len(agg.country_counts)
+        geographic_complexity = min(country_count / 5, 1.0)  # Normalize to max 5 countries
         complexity_score += geographic_complexity * 0.3
         
         # Amount variation
-        amounts = [float(t.get('amount', 0)) for t in transactions]
-        if amounts:
-            amount_std = np.std(amounts) if len(amounts) > 1 else 0
-            amount_mean = np.mean(amounts)
-            amount_complexity = min(amount_std / amount_mean, 1.0) if amount_mean > 0 else 0
-            complexity_score += amount_complexity * 0.2
+        amount_std = math.sqrt(agg.amount_m2 / agg.count) if agg.count > 1 else 0
+        amount_mean = agg.amount_mean
+        amount_complexity = min(amount_std / amount_mean, 1.0) if amount_mean > 0 else 0
+        complexity_score += amount_complexity * 0.2
+        complexity_score = float(complexity_score)
         
         # Determine complexity level
         if complexity_score > 0.7:
@@ -502,125 +480,67 @@ class AutoSARGenerator:
         return {
             'score': round(complexity_score, 3),
             'level': level,
-            'account_diversity': len(accounts),
-            'method_diversity': len(methods),
-            'geographic_diversity': len(countries)
+            'account_diversity': account_count,
+            'method_diversity': method_count,
+            'geographic_diversity': country_count
         }
     
-    def _detect_evasion_indicators(self, transactions):
+    def _detect_evasion_indicators(self, agg):
         """Detect evasion indicators in transactions"""
         indicators = []
         
-        if not transactions:
+        if not agg.count:
             return indicators
         
-        amounts = [float(t.get('amount', 0)) for t in transactions]
-        
         # Just-below-threshold amounts (structuring)
-        threshold_amounts = [a for a in amounts if 9000 <= a <= 10000]
-        if len(threshold_amounts) > len(amounts) * 0.2:
+        if agg.threshold_count > agg.count * 0.2:
             indicators.append('Potential structuring detected - amounts just below reporting threshold')
         
-        # Rapid sequence transactions
-        timestamps = []
-        for t in transactions:
-            try:
-                ts = datetime.fromisoformat(t.get('timestamp', '').replace('Z', '+00:00'))
-                timestamps.append(ts)
-            except:
-                continue
-        
-        if len(timestamps) > 1:
-            timestamps.sort()
-            rapid_count = 0
-            for i in range(1, len(timestamps)):
-                if (timestamps[i] - timestamps[i-1]).total_seconds() < 3600:  # Within 1 hour
-                    rapid_count += 1
-            
-            if rapid_count > len(timestamps) * 0.3:
+        # Rapid sequence transactions (within 1 hour)
+        if agg.epoch_count > 1:
+            if agg.rapid_count > agg.epoch_count * 0.3:
                 indicators.append('Rapid sequence transactions detected')
         
         # Round number amounts (potential artificial amounts)
-        round_amounts = [a for a in amounts if a % 1000 == 0 and a > 1000]
-        if len(round_amounts) > len(amounts) * 0.5:
+        if agg.round_count > agg.count * 0.5:
             indicators.append('High frequency of round number amounts')
         
         # Multiple transaction methods (potential layering)
-        methods = set(t.get('transaction_method', '') for t in transactions)
-        if len(methods) > 4:
+        if len(agg.method_counts) > 4:
             indicators.append('Multiple transaction methods used - potential layering')
         
         return indicators
     
-    def _identify_suspicious_patterns(self, transactions):
+    def _identify_suspicious_patterns(self, agg):
         """Identify specific suspicious patterns"""
         patterns = []
         
-        if not transactions:
+        if not agg.count:
             return patterns
         
-        # Circular transactions
-        account_pairs = []
-        for t in transactions:
-            from_acc = t.get('from_account', '')
-            to_acc = t.get('to_account', '')
-            account_pairs.append((from_acc, to_acc))
-        
-        # Check for reverse transactions (A->B and B->A)
-        for pair in account_pairs:
-            reverse_pair = (pair[1], pair[0])
-            if reverse_pair in account_pairs:
-                patterns.append('Circular transaction pattern detected')
-                break
+        # Circular transactions: time-ordered loops of up to max_length hops
+        cycle_count = agg.cycles.cycle_count()
+        if cycle_count:
+            longest = max(cycle['length'] for cycle in agg.cycles.cycles())
+            patterns.append(f'Circular transaction pattern detected ({cycle_count} loops, up to {longest} hops)')
         
         # Concentration patterns
-        to_accounts = [t.get('to_account', '') for t in transactions]
-        account_counts = {}
-        for acc in to_accounts:
-            account_counts[acc] = account_counts.get(acc, 0) + 1
-        
-        max_concentration = max(account_counts.values()) if account_counts else 0
-        if max_concentration > len(transactions) * 0.4:
+        if agg.destinations.max_count() > agg.count * 0.4:
             patterns.append('High concentration to single destination account')
         
         # Timing patterns
-        if self._detect_suspicious_timing(transactions):
+        if self._detect_suspicious_timing(agg):
             patterns.append('Suspicious timing patterns detected')
         
         return patterns
     
-    def _detect_suspicious_timing(self, transactions):
+    def _detect_suspicious_timing(self, agg):
         """Detect suspicious timing patterns"""
-        if len(transactions) < 5:
-            return False
-        
-        timestamps = []
-        for t in transactions:
-            try:
-                ts = datetime.fromisoformat(t.get('timestamp', '').replace('Z', '+00:00'))
-                timestamps.append(ts)
-            except:
-                continue
-        
-        if len(timestamps) < 5:
+        if agg.count < 5 or agg.epoch_count < 5:
             return False
         
-        timestamps.sort()
-        
-        # Check for regular intervals (potential automation)
-        intervals = []
-        for i in range(1, len(timestamps)):
-            interval = (timestamps[i] - timestamps[i-1]).total_seconds()
-            intervals.append(interval)
-        
-        # Check if most intervals are similar (within 10% variance)
-        if len(intervals) > 3:
-            avg_interval = sum(intervals) / len(intervals)
-            similar_intervals = [i for i in intervals if abs(i - avg_interval) < avg_interval * 0.1]
-            if len(similar_intervals) > len(intervals) * 0.7:
-                return True
-        
-        return False
+        # Any account transacting at near-constant intervals - potential automation
+        return len(agg.activity.regular()) > 0
     
     # Additional helper methods for the enhanced features
     def _determine_priority(self, ml_analysis, risk_assessment):
@@ -637,122 +557,103 @@ class AutoSARGenerator:
         else:
             return 'LOW'
     
-    def _calculate_median_amount(self, transactions):
+    def _calculate_median_amount(self, agg):
         """Calculate median transaction amount"""
-        amounts = [float(t.get('amount', 0)) for t in transactions]
-        if not amounts:
+        if not agg.count:
             return 0.0
-        amounts.sort()
-        n = len(amounts)
-        if n % 2 == 0:
-            return (amounts[n//2 - 1] + amounts[n//2]) / 2
-        else:
-            return amounts[n//2]
+        return agg.amounts.median()
     
-    def _calculate_velocity(self, transactions):
+    def _calculate_velocity(self, agg):
         """Calculate transaction velocity (transactions per day)"""
-        if not transactions:
-            return 0.0
-        
-        timestamps = []
-        for t in transactions:
-            try:
-                ts = datetime.fromisoformat(t.get('timestamp', '').replace('Z', '+00:00'))
-                timestamps.append(ts)
-            except:
-                continue
-        
-        if len(timestamps) < 2:
+        if not agg.count or agg.epoch_count < 2:
             return 0.0
         
-        timestamps.sort()
-        time_span = (timestamps[-1] - timestamps[0]).total_seconds() / (24 * 3600)  # Convert to days
+        time_span = (agg.epoch_max - agg.epoch_min) / (24 * 3600)  # Convert to days
         
         if time_span <= 0:
-            return len(transactions)  # All transactions in same day
+            return agg.count  # All transactions in same day
         
-        return round(len(transactions) / time_span, 2)
+        return round(agg.count / float(time_span), 2)
+    
+    def _quartiles(self, agg):
+        """Lower and upper quartile of amounts (min/max for tiny sets)"""
+        n = agg.count
+        if n > 3:
+            return agg.amounts.value_at(n // 4), agg.amounts.value_at(3 * n // 4)
+        return agg.amount_min, agg.amount_max
     
-    def _analyze_amount_distribution(self, transactions):
+    def _analyze_amount_distribution(self, agg):
         """Analyze distribution of transaction amounts"""
-        amounts = [float(t.get('amount', 0)) for t in transactions]
-        if not amounts:
+        if not agg.count:
             return {}
         
-        amounts.sort()
-        n = len(amounts)
+        q1, q3 = self._quartiles(agg)
+        std_dev = math.sqrt(agg.amount_m2 / agg.count)
+        mean = agg.amount_mean
         
         return {
-            'min': min(amounts),
-            'max': max(amounts),
-            'range': max(amounts) - min(amounts),
-            'q1': amounts[n//4] if n > 3 else amounts[0],
-            'q3': amounts[3*n//4] if n > 3 else amounts[-1],
-            'std_dev': round(np.std(amounts), 2),
-            'coefficient_variation': round(np.std(amounts) / np.mean(amounts), 3) if np.mean(amounts) > 0 else 0
+            'min': agg.amount_min,
+            'max': agg.amount_max,
+            'range': agg.amount_max - agg.amount_min,
+            'q1': q1,
+            'q3': q3,
+            'std_dev': round(std_dev, 2),
+            'coefficient_variation': round(std_dev / mean, 3) if mean > 0 else 0
         }
     
-    def _analyze_geographic_clustering(self, locations):
+    def _analyze_geographic_clustering(self, agg):
         """Analyze geographic clustering of transactions"""
-        if not locations:
+        total_locations = agg.location_count
+        if not total_locations:
             return {'clusters': 0, 'analysis': 'No location data'}
         
         # Simple clustering analysis based on cities and countries
-        cities = [loc.get('city', 'Unknown') for loc in locations]
-        countries = [loc.get('country', 'Unknown') for loc in locations]
-        
-        city_counts = {}
-        country_counts = {}
-        
-        for city in cities:
-            city_counts[city] = city_counts.get(city, 0) + 1
-        for country in countries:
-            country_counts[country] = country_counts.get(country, 0) + 1
+        city_counts = agg.city_counts
+        country_counts = dict(agg.country_counts)
+        if agg.fallback_location_count:
+            # Legacy from_location entries have no country
+            country_counts['Unknown'] = country_counts.get('Unknown', 0) + agg.fallback_location_count
         
         # Find dominant clusters
         dominant_city = max(city_counts.keys(), key=lambda k: city_counts[k]) if city_counts else 'Unknown'
         dominant_country = max(country_counts.keys(), key=lambda k: country_counts[k]) if country_counts else 'Unknown'
         
         return {
-            'total_locations': len(locations),
-            'unique_cities': len(set(cities)),
-            'unique_countries': len(set(countries)),
+            'total_locations': total_locations,
+            'unique_cities': len(city_counts),
+            'unique_countries': len(country_counts),
             'dominant_city': dominant_city,
             'dominant_country': dominant_country,
-            'city_concentration': max(city_counts.values()) / len(locations) if locations else 0,
-            'country_concentration': max(country_counts.values()) / len(locations) if locations else 0
+            'city_concentration': max(city_counts.values()) / total_locations,
+            'country_concentration': max(country_counts.values()) / total_locations
         }
     
-    def _analyze_aadhar_regions(self, states, cities):
+    def _analyze_aadhar_regions(self, state_counts, location_count):
         """Analyze Aadhar-based regional patterns"""
-        if not states:
+        if not location_count:
             return {'analysis': 'No Aadhar region data available'}
         
-        state_counts = {}
-        for state in states:
-            state_counts[state] = state_counts.get(state, 0) + 1
-        
         # Identify regional risk patterns
         high_risk_states = ['Jammu and Kashmir', 'Punjab', 'West Bengal']  # Border states
         high_risk_count = sum(state_counts.get(state, 0) for state in high_risk_states)
         
         return {
-            'total_states': len(set(states)),
-            'state_distribution': state_counts,
+            'total_states': len(state_counts),
+            'state_distribution': dict(state_counts),
             'high_risk_state_transactions': high_risk_count,
-            'high_risk_percentage': (high_risk_count / len(states) * 100) if states else 0,
+            'high_risk_percentage': high_risk_count / location_count * 100,
             'dominant_state': max(state_counts.keys(), key=lambda k: state_counts[k]) if state_counts else 'Unknown'
         }
     
-    def _calculate_geographic_risk_score(self, locations, high_risk_locations, cross_border_activity):
+    def _calculate_geographic_risk_score(self, location_count, high_risk_count, cross_border_activity):
         """Calculate overall geographic risk score"""
-        if not locations:
+        if not location_count:
             return 0.0
         
         risk_score = 0.0
         
         # High-risk location percentage
-        high_risk_ratio = len(high_risk_locations) / len(locations)
+        high_risk_ratio = high_risk_count / location_count
         risk_score += high_risk_ratio * 0.4
         
         # Cross-border activity risk
@@ -765,85 +666,54 @@ class AutoSARGenerator:
         
         return min(risk_score, 1.0)
     
-    def _detect_timing_anomalies(self, transactions):
+    def _detect_timing_anomalies(self, agg):
         """Detect timing anomalies in transactions"""
         anomalies = []
         
-        if len(transactions) < 3:
-            return anomalies
-        
-        timestamps = []
-        for t in transactions:
-            try:
-                ts = datetime.fromisoformat(t.get('timestamp', '').replace('Z', '+00:00'))
-                timestamps.append(ts)
-            except:
-                continue
-        
-        if len(timestamps) < 3:
+        timestamp_count = agg.epoch_count
+        if agg.count < 3 or timestamp_count < 3:
             return anomalies
         
-        timestamps.sort()
-        
         # Check for off-hours transactions (11 PM to 5 AM)
-        off_hours_count = 0
-        for ts in timestamps:
-            if ts.hour < 5 or ts.hour >= 23:
-                off_hours_count += 1
-        
-        if off_hours_count > len(timestamps) * 0.3:
+        if agg.off_hours_count > timestamp_count * 0.3:
             anomalies.append('High frequency of off-hours transactions')
         
         # Check for weekend transactions
-        weekend_count = sum(1 for ts in timestamps if ts.weekday() >= 5)
-        if weekend_count > len(timestamps) * 0.4:
+        if agg.weekend_count > timestamp_count * 0.4:
             anomalies.append('High frequency of weekend transactions')
         
-        # Check for burst patterns
-        time_gaps = []
-        for i in range(1, len(timestamps)):
-            gap = (timestamps[i] - timestamps[i-1]).total_seconds()
-            time_gaps.append(gap)
-        
-        if time_gaps:
-            avg_gap = sum(time_gaps) / len(time_gaps)
-            burst_count = sum(1 for gap in time_gaps if gap < avg_gap * 0.1)
-            if burst_count > len(time_gaps) * 0.3:
-                anomalies.append('Transaction burst patterns detected')
+        # Check for burst patterns: an account's busiest hour far above its average rate
+        bursting = agg.activity.bursting('1h')
+        if len(bursting):
+            anomalies.append(f'Transaction burst patterns detected ({len(bursting)} accounts)')
         
         return anomalies
     
-    def _detect_amount_anomalies(self, transactions):
+    def _detect_amount_anomalies(self, agg):
         """Detect amount anomalies in transactions"""
         anomalies = []
         
-        amounts = [float(t.get('amount', 0)) for t in transactions]
-        if not amounts:
+        if not agg.count:
             return anomalies
         
         # Outlier detection using IQR method
-        amounts.sort()
-        n = len(amounts)
-        q1 = amounts[n//4] if n > 3 else amounts[0]
-        q3 = amounts[3*n//4] if n > 3 else amounts[-1]
+        q1, q3 = self._quartiles(agg)
         iqr = q3 - q1
         
         if iqr > 0:
             lower_bound = q1 - 1.5 * iqr
             upper_bound = q3 + 1.5 * iqr
             
-            outliers = [a for a in amounts if a < lower_bound or a > upper_bound]
-            if len(outliers) > len(amounts) * 0.1:
+            outlier_count = agg.amounts.count_below(lower_bound) + agg.count - agg.amounts.count_below(upper_bound, inclusive=True)
+            if outlier_count > agg.count * 0.1:
                 anomalies.append('Statistical outliers in transaction amounts detected')
         
         # Check for suspicious round numbers
-        round_amounts = [a for a in amounts if a % 1000 == 0 and a >= 10000]
-        if len(round_amounts) > len(amounts) * 0.3:
+        if agg.large_round_count > agg.count * 0.3:
             anomalies.append('High frequency of large round number amounts')
         
         # Check for just-below-threshold amounts
-        threshold_amounts = [a for a in amounts if 9000 <= a <= 10000]
-        if len(threshold_amounts) > len(amounts) * 0.15:
+        if agg.threshold_count > agg.count * 0.15:
             anomalies.append('Potential structuring - amounts just below $10,000 threshold')
         
         return anomalies
@@ -930,27 +800,19 @@ class AutoSARGenerator:
         
         return actions
     
-    def _assess_data_completeness(self, transactions):
+    def _assess_data_completeness(self, agg):
         """Assess completeness of transaction data"""
-        if not transactions:
+        if not agg.count:
             return 0.0
         
-        required_fields = ['transaction_id', 'amount', 'from_account', 'to_account', 'timestamp']
-        optional_fields = ['aadhar_location', 'transaction_method', 'suspicious_score']
-        
         completeness_score = 0.0
-        field_scores = {}
         
-        for field in required_fields:
-            present_count = sum(1 for t in transactions if t.get(field) is not None and t.get(field) != '')
-            field_score = present_count / len(transactions)
-            field_scores[field] = field_score
+        for field in REQUIRED_FIELDS:
+            field_score = agg.field_counts.get(field, 0) / agg.count
             completeness_score += field_score * 0.15  # Required fields are weighted more
         
-        for field in optional_fields:
-            present_count = sum(1 for t in transactions if t.get(field) is not None and t.get(field) != '')
-            field_score = present_count / len(transactions)
-            field_scores[field] = field_score
+        for field in OPTIONAL_FIELDS:
+            field_score = agg.field_counts.get(field, 0) / agg.count
             completeness_score += field_score * 0.05  # Optional fields are weighted less
         
         return round(min(completeness_score, 1.0), 3)
@@ -992,35 +854,21 @@ class AutoSARGenerator:
             'compliance_score': 0.5
         }
     
-    def _calculate_time_period(self, transactions):
+    def _calculate_time_period(self, agg):
         """Calculate the time period covered by transactions"""
-        if not transactions:
+        if not agg.count or not agg.epoch_count:
             return "Unknown"
         
-        timestamps = [t.get('timestamp') for t in transactions if t.get('timestamp')]
-        if not timestamps:
-            return "Unknown"
-        
-        try:
-            dates = [datetime.fromisoformat(ts.replace('Z', '+00:00')) for ts in timestamps]
-            min_date = min(dates)
-            max_date = max(dates)
-            days = (max_date - min_date).days
-            return f"{days} days ({min_date.strftime('%Y-%m-%d')} to {max_date.strftime('%Y-%m-%d')})"
-        except:
-            return "Unknown"
+        min_date = from_epoch(agg.epoch_min)
+        max_date = from_epoch(agg.epoch_max)
+        days = (max_date - min_date).days
+        return f"{days} days ({min_date.strftime('%Y-%m-%d')} to {max_date.strftime('%Y-%m-%d')})"
     
-    def _get_unique_accounts(self, transactions):
-        """Get unique accounts involved"""
-        accounts = set()
-        for t in transactions:
-            if t.get('from_account'):
-                accounts.add(t['from_account'])
-            if t.get('to_account'):
-                accounts.add(t['to_account'])
-        return list(accounts)[:20]  # Limit to first 20
+    def _get_unique_accounts(self, agg):
+        """Get unique accounts involved, in order of first appearance"""
+        return list(agg.first_accounts)  # Limited to first MAX_REPORTED_ACCOUNTS
     
-    def _identify_indicators(self, pattern_type, transactions):
+    def _identify_indicators(self, pattern_type):
         """Identify pattern-specific indicators"""
         indicators = {
             'terrorist_financing': [
@@ -1045,25 +893,23 @@ class AutoSARGenerator:
         
         return indicators.get(pattern_type, ['Suspicious transaction patterns detected'])
     
-    def _assess_risk_factors(self, transactions):
+    def _assess_risk_factors(self, agg):
         """Assess overall risk factors"""
         risk_factors = []
         
-        if not transactions:
+        if not agg.count:
             return ['No transaction data available']
         
         # High suspicious score average
-        avg_suspicion = sum(float(t.get('suspicious_score', 0)) for t in transactions) / len(transactions)
-        if avg_suspicion > 0.7:
+        if agg.suspicion_sum / agg.count > 0.7:
             risk_factors.append('High average suspicious activity score')
         
         # Large amounts
-        amounts = [float(t.get('amount', 0)) for t in transactions]
-        if amounts and max(amounts) > 10000:
+        if agg.amount_max > 10000:
             risk_factors.append('Large individual transaction amounts')
         
         # Frequency
-        if len(transactions) > 50:
+        if agg.count > 50:
             risk_factors.append('High transaction frequency')
         
         if not risk_factors:
@@ -1108,53 +954,255 @@ class AutoSARGenerator:
 # Global SAR generator instance
 sar_generator = AutoSARGenerator()
 
+def parse_transaction_limit(request_data):
+    """Validated transaction_limit from a request body"""
+    try:
+        return max(0, int(request_data.get('transaction_limit', DEFAULT_SAR_TRANSACTION_LIMIT)))
+    except (TypeError, ValueError):
+        raise ValueError('transaction_limit must be an integer')
+
+def parse_sar_request(request_data):
+    """Validate a /generate style body into (pattern_data, transaction_limit)"""
+    if not request_data:
+        raise ValueError('No data provided')
+    return request_data.get('pattern', {}), parse_transaction_limit(request_data)
+
+def parse_sar_batch_request(request_data):
+    """Validate a /generate/batch body into ([(pattern_data, selector)], transaction_limit)
+
+    A selector is ('scenario', name) or ('accounts', frozenset of account ids).
+    """
+    if not request_data:
+        raise ValueError('No data provided')
+    
+    scenarios = list(request_data.get('scenarios', []))
+    if request_data.get('all_templates'):
+        scenarios.extend(sar_generator.templates)
+    
+    specs = []
+    for scenario in scenarios:
+        pattern_data = scenario if isinstance(scenario, dict) else {'scenario': scenario}
+        if not isinstance(pattern_data.get('scenario'), str):
+            raise ValueError('Each scenario must be a name or a pattern with a scenario')
+        specs.append((pattern_data, ('scenario', pattern_data['scenario'])))
+    
+    for group in request_data.get('account_groups', []):
+        accounts = group.get('accounts') if isinstance(group, dict) else None
+        if not accounts or not isinstance(accounts, list):
+            raise ValueError('Each account group needs a non-empty accounts list')
+        pattern_data = {k: v for k, v in group.items() if k != 'accounts'}
+        pattern_data.setdefault('account_group', f'group_{len(specs)}')
+        specs.append((pattern_data, ('accounts', frozenset(str(a) for a in accounts))))
+    
+    if not specs:
+        raise ValueError('Provide scenarios, account_groups or all_templates')
+    if len(specs) > MAX_SAR_BATCH_SIZE:
+        raise ValueError(f'At most {MAX_SAR_BATCH_SIZE} scenarios/account groups per batch')
+    return specs, parse_transaction_limit(request_data)
+
+def build_sar_payload(pattern_data, chunks, transaction_limit=DEFAULT_SAR_TRANSACTION_LIMIT):
+    """SAR payload from enrichment-filled frames in ts_epoch order; only the sample is kept as dicts
+
+    Peak memory is one chunk plus the aggregate, whose cycle and activity
+    state grows up to Config.SAR_MAX_EDGES transactions.
+    """
+    aggregate = SARAggregate(max_edges=Config.SAR_MAX_EDGES)
+    transactions = []
+    for chunk in chunks:
+        aggregate.update(TransactionBatch.from_frame(chunk))
+        if len(transactions) < transaction_limit:
+            transactions.extend(chunk.head(transaction_limit - len(transactions)).to_dict('records'))
+    
+    # Stored enrichment (Aadhar location, method, bank, legacy from/to locations)
+    for t in transactions:
+        attach_enrichment(t)
+        t['country_risk_level'] = get_country_risk_assessment(t['aadhar_location']['country'])
+    
+    return {
+        'sar_report': sar_generator.build_sar_report(pattern_data, aggregate),
+        'transactions': transactions,
+        'transaction_count': aggregate.count
+    }
+
+def run_sar_generation(conn, pattern_data, transaction_limit=DEFAULT_SAR_TRANSACTION_LIMIT, chunk_size=None):
+    """Build the SAR payload for one scenario, streaming its flagged transactions"""
+    scenario = pattern_data.get('scenario', 'terrorist_financing')
+    
+    # Stream every flagged transaction in time order
+    query = f"""
+        SELECT t.*, {ENRICHMENT_SELECT} FROM transactions t {ENRICHMENT_JOIN}
+        WHERE t.scenario = ? AND t.suspicious_score > 0.5
+        ORDER BY t.ts_epoch, t.id
+    """
+    
+    chunks = pd.read_sql_query(query, conn, params=[scenario], chunksize=chunk_size or Config.SAR_CHUNK_SIZE)
+    return build_sar_payload(pattern_data, (fill_missing_enrichment(chunk) for chunk in chunks), transaction_limit)
+
+def fetch_sar_partitions(conn, specs, chunk_size=None):
+    """Flagged transactions for every batch entry in one query, partitioned in memory
+
+    Returns one frame (or None when nothing matched) per spec, each in
+    ts_epoch order. A row can land in several partitions when account
+    groups overlap each other or a requested scenario.
+    """
+    scenarios = sorted({value for _, (kind, value) in specs if kind == 'scenario'})
+    accounts = sorted(set().union(*(value for _, (kind, value) in specs if kind == 'accounts')))
+    
+    query = f"""
+        SELECT t.*, {ENRICHMENT_SELECT} FROM transactions t {ENRICHMENT_JOIN}
+        WHERE t.suspicious_score > 0.5 AND (
+            t.scenario IN (SELECT value FROM json_each(?))
+            OR t.from_account IN (SELECT value FROM json_each(?))
+            OR t.to_account IN (SELECT value FROM json_each(?))
+        )
+        ORDER BY t.ts_epoch, t.id
+    """
+    params = [json.dumps(scenarios), json.dumps(accounts), json.dumps(accounts)]
+    
+    parts = [[] for _ in specs]
+    for chunk in pd.read_sql_query(query, conn, params=params, chunksize=chunk_size or Config.SAR_CHUNK_SIZE):
+        fill_missing_enrichment(chunk)
+        by_scenario = dict(tuple(chunk.groupby('scenario', sort=False))) if scenarios else {}
+        for part, (_, (kind, value)) in zip(parts, specs):
+            if kind == 'scenario':
+                rows = by_scenario.get(value)
+            else:
+                rows = chunk[chunk['from_account'].isin(value) | chunk['to_account'].isin(value)]
+            if rows is not None and len(rows):
+                part.append(rows)
+    
+    return [pd.concat(part, ignore_index=True) if part else None for part in parts]
+
+def sar_partition_job(pattern_data, frame, transaction_limit, chunk_size):
+    """Job queue entry point for one pre-fetched batch partition"""
+    if frame is None:
+        chunks = ()
+    else:
+        chunks = (frame.iloc[i:i + chunk_size] for i in range(0, len(frame), chunk_size))
+    return build_sar_payload(pattern_data, chunks, transaction_limit)
+
+def stream_sar_batch(queue, specs, frames, transaction_limit, chunk_size):
+    """Generate partitions on the worker pool, yielding one result record as each finishes
+
+    The last record is a summary. Closing the generator early (client
+    disconnect) cancels partitions that have not started.
+    """
+    started = time.time()
+    failed = 0
+    tasks = [(pattern_data, frame, transaction_limit, chunk_size) for (pattern_data, _), frame in zip(specs, frames)]
+    for index, future in queue.imap_unordered(sar_partition_job, tasks):
+        record = {'index': index, 'pattern': specs[index][0]}
+        error = future.exception()
+        if error is not None:
+            failed += 1
+            record.update(status='error', message=f'{type(error).__name__}: {error}')
+        else:
+            record.update(status='success', **future.result())
+        yield record
+    
+    yield {
+        'status': 'complete',
+        'summary': {
+            'reports': len(specs) - failed,
+            'failed': failed,
+            'elapsed_seconds': round(time.time() - started, 3)
+        }
+    }
+
+def sar_job(db_path, pattern_data, transaction_limit, chunk_size):
+    """Job queue entry point: runs in a worker process with its own connection"""
+    conn = sqlite3.connect(db_path, timeout=30.0)
+    try:
+        conn.execute('PRAGMA query_only=ON')
+        return run_sar_generation(conn, pattern_data, transaction_limit, chunk_size)
+    finally:
+        conn.close()
+
 @autosar_bp.route('/generate', methods=['POST'])
 def generate_sar():
     """Generate SAR report"""
     try:
-        request_data = request.get_json()
+        try:
+            pattern_data, transaction_limit = parse_sar_request(request.get_json())
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
         
-        if not request_data:
-            return jsonify({'status': 'error', 'message': 'No data provided'}), 400
+        with get_pool().connection() as conn:
+            payload = run_sar_generation(conn, pattern_data, transaction_limit)
         
-        pattern_data = request_data.get('pattern', {})
-        scenario = pattern_data.get('scenario', 'terrorist_financing')
+        return jsonify({'status': 'success', **payload})
         
-        # Get transactions for the scenario (using parameterized query to prevent SQL injection)
-        conn = sqlite3.connect(Config.DATABASE_PATH)
-        query = "SELECT * FROM transactions WHERE scenario = ? AND suspicious_score > 0.5 LIMIT 50"
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@autosar_bp.route('/generate/batch', methods=['POST'])
+def generate_sar_batch():
+    """Generate SARs for many scenarios/account groups, streamed back as NDJSON"""
+    try:
+        try:
+            specs, transaction_limit = parse_sar_batch_request(request.get_json())
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
         
-        import pandas as pd
-        df = pd.read_sql_query(query, conn, params=[scenario])
-        conn.close()
+        # Fetch before streaming so the pooled connection is returned straight away
+        with get_pool().connection() as conn:
+            frames = fetch_sar_partitions(conn, specs)
         
-        transactions = df.to_dict('records')
+        records = stream_sar_batch(get_job_queue(), specs, frames, transaction_limit, Config.SAR_CHUNK_SIZE)
         
-        # Enhance transactions with Aadhar location data (similar to Chronos enhancement)
-        for t in transactions:
-            # Add enhanced location data with Aadhar information
-            t['aadhar_location'] = generate_aadhar_location_data()
-            t['country_risk_level'] = get_country_risk_assessment(t['aadhar_location']['country'])
-            t['transaction_method'] = get_realistic_transaction_method()
-            t['bank_details'] = generate_bank_details()
-            
-            # Legacy location for backward compatibility
-            t['from_location'] = random_india_location()
-            t['to_location'] = random_india_location()
+        def generate():
+            for record in records:
+                yield current_app.json.dumps(record) + '\n'
         
-        # Generate enhanced SAR report
-        sar_report = sar_generator.generate_sar_report(pattern_data, transactions)
+        return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
         
-        return jsonify({
-            'status': 'success',
-            'sar_report': sar_report,
-            'transactions': transactions
-        })
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@autosar_bp.route('/jobs', methods=['POST'])
+def submit_sar_job():
+    """Queue SAR generation on the background process pool"""
+    try:
+        try:
+            pattern_data, transaction_limit = parse_sar_request(request.get_json())
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
+        try:
+            job = get_job_queue().submit(
+                sar_job, get_pool().db_path, pattern_data, transaction_limit, Config.SAR_CHUNK_SIZE,
+                kind='sar'
+            )
+        except QueueFullError as e:
+            response = jsonify({'status': 'error', 'message': str(e)})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        
+        response = jsonify({'status': 'success', 'job': job.to_dict(include_result=False)})
+        response.headers['Location'] = f'{request.path}/{job.id}'
+        return response, 202
         
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@autosar_bp.route('/jobs/<job_id>', methods=['GET'])
+def get_sar_job(job_id):
+    """Job status, plus the SAR payload once completed"""
+    job = get_job_queue().get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': f'Unknown or expired job: {job_id}'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict()})
+
+@autosar_bp.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_sar_job(job_id):
+    """Cancel a queued job (a running job's result is discarded)"""
+    job = get_job_queue().cancel(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': f'Unknown or expired job: {job_id}'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict(include_result=False)})
+
 @autosar_bp.route('/templates', methods=['GET'])
+@cached_response
 def get_sar_templates():
     """Get available SAR templates"""
     try:
@@ -1167,86 +1215,49 @@ def get_sar_templates():
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @autosar_bp.route('/location-mapping', methods=['POST'])
+@cached_response
 def get_location_mapping():
     """Get location mapping data for SAR visualization"""
     try:
-        request_data = request.get_json()
-        scenario = request_data.get('scenario', 'all')
-        
-        # Get transactions with location data
-        conn = sqlite3.connect(Config.DATABASE_PATH)
-        query = "SELECT * FROM transactions WHERE scenario = ? LIMIT 100"
-        
-        import pandas as pd
-        df = pd.read_sql_query(query, conn, params=[scenario])
-        conn.close()
-        
-        # Generate location mapping data
-        location_mapping = []
-        transaction_clusters = {}
-        
-        for _, row in df.iterrows():
-            location_data = generate_aadhar_location_data()
-            country_risk = get_country_risk_assessment(location_data['country'])
-            
-            # Create location point for mapping
-            location_point = {
-                'transaction_id': row['transaction_id'],
-                'lat': location_data['lat'],
-                'lng': location_data['lng'],
-                'city': location_data['city'],
-                'state': location_data['state'],
-                'country': location_data['country'],
-                'amount': float(row['amount']),
-                'suspicious_score': float(row['suspicious_score']),
-                'country_risk_level': country_risk['level'],
-                'country_risk_color': country_risk['color'],
-                'timestamp': row['timestamp'],
-                'cluster_id': f"{location_data['city']}_{location_data['state']}"
-            }
-            
-            location_mapping.append(location_point)
-            
-            # Group by cluster for analysis
-            cluster_id = location_point['cluster_id']
-            if cluster_id not in transaction_clusters:
-                transaction_clusters[cluster_id] = {
-                    'location': f"{location_data['city']}, {location_data['state']}",
-                    'country': location_data['country'],
-                    'transaction_count': 0,
-                    'total_amount': 0,
-                    'avg_suspicion': 0,
-                    'risk_level': country_risk['level'],
-                    'coordinates': {'lat': location_data['lat'], 'lng': location_data['lng']}
-                }
-            
-            transaction_clusters[cluster_id]['transaction_count'] += 1
-            transaction_clusters[cluster_id]['total_amount'] += location_point['amount']
-        
-        # Calculate cluster averages
-        for cluster in transaction_clusters.values():
-            if cluster['transaction_count'] > 0:
-                cluster_transactions = [t for t in location_mapping if t['cluster_id'] == cluster['location'].replace(', ', '_')]
-                cluster['avg_suspicion'] = sum(t['suspicious_score'] for t in cluster_transactions) / len(cluster_transactions)
-        
-        # Generate risk heatmap data
-        risk_heatmap = generate_risk_heatmap(location_mapping)
-        
-        # Cross-border flow analysis
-        cross_border_flows = analyze_cross_border_flows(location_mapping)
+        request_data = request.get_json(silent=True) or {}
+        if not isinstance(request_data, dict):
+            return jsonify({'status': 'error', 'message': 'Request body must be a JSON object'}), 400
+        scenario = request_data.get('scenario', ALL_SCENARIOS)
+        try:
+            zoom, bbox = parse_heatmap_request(request_data)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
+        # Get transactions with location data ('all' reads every scenario, as the heatmap does)
+        where, params = scenario_filter(scenario)
+        query = f"""
+            SELECT t.*, {ENRICHMENT_SELECT} FROM transactions t {ENRICHMENT_JOIN}
+            {where} LIMIT 100
+        """
+        
+        with get_pool().connection() as conn:
+            df = fill_missing_enrichment(pd.read_sql_query(query, conn, params=params))
+            # Heatmap and corridors cover every transaction, read from the precomputed tiles and flow pairs
+            risk_heatmap = query_heatmap_cells(conn, zoom, bbox, scenario)
+            flows = query_flow_matrix(conn, scenario, COUNTRY_RISK_LEVELS)
+        
+        # One grouped pass; clusters and countries roll up from it
+        points = location_points_frame(df)
+        location_groups = aggregate_location_points(points)
         
         return jsonify({
             'status': 'success',
             'location_mapping': {
-                'transaction_points': location_mapping,
-                'clusters': transaction_clusters,
+                'transaction_points': points.to_dict('records'),
+                'clusters': summarize_location_clusters(location_groups),
                 'risk_heatmap': risk_heatmap,
-                'cross_border_flows': cross_border_flows,
+                'heatmap_zoom': zoom,
+                'cross_border_flows': analyze_cross_border_flows(location_groups, flows),
                 'summary': {
-                    'total_locations': len(location_mapping),
-                    'unique_cities': len(set(p['city'] for p in location_mapping)),
-                    'unique_countries': len(set(p['country'] for p in location_mapping)),
-                    'high_risk_transactions': len([p for p in location_mapping if p['country_risk_level'] >= 3])
+                    'total_locations': len(points),
+                    'unique_cities': int(points['city'].nunique()),
+                    'unique_countries': int(points['country'].nunique()),
+                    'high_risk_transactions': int((points['country_risk_level'] >= 3).sum())
                 }
             }
         })
@@ -1256,174 +1267,176 @@ def get_location_mapping():
 
 # Enhanced helper functions
 
-def generate_aadhar_location_data():
-    """Generate realistic Aadhar-based location data"""
-    indian_locations = [
-        {'state': 'Maharashtra', 'city': 'Mumbai', 'region': 'Western', 'country': 'India'},
-        {'state': 'Delhi', 'city': 'New Delhi', 'region': 'Northern', 'country': 'India'},
-        {'state': 'Karnataka', 'city': 'Bangalore', 'region': 'Southern', 'country': 'India'},
-        {'state': 'Tamil Nadu', 'city': 'Chennai', 'region': 'Southern', 'country': 'India'},
-        {'state': 'West Bengal', 'city': 'Kolkata', 'region': 'Eastern', 'country': 'India'},
-        {'state': 'Gujarat', 'city': 'Ahmedabad', 'region': 'Western', 'country': 'India'},
-        {'state': 'Rajasthan', 'city': 'Jaipur', 'region': 'Western', 'country': 'India'},
-        {'state': 'Punjab', 'city': 'Chandigarh', 'region': 'Northern', 'country': 'India'},
-        {'state': 'Uttar Pradesh', 'city': 'Lucknow', 'region': 'Northern', 'country': 'India'},
-    ]
-    
-    # Add some international locations for suspicious transactions (15% chance)
-    international_locations = [
-        {'state': 'Dubai', 'city': 'Dubai', 'region': 'Middle East', 'country': 'UAE'},
-        {'state': 'Singapore', 'city': 'Singapore', 'region': 'Southeast Asia', 'country': 'Singapore'},
-        {'state': 'Karachi', 'city': 'Karachi', 'region': 'South Asia', 'country': 'Pakistan'},
-        {'state': 'London', 'city': 'London', 'region': 'Europe', 'country': 'UK'},
-        {'state': 'New York', 'city': 'New York', 'region': 'North America', 'country': 'USA'},
-    ]
-    
-    # 85% chance of Indian location, 15% international
-    if random.random() < 0.85:
-        location = random.choice(indian_locations)
-    else:
-        location = random.choice(international_locations)
-    
-    # Add coordinates
-    coordinates = get_location_coordinates(location['city'])
-    location.update(coordinates)
-    
-    return location
-
-def get_location_coordinates(city):
-    """Get coordinates for cities"""
-    coordinates_map = {
-        'Mumbai': {'lat': 19.0760, 'lng': 72.8777},
-        'New Delhi': {'lat': 28.6139, 'lng': 77.2090},
-        'Bangalore': {'lat': 12.9716, 'lng': 77.5946},
-        'Chennai': {'lat': 13.0827, 'lng': 80.2707},
-        'Kolkata': {'lat': 22.5726, 'lng': 88.3639},
-        'Ahmedabad': {'lat': 23.0225, 'lng': 72.5714},
-        'Jaipur': {'lat': 26.9124, 'lng': 75.7873},
-        'Chandigarh': {'lat': 30.7333, 'lng': 76.7794},
-        'Lucknow': {'lat': 26.8467, 'lng': 80.9462},
-        'Dubai': {'lat': 25.2048, 'lng': 55.2708},
-        'Singapore': {'lat': 1.3521, 'lng': 103.8198},
-        'Karachi': {'lat': 24.8607, 'lng': 67.0011},
-        'London': {'lat': 51.5074, 'lng': -0.1278},
-        'New York': {'lat': 40.7128, 'lng': -74.0060},
-    }
-    
-    return coordinates_map.get(city, {'lat': 0, 'lng': 0})
-
 def get_country_risk_assessment(country):
     """Get country risk assessment"""
-    high_risk_countries = ['Pakistan', 'Afghanistan', 'North Korea', 'Iran']
-    medium_risk_countries = ['UAE', 'Malaysia', 'Thailand', 'Myanmar']
-    
-    if country in high_risk_countries:
+    level = COUNTRY_RISK_LEVELS.get(country, 1)
+    if level == 3:
         return {'level': 3, 'description': 'High Risk Country', 'color': '#ff4444'}
-    elif country in medium_risk_countries:
+    elif level == 2:
         return {'level': 2, 'description': 'Medium Risk Country', 'color': '#ffaa00'}
     else:
         return {'level': 1, 'description': 'Low Risk Country', 'color': '#44ff44'}
 
-def get_realistic_transaction_method():
-    """Generate realistic transaction method"""
-    methods = [
-        'NEFT', 'RTGS', 'IMPS', 'UPI', 'Wire Transfer', 
-        'Cryptocurrency', 'Hawala', 'Cash Deposit', 'Cheque', 'Digital Wallet'
-    ]
-    return random.choice(methods)
+def location_points_frame(df):
+    """Map points (one row per transaction) from an enrichment-filled transactions frame"""
+    countries = df['loc_country']
+    risk = {country: get_country_risk_assessment(country) for country in countries.unique()}
+    return pd.DataFrame({
+        'transaction_id': df['transaction_id'],
+        'lat': df['loc_lat'].astype(float),
+        'lng': df['loc_lng'].astype(float),
+        'city': df['loc_city'],
+        'state': df['loc_state'],
+        'country': countries,
+        'amount': df['amount'].astype(float),
+        'suspicious_score': df['suspicious_score'].astype(float),
+        'country_risk_level': countries.map(lambda c: risk[c]['level']),
+        'country_risk_color': countries.map(lambda c: risk[c]['color']),
+        'timestamp': df['timestamp'],
+        'cluster_id': df['loc_city'] + '_' + df['loc_state']
+    })
 
-def generate_bank_details():
-    """Generate realistic bank details"""
-    banks = [
-        'State Bank of India', 'HDFC Bank', 'ICICI Bank', 'Axis Bank',
-        'Punjab National Bank', 'Bank of Baroda', 'Canara Bank', 'IDBI Bank',
-        'Central Bank of India', 'Union Bank of India'
-    ]
-    
+def aggregate_location_points(points):
+    """Counts and sums per city/state, in one grouped pass over the points
+
+    Rows keep first-seen order, so 'first' columns describe the first point of
+    each group; the country summary is a roll-up of this small table.
+    """
+    return points.groupby(['city', 'state'], sort=False).agg(
+        country=('country', 'first'),
+        lat=('lat', 'first'),
+        lng=('lng', 'first'),
+        risk_level=('country_risk_level', 'first'),
+        transaction_count=('amount', 'size'),
+        total_amount=('amount', 'sum'),
+        suspicion_sum=('suspicious_score', 'sum')
+    ).reset_index()
+
+def summarize_location_clusters(groups):
+    """Per city/state cluster totals and mean suspicion, keyed by cluster_id"""
     return {
-        'bank_name': random.choice(banks),
-        'branch_code': f'BR{random.randint(1000, 9999)}',
-        'ifsc_code': f'SBIN{random.randint(100000, 999999)}',
-        'swift_code': f'SWIFT{random.randint(10000, 99999)}'
+        f"{c['city']}_{c['state']}": {
+            'location': f"{c['city']}, {c['state']}",
+            'country': c['country'],
+            'transaction_count': int(c['transaction_count']),
+            'total_amount': c['total_amount'],
+            'avg_suspicion': c['suspicion_sum'] / c['transaction_count'],
+            'risk_level': int(c['risk_level']),
+            'coordinates': {'lat': c['lat'], 'lng': c['lng']}
+        }
+        for c in groups.to_dict('records')
     }
 
-def generate_risk_heatmap(location_points):
-    """Generate risk heatmap data for visualization"""
-    heatmap_data = []
+def parse_heatmap_request(request_data):
+    """Validate the optional zoom and bbox [south, west, north, east] of a location-mapping body"""
+    try:
+        zoom = int(request_data.get('zoom', DEFAULT_HEATMAP_ZOOM))
+    except (TypeError, ValueError):
+        raise ValueError('zoom must be an integer')
+    if zoom not in HEATMAP_ZOOM_LEVELS:
+        raise ValueError(f'zoom must be one of {sorted(HEATMAP_ZOOM_LEVELS)}')
     
-    # Group points by geographic regions
-    region_risk = {}
+    bbox = request_data.get('bbox')
+    if bbox is not None:
+        try:
+            bbox = tuple(float(v) for v in bbox)
+        except (TypeError, ValueError):
+            raise ValueError('bbox must be [south, west, north, east]')
+        if len(bbox) != 4 or bbox[0] > bbox[2]:
+            raise ValueError('bbox must be [south, west, north, east]')
+    return zoom, bbox
+
+def scenario_filter(scenario):
+    """WHERE clause and parameters selecting one scenario of transactions `t`, or every one for 'all'"""
+    if scenario == ALL_SCENARIOS:
+        return '', []
+    return 'WHERE t.scenario = ?', [scenario]
+
+def analyze_cross_border_flows(groups, flows):
+    """Country roll-up of the location groups plus the real origin-destination corridors"""
+    # Roll city/state groups up to countries
+    summary = groups.groupby('country', sort=False).agg(
+        risk_level=('risk_level', 'first'),
+        transaction_count=('transaction_count', 'sum'),
+        total_amount=('total_amount', 'sum'),
+        suspicion_sum=('suspicion_sum', 'sum')
+    ).reset_index()
+    countries = [
+        {
+            'country': c['country'],
+            'transaction_count': int(c['transaction_count']),
+            'total_amount': c['total_amount'],
+            'avg_suspicion': c['suspicion_sum'] / c['transaction_count'],
+            'risk_level': int(c['risk_level'])
+        }
+        for c in summary.to_dict('records')
+    ]
     
-    for point in location_points:
-        key = f"{point['lat']:.1f},{point['lng']:.1f}"  # Round to create regions
-        
-        if key not in region_risk:
-            region_risk[key] = {
-                'lat': round(point['lat'], 1),
-                'lng': round(point['lng'], 1),
-                'risk_score': 0,
-                'transaction_count': 0,
-                'total_amount': 0
-            }
-        
-        # Calculate weighted risk score
-        risk_weight = point['suspicious_score'] * point['country_risk_level']
-        region_risk[key]['risk_score'] += risk_weight
-        region_risk[key]['transaction_count'] += 1
-        region_risk[key]['total_amount'] += point['amount']
+    return {
+        'country_summary': countries,
+        'cross_border_flows': flows.corridors('country', by='volume', cross_border=True),
+        'top_corridors': {
+            'by_volume': flows.corridors('city', by='volume'),
+            'by_risk': flows.corridors('city', by='risk')
+        },
+        'flow_transaction_count': flows.transaction_count,
+        'high_risk_countries': [c for c in countries if c['risk_level'] >= 3]
+    }
+
+def main(argv=None):
+    """Command-line batch SARs: python api/autosar_api.py --all-templates > sars.ndjson"""
+    from utils.job_queue import JobQueue
     
-    # Normalize risk scores
-    for region in region_risk.values():
-        if region['transaction_count'] > 0:
-            region['avg_risk_score'] = region['risk_score'] / region['transaction_count']
-            region['intensity'] = min(region['avg_risk_score'] * region['transaction_count'] / 10, 1.0)
-        
-        heatmap_data.append(region)
+    parser = argparse.ArgumentParser(description='Generate SAR reports for many scenarios/account groups as NDJSON')
+    parser.add_argument('--scenario', action='append', default=[], help='Scenario to report on (repeatable)')
+    parser.add_argument('--all-templates', action='store_true', help='Report on every SAR template scenario')
+    parser.add_argument('--group', action='append', default=[], metavar='NAME=ACC1,ACC2',
+                        help='Account group to report on (repeatable)')
+    parser.add_argument('--db', default=Config.DATABASE_PATH, help='SQLite database path')
+    parser.add_argument('--workers', type=int, default=Config.JOB_WORKERS)
+    parser.add_argument('--transaction-limit', type=int, default=DEFAULT_SAR_TRANSACTION_LIMIT)
+    parser.add_argument('--output', default='-', help="NDJSON output file, or '-' for stdout")
+    args = parser.parse_args(argv)
     
-    return heatmap_data
-
-def analyze_cross_border_flows(location_points):
-    """Analyze cross-border transaction flows"""
-    flows = []
-    countries = {}
+    groups = []
+    for group in args.group:
+        name, _, accounts = group.partition('=')
+        groups.append({'account_group': name, 'accounts': [a for a in accounts.split(',') if a]})
+    try:
+        specs, transaction_limit = parse_sar_batch_request({
+            'scenarios': args.scenario,
+            'all_templates': args.all_templates,
+            'account_groups': groups,
+            'transaction_limit': args.transaction_limit
+        })
+    except ValueError as e:
+        parser.error(str(e))
     
-    # Group by country
-    for point in location_points:
-        country = point['country']
-        if country not in countries:
-            countries[country] = {
-                'country': country,
-                'transaction_count': 0,
-                'total_amount': 0,
-                'avg_suspicion': 0,
-                'risk_level': point['country_risk_level']
-            }
-        
-        countries[country]['transaction_count'] += 1
-        countries[country]['total_amount'] += point['amount']
+    from data.migrations import apply_migrations
     
-    # Calculate averages
-    for country_data in countries.values():
-        if country_data['transaction_count'] > 0:
-            country_points = [p for p in location_points if p['country'] == country_data['country']]
-            country_data['avg_suspicion'] = sum(p['suspicious_score'] for p in country_points) / len(country_points)
+    conn = sqlite3.connect(args.db, timeout=30.0)
+    try:
+        apply_migrations(conn)
+        frames = fetch_sar_partitions(conn, specs)
+    finally:
+        conn.close()
     
-    # Generate flow connections between high-activity countries
-    country_list = list(countries.values())
-    for i, country1 in enumerate(country_list):
-        for country2 in country_list[i+1:]:
-            if country1['transaction_count'] > 5 and country2['transaction_count'] > 5:
-                # Create flow between countries
-                flow_strength = min(country1['transaction_count'], country2['transaction_count']) / 100
-                flows.append({
-                    'from_country': country1['country'],
-                    'to_country': country2['country'],
-                    'strength': flow_strength,
-                    'risk_level': max(country1['risk_level'], country2['risk_level'])
-                })
+    queue = JobQueue(max_workers=args.workers, max_pending=len(specs))
+    output = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    try:
+        for record in stream_sar_batch(queue, specs, frames, transaction_limit, Config.SAR_CHUNK_SIZE):
+            output.write(json.dumps(record, default=str) + '\n')
+            output.flush()
+            if record['status'] == 'error':
+                print(f"⚠️ {record['pattern']}: {record['message']}", file=sys.stderr)
+    finally:
+        queue.shutdown()
+        if output is not sys.stdout:
+            output.close()
     
-    return {
-        'country_summary': list(countries.values()),
-        'cross_border_flows': flows,
-        'high_risk_countries': [c for c in countries.values() if c['risk_level'] >= 3]
-    }
\ No newline at end of file
+    summary = record['summary']
+    print(f"✅ {summary['reports']} SAR reports, {summary['failed']} failed in {summary['elapsed_seconds']}s",
+          file=sys.stderr)
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,57 @@
 from flask import Blueprint, jsonify, request
-import sqlite3
 import pandas as pd
+import numpy as np
 from datetime import datetime, timedelta
 import sys
 import os
-import json
-import random
+import gc
+import base64
 
 sys.path.append(os.path.dirname(os.path.dirname(__file__)))
-from config import Config
+from utils.db_pool import get_pool
+from utils.response_cache import cached_response
+from utils.time_utils import to_epoch, from_epoch
+from data.enrichment import ENRICHMENT_SELECT, ENRICHMENT_JOIN, fill_missing_enrichment
+from models.temporal_activity import TemporalActivity
 
 chronos_bp = Blueprint('chronos', __name__)
 
+DEFAULT_PAGE_SIZE = 5000
+MAX_PAGE_SIZE = 50000
+
+# Bucket widths for ?resolution=; weeks start on Monday
+BUCKET_SECONDS = {
+    'hour': 3600,
+    'day': 86400,
+    'week': 7 * 86400
+}
+# 1970-01-01 was a Thursday, so shift week buckets back three days
+BUCKET_OFFSETS = {
+    'week': 3 * 86400
+}
+DEFAULT_CRITICAL_LIMIT = 5000
+
+# Rows read per chunk for ?velocity= account profiles
+VELOCITY_CHUNK_SIZE = 100000
+
+DEFAULT_SEARCH_LIMIT = 100
+MAX_SEARCH_LIMIT = 1000
+
+# Trigram index columns searched for each search type
+SEARCH_COLUMNS = {
+    'account': ['from_account', 'to_account'],
+    'id': ['transaction_id'],
+    'all': ['transaction_id', 'from_account', 'to_account', 'amount_text']
+}
+
 @chronos_bp.route('/timeline', methods=['GET'])
+@cached_response
 def get_timeline_data():
     """Get enhanced transaction timeline data for CHRONOS visualization with time quantum selection"""
     try:
         scenario = request.args.get('scenario', 'all')
         time_quantum = request.args.get('time_quantum', '1m')  # 1m, 6m, 1y, 3y
         
-        conn = sqlite3.connect(Config.DATABASE_PATH)
-        
         # Calculate time range based on quantum
         now = datetime.now()
         if time_quantum == '1m':
@@ -34,62 +65,135 @@ def get_timeline_data():
         else:
             start_date = now - timedelta(days=30)  # Default to 1 month
         
-        # Build query based on scenario and time range
-        if scenario == 'all':
-            query = "SELECT * FROM transactions WHERE timestamp >= ? ORDER BY timestamp"
-            df = pd.read_sql_query(query, conn, params=[start_date.isoformat()])
-        else:
-            query = "SELECT * FROM transactions WHERE scenario = ? AND timestamp >= ? ORDER BY timestamp"
-            df = pd.read_sql_query(query, conn, params=[scenario, start_date.isoformat()])
-        conn.close()
+        # Page size, keyset cursor and field projection
+        try:
+            page_size = min(max(int(request.args.get('page_size', DEFAULT_PAGE_SIZE)), 1), MAX_PAGE_SIZE)
+            critical_limit = min(max(int(request.args.get('critical_limit', DEFAULT_CRITICAL_LIMIT)), 1), MAX_PAGE_SIZE)
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'page_size and critical_limit must be integers'}), 400
+        cursor = request.args.get('cursor')
+        fields = parse_fields(request.args.get('fields'))
+        if fields is None:
+            return jsonify({
+                'status': 'error',
+                'message': f"Unknown field requested; valid fields: {', '.join(TIMELINE_FIELDS)}"
+            }), 400
+        
+        # Build query based on scenario and time range (index seek on ts_epoch, id)
+        start_epoch = to_epoch(start_date)
+        range_conditions = ["ts_epoch >= ?"]
+        range_params = [start_epoch]
+        if scenario != 'all':
+            range_conditions.insert(0, "scenario = ?")
+            range_params.insert(0, scenario)
+        
+        # Per-account rolling windows, bursts and interval regularity over the whole range
+        include_velocity = request.args.get('velocity', 'false').lower() in ('1', 'true', 'yes')
         
-        # Convert to enhanced timeline format with layering analysis
-        timeline_data = []
-        for _, row in df.iterrows():
-            # Generate realistic Aadhar-based location data
-            aadhar_location = generate_aadhar_location()
+        # Downsampled mode: fixed-size per-bucket aggregates instead of raw rows
+        resolution = request.args.get('resolution')
+        if resolution:
+            if resolution not in BUCKET_SECONDS:
+                return jsonify({
+                    'status': 'error',
+                    'message': f"Unknown resolution; valid values: {', '.join(BUCKET_SECONDS)}"
+                }), 400
+            include_critical = request.args.get('include_critical', 'false').lower() in ('1', 'true', 'yes')
             
-            # Apply layering method analysis
-            layering_analysis = apply_layering_method(row)
+            with get_pool().connection() as conn:
+                buckets = query_timeline_buckets(conn, range_conditions, range_params, resolution)
+                critical_df = None
+                if include_critical:
+                    critical_query = enrichment_query(
+                        ' AND '.join(range_conditions + ["suspicious_score > 0.8"]), "ts_epoch, id"
+                    )
+                    critical_df = pd.read_sql_query(critical_query, conn, params=range_params + [critical_limit + 1])
+                account_velocity = query_account_velocity(conn, range_conditions, range_params) if include_velocity else None
             
-            timeline_data.append({
-                'id': row['transaction_id'],
-                'timestamp': row['timestamp'],
-                'from_account': row['from_account'],
-                'to_account': row['to_account'],
-                'amount': float(row['amount']),
-                'suspicious_score': float(row['suspicious_score']),
-                'pattern_type': row['pattern_type'],
-                'scenario': row['scenario'],
-                # Enhanced fields
-                'aadhar_location': aadhar_location,
-                'layering_analysis': layering_analysis,
-                'country_risk_level': get_country_risk_level(aadhar_location['country']),
-                'transaction_method': get_transaction_method(),
-                'bank_details': generate_bank_details()
-            })
+            counts = {level: sum(b['threat_levels'][level] for b in buckets) for level in ('critical', 'medium', 'low')}
+            total = sum(b['count'] for b in buckets)
+            response = {
+                'status': 'success',
+                'resolution': resolution,
+                'buckets': buckets,
+                'total_transactions': total,
+                'time_quantum': time_quantum,
+                'date_range': {
+                    'start': start_date.isoformat(),
+                    'end': now.isoformat()
+                },
+                'layering_summary': summarize_threat_counts(total, counts['critical'], counts['medium'], counts['low'])
+            }
+            if critical_df is not None:
+                overlay_fields = fields if request.args.get('fields') else BASE_FIELDS
+                response['critical_overlay'] = enrich_transactions(critical_df.iloc[:critical_limit], overlay_fields)
+                response['critical_overlay_truncated'] = len(critical_df) > critical_limit
+            if account_velocity is not None:
+                response['account_velocity'] = account_velocity
+            
+            return jsonify(response)
         
-        return jsonify({
+        # The page starts after max(cursor, start of range); expressing both as a
+        # single row-value bound lets SQLite seek straight to the cursor position
+        page_key = [start_epoch, -1]
+        if cursor:
+            try:
+                page_key = max(page_key, decode_cursor(cursor))
+            except ValueError as e:
+                return jsonify({'status': 'error', 'message': str(e)}), 400
+        conditions = range_conditions[:-1] + ["(ts_epoch, id) > (?, ?)"]
+        params = range_params[:-1] + page_key
+        
+        query = enrichment_query(' AND '.join(conditions), "t.ts_epoch, t.id")
+        with get_pool().connection() as conn:
+            # One extra row tells us whether another page exists
+            df = pd.read_sql_query(query, conn, params=params + [page_size + 1])
+            
+            # Range totals come from an aggregate query, once per traversal
+            summary = None
+            account_velocity = None
+            if not cursor:
+                summary = query_layering_summary(conn, range_conditions, range_params)
+                if include_velocity:
+                    account_velocity = query_account_velocity(conn, range_conditions, range_params)
+        
+        has_more = len(df) > page_size
+        df = df.iloc[:page_size]
+        next_cursor = encode_cursor(df['ts_epoch'].iloc[-1], df['id'].iloc[-1]) if has_more else None
+        
+        # Convert to enhanced timeline format with layering analysis (columnar pass)
+        timeline_data = enrich_transactions(df, fields)
+        
+        response = {
             'status': 'success',
             'data': timeline_data,
-            'total_transactions': len(timeline_data),
+            'returned': len(timeline_data),
+            'page_size': page_size,
+            'has_more': has_more,
+            'next_cursor': next_cursor,
+            'fields': fields,
             'time_quantum': time_quantum,
             'date_range': {
                 'start': start_date.isoformat(),
                 'end': now.isoformat()
-            },
-            'layering_summary': generate_layering_summary(timeline_data)
-        })
+            }
+        }
+        if summary is not None:
+            response['total_transactions'] = summary.get('total_transactions', 0)
+            response['layering_summary'] = summary
+        if account_velocity is not None:
+            response['account_velocity'] = account_velocity
+        
+        return jsonify(response)
         
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @chronos_bp.route('/patterns', methods=['GET'])
+@cached_response
 def get_pattern_analysis():
     """Get detected patterns for visualization"""
     try:
-        conn = sqlite3.connect(Config.DATABASE_PATH)
-        
         # Get pattern statistics
         query = """
             SELECT 
@@ -102,8 +206,8 @@ def get_pattern_analysis():
             GROUP BY pattern_type, scenario
         """
         
-        df = pd.read_sql_query(query, conn)
-        conn.close()
+        with get_pool().connection() as conn:
+            df = pd.read_sql_query(query, conn)
         
         patterns = df.to_dict('records')
         
@@ -119,67 +223,35 @@ def get_pattern_analysis():
 def search_transactions():
     """Search transactions with detailed popup information"""
     try:
-        search_data = request.get_json()
+        search_data = request.get_json(silent=True) or {}
         search_term = search_data.get('term', '')
         search_type = search_data.get('type', 'all')  # all, amount, account, id
+        try:
+            limit = min(max(int(search_data.get('limit', DEFAULT_SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+        except (TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'limit must be an integer'}), 400
         
-        conn = sqlite3.connect(Config.DATABASE_PATH)
-        
-        # Build search query based on type
-        if search_type == 'amount':
-            query = "SELECT * FROM transactions WHERE amount = ? ORDER BY timestamp DESC"
-            df = pd.read_sql_query(query, conn, params=[float(search_term)])
-        elif search_type == 'account':
-            query = "SELECT * FROM transactions WHERE from_account LIKE ? OR to_account LIKE ? ORDER BY timestamp DESC"
-            df = pd.read_sql_query(query, conn, params=[f'%{search_term}%', f'%{search_term}%'])
-        elif search_type == 'id':
-            query = "SELECT * FROM transactions WHERE transaction_id LIKE ? ORDER BY timestamp DESC"
-            df = pd.read_sql_query(query, conn, params=[f'%{search_term}%'])
-        else:
-            # Search all fields
-            query = """
-                SELECT * FROM transactions 
-                WHERE transaction_id LIKE ? 
-                OR from_account LIKE ? 
-                OR to_account LIKE ? 
-                OR CAST(amount AS TEXT) LIKE ?
-                ORDER BY timestamp DESC
-            """
-            search_pattern = f'%{search_term}%'
-            df = pd.read_sql_query(query, conn, params=[search_pattern, search_pattern, search_pattern, search_pattern])
-        
-        conn.close()
+        # Top-k ranked lookup through the trigram index (or amount index)
+        try:
+            query, params = build_search_query(search_term, search_type, limit)
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'amount searches need a numeric term'}), 400
+        with get_pool().connection() as conn:
+            df = pd.read_sql_query(query, conn, params=params)
         
         # Format search results with enhanced details
-        results = []
-        for _, row in df.iterrows():
-            aadhar_location = generate_aadhar_location()
-            layering_analysis = apply_layering_method(row)
-            
-            results.append({
-                'id': row['transaction_id'],
-                'timestamp': row['timestamp'],
-                'from_account': row['from_account'],
-                'to_account': row['to_account'],
-                'amount': float(row['amount']),
-                'suspicious_score': float(row['suspicious_score']),
-                'pattern_type': row['pattern_type'],
-                'scenario': row['scenario'],
-                'aadhar_location': aadhar_location,
-                'layering_analysis': layering_analysis,
-                'country_risk_level': get_country_risk_level(aadhar_location['country']),
-                'transaction_method': get_transaction_method(),
-                'bank_details': generate_bank_details(),
-                'match_type': search_type,
-                'match_score': calculate_match_score(row, search_term, search_type)
-            })
+        results = enrich_transactions(df)
+        for result, (_, row) in zip(results, df.iterrows()):
+            result['match_type'] = search_type
+            result['match_score'] = calculate_match_score(row, search_term, search_type)
         
         return jsonify({
             'status': 'success',
             'results': results,
             'total_matches': len(results),
             'search_term': search_term,
-            'search_type': search_type
+            'search_type': search_type,
+            'limit': limit
         })
         
     except Exception as e:
@@ -187,113 +259,73 @@ def search_transactions():
 
 # Helper Functions
 
-def generate_aadhar_location():
-    """Generate realistic Aadhar-based location data"""
-    indian_locations = [
-        {'state': 'Maharashtra', 'city': 'Mumbai', 'region': 'Western', 'country': 'India'},
-        {'state': 'Delhi', 'city': 'New Delhi', 'region': 'Northern', 'country': 'India'},
-        {'state': 'Karnataka', 'city': 'Bangalore', 'region': 'Southern', 'country': 'India'},
-        {'state': 'Tamil Nadu', 'city': 'Chennai', 'region': 'Southern', 'country': 'India'},
-        {'state': 'West Bengal', 'city': 'Kolkata', 'region': 'Eastern', 'country': 'India'},
-        {'state': 'Gujarat', 'city': 'Ahmedabad', 'region': 'Western', 'country': 'India'},
-        {'state': 'Rajasthan', 'city': 'Jaipur', 'region': 'Western', 'country': 'India'},
-        {'state': 'Punjab', 'city': 'Chandigarh', 'region': 'Northern', 'country': 'India'},
-        {'state': 'Uttar Pradesh', 'city': 'Lucknow', 'region': 'Northern', 'country': 'India'},
-    ]
-    
-    # Add some international locations for suspicious transactions
-    international_locations = [
-        {'state': 'Dubai', 'city': 'Dubai', 'region': 'Middle East', 'country': 'UAE'},
-        {'state': 'Singapore', 'city': 'Singapore', 'region': 'Southeast Asia', 'country': 'Singapore'},
-        {'state': 'Karachi', 'city': 'Karachi', 'region': 'South Asia', 'country': 'Pakistan'},
-        {'state': 'London', 'city': 'London', 'region': 'Europe', 'country': 'UK'},
-        {'state': 'New York', 'city': 'New York', 'region': 'North America', 'country': 'USA'},
-    ]
-    
-    # 85% chance of Indian location, 15% international
-    if random.random() < 0.85:
-        location = random.choice(indian_locations)
-    else:
-        location = random.choice(international_locations)
-    
-    # Add coordinates for mapping
-    coordinates = get_location_coordinates(location['city'])
-    location.update(coordinates)
-    
-    return location
-
-def get_location_coordinates(city):
-    """Get approximate coordinates for cities"""
-    coordinates_map = {
-        'Mumbai': {'lat': 19.0760, 'lng': 72.8777},
-        'New Delhi': {'lat': 28.6139, 'lng': 77.2090},
-        'Bangalore': {'lat': 12.9716, 'lng': 77.5946},
-        'Chennai': {'lat': 13.0827, 'lng': 80.2707},
-        'Kolkata': {'lat': 22.5726, 'lng': 88.3639},
-        'Ahmedabad': {'lat': 23.0225, 'lng': 72.5714},
-        'Jaipur': {'lat': 26.9124, 'lng': 75.7873},
-        'Chandigarh': {'lat': 30.7333, 'lng': 76.7794},
-        'Lucknow': {'lat': 26.8467, 'lng': 80.9462},
-        'Dubai': {'lat': 25.2048, 'lng': 55.2708},
-        'Singapore': {'lat': 1.3521, 'lng': 103.8198},
-        'Karachi': {'lat': 24.8607, 'lng': 67.0011},
-        'London': {'lat': 51.5074, 'lng': -0.1278},
-        'New York': {'lat': 40.7128, 'lng': -74.0060},
-    }
-    
-    return coordinates_map.get(city, {'lat': 0, 'lng': 0})
-
-def apply_layering_method(transaction_row):
-    """Apply layering method analysis for pattern detection"""
-    layering_analysis = {
-        'layer_1_extraction': {
-            'description': 'Transaction data extraction and basic pattern identification',
-            'patterns_detected': [],
-            'risk_indicators': []
-        },
-        'layer_2_processing': {
-            'description': 'Advanced pattern analysis and relationship mapping',
-            'connected_accounts': random.randint(2, 15),
-            'temporal_patterns': [],
-            'amount_patterns': []
-        },
-        'layer_3_integration': {
-            'description': 'Cross-reference with known threat patterns and geolocation',
-            'threat_level': 'LOW',
-            'geolocation_risk': 'NORMAL',
-            'pattern_match_confidence': 0.0
-        }
-    }
-    
-    suspicious_score = float(transaction_row['suspicious_score'])
-    amount = float(transaction_row['amount'])
-    pattern_type = transaction_row['pattern_type']
-    
-    # Layer 1: Basic pattern detection
-    if amount < 10000:
-        layering_analysis['layer_1_extraction']['patterns_detected'].append('Small value transaction')
-    elif amount > 500000:
-        layering_analysis['layer_1_extraction']['patterns_detected'].append('Large value transaction')
-        layering_analysis['layer_1_extraction']['risk_indicators'].append('High amount alert')
+def encode_cursor(ts_epoch, row_id):
+    """Opaque keyset cursor for the last row of a page"""
+    raw = f'{int(ts_epoch)}:{int(row_id)}'.encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+def decode_cursor(cursor):
+    """Inverse of encode_cursor -> [ts_epoch, id]"""
+    try:
+        ts_epoch, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split(':')
+        return [int(ts_epoch), int(row_id)]
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+def parse_fields(fields_param):
+    """Parse ?fields=a,b,c into a field list (None if any field is unknown)"""
+    if not fields_param:
+        return list(TIMELINE_FIELDS)
+    fields = [f.strip() for f in fields_param.split(',') if f.strip()]
+    if any(f not in TIMELINE_FIELDS for f in fields):
+        return None
+    return [f for f in TIMELINE_FIELDS if f in fields]
+
+def query_layering_summary(conn, conditions, params):
+    """Threat-level distribution for a whole timeline range via one aggregate query"""
+    query = f"""
+        SELECT
+            COUNT(*),
+            SUM(CASE WHEN suspicious_score > 0.8 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN suspicious_score > 0.5 AND suspicious_score <= 0.8 THEN 1 ELSE 0 END)
+        FROM transactions
+        WHERE {' AND '.join(conditions)}
+    """
+    total, critical, medium = conn.execute(query, params).fetchone()
+    critical = critical or 0
+    medium = medium or 0
+    return summarize_threat_counts(total, critical, medium, total - critical - medium)
+
+def build_search_query(search_term, search_type, limit):
+    """Build a ranked top-k search query and its parameters (ValueError for a non-numeric amount)"""
+    search_term = str(search_term)
     
-    if pattern_type in ['rapid_sequence', 'smurfing']:
-        layering_analysis['layer_1_extraction']['patterns_detected'].append('Structured layering detected')
-        layering_analysis['layer_1_extraction']['risk_indicators'].append('Potential money laundering')
+    if search_type == 'amount':
+        query = enrichment_query("t.amount = ?", "t.ts_epoch DESC")
+        return query, [float(search_term), limit]
     
-    # Layer 2: Advanced processing
-    if suspicious_score > 0.7:
-        layering_analysis['layer_2_processing']['temporal_patterns'].append('Suspicious timing patterns')
-        layering_analysis['layer_2_processing']['amount_patterns'].append('Irregular amount structure')
+    columns = SEARCH_COLUMNS.get(search_type, SEARCH_COLUMNS['all'])
     
-    # Layer 3: Integration and final assessment
-    if suspicious_score > 0.8:
-        layering_analysis['layer_3_integration']['threat_level'] = 'CRITICAL'
-        layering_analysis['layer_3_integration']['pattern_match_confidence'] = suspicious_score
-    elif suspicious_score > 0.5:
-        layering_analysis['layer_3_integration']['threat_level'] = 'MEDIUM'
-        layering_analysis['layer_3_integration']['pattern_match_confidence'] = suspicious_score
+    if len(search_term) >= 3:
+        # Quoted phrase restricted to the requested columns; bm25 rank ordering
+        # lets FTS5 stop after the first `limit` matches
+        phrase = '"' + search_term.replace('"', '""') + '"'
+        match = '{' + ' '.join(columns) + '} : ' + phrase
+        query = f"""
+            SELECT t.*, {ENRICHMENT_SELECT} FROM transactions_fts
+            JOIN transactions t ON t.id = transactions_fts.rowid
+            {ENRICHMENT_JOIN}
+            WHERE transactions_fts MATCH ?
+            ORDER BY transactions_fts.rank
+            LIMIT ?
+        """
+        return query, [match, limit]
     
-    return layering_analysis
+    # Trigrams need at least three characters; short terms fall back to a bounded scan
+    column_sql = {'amount_text': 'CAST(t.amount AS TEXT)'}
+    conditions = ' OR '.join(f"{column_sql.get(c, 't.' + c)} LIKE ?" for c in columns)
+    query = enrichment_query(f"({conditions})", "t.ts_epoch DESC")
+    return query, [f'%{search_term}%'] * len(columns) + [limit]
 
 def get_country_risk_level(country):
     """Get risk level based on country"""
@@ -307,50 +339,262 @@ def get_country_risk_level(country):
     else:
         return {'level': 1, 'description': 'Low Risk Country', 'color': '#44ff44'}
 
-def get_transaction_method():
-    """Generate realistic transaction method"""
-    methods = [
-        'NEFT', 'RTGS', 'IMPS', 'UPI', 'Wire Transfer', 
-        'Cryptocurrency', 'Hawala', 'Cash Deposit', 'Cheque', 'Digital Wallet'
-    ]
-    return random.choice(methods)
-
-def generate_bank_details():
-    """Generate realistic bank details"""
-    banks = [
-        'State Bank of India', 'HDFC Bank', 'ICICI Bank', 'Axis Bank',
-        'Punjab National Bank', 'Bank of Baroda', 'Canara Bank', 'IDBI Bank',
-        'Central Bank of India', 'Union Bank of India'
-    ]
+# Columnar enrichment pipeline
+
+THREAT_LEVELS = ['LOW', 'MEDIUM', 'CRITICAL']
+
+LAYERING_DESCRIPTIONS = {
+    'layer_1_extraction': 'Transaction data extraction and basic pattern identification',
+    'layer_2_processing': 'Advanced pattern analysis and relationship mapping',
+    'layer_3_integration': 'Cross-reference with known threat patterns and geolocation'
+}
+
+def compute_layering_columns(amounts, suspicion, pattern_types):
+    """Evaluate the layering rules as masks over whole columns"""
+    amounts = np.asarray(amounts, dtype=float)
+    suspicion = np.asarray(suspicion, dtype=float)
+    
+    # 0 = mid-range, 1 = small value, 2 = large value
+    amount_class = np.where(amounts < 10000, 1, np.where(amounts > 500000, 2, 0))
+    structured = np.isin(np.asarray(pattern_types, dtype=object), ['rapid_sequence', 'smurfing'])
+    high_suspicion = suspicion > 0.7
+    
+    threat_code = np.where(suspicion > 0.8, 2, np.where(suspicion > 0.5, 1, 0))
+    confidence = np.where(threat_code > 0, suspicion, 0.0)
     
     return {
-        'bank_name': random.choice(banks),
-        'branch_code': f'BR{random.randint(1000, 9999)}',
-        'ifsc_code': f'SBIN{random.randint(100000, 999999)}',
-        'swift_code': f'SWIFT{random.randint(10000, 99999)}'
+        'amount_class': amount_class,
+        'structured': structured,
+        'high_suspicion': high_suspicion,
+        'threat_code': threat_code,
+        'confidence': confidence
     }
 
-def generate_layering_summary(timeline_data):
-    """Generate summary of layering analysis for all transactions"""
-    if not timeline_data:
-        return {}
+def _layer_1_variants():
+    """Pattern/indicator lists for every (amount_class, structured) combination"""
+    variants = {}
+    for amount_class in (0, 1, 2):
+        for structured in (False, True):
+            patterns, indicators = [], []
+            if amount_class == 1:
+                patterns.append('Small value transaction')
+            elif amount_class == 2:
+                patterns.append('Large value transaction')
+                indicators.append('High amount alert')
+            if structured:
+                patterns.append('Structured layering detected')
+                indicators.append('Potential money laundering')
+            variants[(amount_class, structured)] = (patterns, indicators)
+    return variants
+
+LAYER_1_VARIANTS = _layer_1_variants()
+
+# Fields a timeline record can carry, in output order
+BASE_FIELDS = ['id', 'timestamp', 'from_account', 'to_account', 'amount',
+               'suspicious_score', 'pattern_type', 'scenario']
+ENRICHED_FIELDS = ['aadhar_location', 'layering_analysis', 'country_risk_level',
+                   'transaction_method', 'bank_details']
+TIMELINE_FIELDS = BASE_FIELDS + ENRICHED_FIELDS
+
+def _layering_records(layering, connected_accounts):
+    """Build layering_analysis objects from the precomputed rule columns"""
+    high_patterns = (['Suspicious timing patterns'], ['Irregular amount structure'])
+    no_patterns = ([], [])
     
-    total_transactions = len(timeline_data)
-    high_risk = sum(1 for tx in timeline_data if tx['layering_analysis']['layer_3_integration']['threat_level'] == 'CRITICAL')
-    medium_risk = sum(1 for tx in timeline_data if tx['layering_analysis']['layer_3_integration']['threat_level'] == 'MEDIUM')
-    low_risk = total_transactions - high_risk - medium_risk
+    records = []
+    for amount_class, structured, high_suspicion, threat, confidence, connected in zip(
+            layering['amount_class'].tolist(), layering['structured'].tolist(),
+            layering['high_suspicion'].tolist(), layering['threat_code'].tolist(),
+            layering['confidence'].tolist(), connected_accounts):
+        patterns, indicators = LAYER_1_VARIANTS[(amount_class, structured)]
+        temporal, amount_patterns = high_patterns if high_suspicion else no_patterns
+        records.append({
+            'layer_1_extraction': {
+                'description': LAYERING_DESCRIPTIONS['layer_1_extraction'],
+                'patterns_detected': patterns,
+                'risk_indicators': indicators
+            },
+            'layer_2_processing': {
+                'description': LAYERING_DESCRIPTIONS['layer_2_processing'],
+                'connected_accounts': connected,
+                'temporal_patterns': temporal,
+                'amount_patterns': amount_patterns
+            },
+            'layer_3_integration': {
+                'description': LAYERING_DESCRIPTIONS['layer_3_integration'],
+                'threat_level': THREAT_LEVELS[threat],
+                'geolocation_risk': 'NORMAL',
+                'pattern_match_confidence': confidence
+            }
+        })
+    return records
+
+def _bank_detail_records(df):
+    """Bank detail objects from the joined enrichment columns"""
+    return [
+        {
+            'bank_name': bank,
+            'branch_code': branch,
+            'ifsc_code': ifsc,
+            'swift_code': swift
+        }
+        for bank, branch, ifsc, swift in zip(
+            df['bank_name'].tolist(), df['branch_code'].tolist(),
+            df['ifsc_code'].tolist(), df['swift_code'].tolist()
+        )
+    ]
+
+def _location_records(df):
+    """One shared location dict per distinct city, indexed per row
+
+    Rows without a city have code -1, which indexes the trailing None.
+    """
+    codes, _ = pd.factorize(df['loc_city'])
+    known_rows = np.flatnonzero(codes >= 0)
+    _, first = np.unique(codes[known_rows], return_index=True)
+    locations = []
+    for row in known_rows[first].tolist():
+        locations.append({
+            'state': df['loc_state'].iat[row],
+            'city': df['loc_city'].iat[row],
+            'region': df['loc_region'].iat[row],
+            'country': df['loc_country'].iat[row],
+            'lat': float(df['loc_lat'].iat[row]),
+            'lng': float(df['loc_lng'].iat[row])
+        })
+    locations.append(None)
+    return codes.tolist(), locations
+
+def enrichment_query(where, order_by):
+    """Top-k SELECT of transactions `t` with their stored enrichment columns"""
+    return (
+        f"SELECT t.*, {ENRICHMENT_SELECT} FROM transactions t {ENRICHMENT_JOIN} "
+        f"WHERE {where} ORDER BY {order_by} LIMIT ?"
+    )
+
+def enrich_transactions(df, fields=None):
+    """Enrich a transaction frame in one columnar pass
+
+    The frame comes from enrichment_query, so location, method and bank
+    details are the values stored for each transaction_id. Only the
+    requested fields are built. Records share their constant lists/location
+    dicts, so treat them as read-only.
+    """
+    fields = list(fields) if fields else TIMELINE_FIELDS
+    if df.empty:
+        return []
+    
+    # Rows written before the enrichment table existed are computed on the fly
+    fill_missing_enrichment(df)
+    
+    # Hundreds of thousands of small objects would otherwise trigger repeated
+    # cyclic GC passes that dominate the build time
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        columns = {}
+        source_columns = {'id': 'transaction_id'}
+        for field in BASE_FIELDS:
+            if field in fields:
+                column = df[source_columns.get(field, field)]
+                if field in ('amount', 'suspicious_score'):
+                    column = column.astype(float)
+                columns[field] = column.tolist()
+        
+        if 'aadhar_location' in fields or 'country_risk_level' in fields:
+            location_idx, locations = _location_records(df)
+            if 'aadhar_location' in fields:
+                columns['aadhar_location'] = [locations[i] for i in location_idx]
+            if 'country_risk_level' in fields:
+                country_risk = [get_country_risk_level(loc['country'] if loc else None) for loc in locations]
+                columns['country_risk_level'] = [country_risk[i] for i in location_idx]
+        
+        if 'layering_analysis' in fields:
+            layering = compute_layering_columns(df['amount'], df['suspicious_score'], df['pattern_type'])
+            connected_accounts = df['connected_accounts'].astype(int).tolist()
+            columns['layering_analysis'] = _layering_records(layering, connected_accounts)
+        if 'transaction_method' in fields:
+            columns['transaction_method'] = df['transaction_method'].tolist()
+        if 'bank_details' in fields:
+            columns['bank_details'] = _bank_detail_records(df)
+        
+        keys = [field for field in TIMELINE_FIELDS if field in columns]
+        records = [dict(zip(keys, values)) for values in zip(*(columns[k] for k in keys))]
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+    
+    return records
+
+def query_timeline_buckets(conn, conditions, params, resolution):
+    """Per-bucket counts, sums, suspicion and threat histogram computed in SQL"""
+    width = BUCKET_SECONDS[resolution]
+    offset = BUCKET_OFFSETS.get(resolution, 0)
+    query = f"""
+        SELECT
+            ((ts_epoch + ?) / ?) * ? - ? AS bucket_epoch,
+            COUNT(*),
+            SUM(amount),
+            MAX(suspicious_score),
+            AVG(suspicious_score),
+            SUM(CASE WHEN suspicious_score > 0.8 THEN 1 ELSE 0 END),
+            SUM(CASE WHEN suspicious_score > 0.5 AND suspicious_score <= 0.8 THEN 1 ELSE 0 END)
+        FROM transactions
+        WHERE {' AND '.join(conditions)}
+        GROUP BY bucket_epoch
+        ORDER BY bucket_epoch
+    """
+    buckets = []
+    for bucket_epoch, count, total_amount, max_suspicion, avg_suspicion, critical, medium in conn.execute(
+            query, [offset, width, width, offset] + list(params)):
+        buckets.append({
+            'bucket_start': from_epoch(bucket_epoch).isoformat(),
+            'bucket_epoch': bucket_epoch,
+            'count': count,
+            'total_amount': round(total_amount or 0.0, 2),
+            'max_suspicion': max_suspicion,
+            'avg_suspicion': round(avg_suspicion, 4) if avg_suspicion is not None else None,
+            'threat_levels': {
+                'critical': critical,
+                'medium': medium,
+                'low': count - critical - medium
+            }
+        })
+    return buckets
+
+def query_account_velocity(conn, conditions, params):
+    """Account velocity summary (see TemporalActivity) for every transaction in range, read in chunks"""
+    activity = TemporalActivity()
+    query = f"""
+        SELECT from_account, to_account, ts_epoch, amount FROM transactions
+        WHERE {' AND '.join(conditions)}
+    """
+    for chunk in pd.read_sql_query(query, conn, params=list(params), chunksize=VELOCITY_CHUNK_SIZE):
+        epochs = chunk['ts_epoch'].to_numpy(dtype=np.int64)
+        amounts = chunk['amount'].to_numpy(dtype=float)
+        accounts = np.concatenate([chunk['from_account'].to_numpy(dtype=object), chunk['to_account'].to_numpy(dtype=object)])
+        activity.add_events(accounts, np.concatenate([epochs, epochs]), np.concatenate([amounts, amounts]))
+    return activity.summary()
+
+def summarize_threat_counts(total_transactions, critical, medium, low):
+    """Layering summary from per-threat-level counts"""
+    if not total_transactions:
+        return {}
     
+    # Rates follow the distribution so the same range always reports the same values
+    flagged_share = (critical + medium) / total_transactions
+    critical_share = critical / total_transactions
     return {
         'total_transactions': total_transactions,
         'risk_distribution': {
-            'critical': high_risk,
-            'medium': medium_risk,
-            'low': low_risk
+            'critical': critical,
+            'medium': medium,
+            'low': low
         },
         'layering_effectiveness': {
-            'layer_1_detection_rate': random.uniform(0.85, 0.95),
-            'layer_2_processing_rate': random.uniform(0.75, 0.90),
-            'layer_3_integration_rate': random.uniform(0.60, 0.80)
+            'layer_1_detection_rate': round(0.85 + 0.10 * flagged_share, 4),
+            'layer_2_processing_rate': round(0.75 + 0.15 * flagged_share, 4),
+            'layer_3_integration_rate': round(0.60 + 0.20 * critical_share, 4)
         }
     }
 
@@ -1,68 +1,62 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 import numpy as np
-import random
 from datetime import datetime
+import sys
+import os
+import time
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from models.hydra_engine import (
+    PATTERN_TYPES, MONTE_CARLO_BLOCK_ROUNDS, SimulationResult, SimulationStats,
+    generate_patterns, detect_patterns, score_features, run_simulation as run_batch_simulation, run_monte_carlo,
+    iter_simulation
+)
+from data.pattern_library import (
+    save_patterns, load_patterns, get_pattern, library_stats, pattern_id, pattern_number
+)
+from utils.db_pool import get_pool
+from utils.job_queue import QueueFullError, get_job_queue
 
 hydra_bp = Blueprint('hydra', __name__)
 
+MAX_SIMULATION_ROUNDS = 1000000
+MAX_MONTE_CARLO_ROUNDS = 50000000
+# /monte-carlo holds the request until every block is merged; longer runs are queued as jobs
+MAX_SYNC_MONTE_CARLO_ROUNDS = 2000000
+DEFAULT_MONTE_CARLO_ROUNDS = 1000000
+MAX_DETECT_PATTERNS = 100000
+
+# Patterns generated into the library, and re-scored by one replay, per call
+MAX_LIBRARY_GENERATE = 1000000
+MAX_REPLAY_PATTERNS = 200000
+DEFAULT_REPLAY_MISSED = 20
+
+# Rounds simulated and sent per server-sent event chunk
+DEFAULT_STREAM_CHUNK_ROUNDS = 1000
+MAX_STREAM_CHUNK_ROUNDS = MONTE_CARLO_BLOCK_ROUNDS
+
 class SimpleHydraGAN:
     """Simplified GAN for pattern generation and detection"""
     
     def __init__(self):
-        self.detection_accuracy = 0.75
-        self.generation_patterns = [
-            'smurfing_enhanced',
-            'layering_complex',
-            'integration_hidden',
-            'shell_company_web_v2'
-        ]
-    
-    def generate_adversarial_pattern(self):
-        """Generate a new adversarial pattern"""
-        pattern = random.choice(self.generation_patterns)
-        
-        # Simulate pattern generation
-        generated_pattern = {
-            'pattern_id': f'GEN_{datetime.now().strftime("%H%M%S")}',
-            'pattern_type': pattern,
-            'complexity_score': np.random.uniform(0.6, 0.9),
-            'transactions': self._generate_pattern_transactions(pattern),
-            'generated_at': datetime.now().isoformat()
-        }
-        
-        return generated_pattern
+        self.generation_patterns = list(PATTERN_TYPES)
+        self.rng = np.random.default_rng()
     
-    def _generate_pattern_transactions(self, pattern_type):
-        """Generate transactions for a specific pattern"""
-        num_transactions = random.randint(10, 30)
-        transactions = []
-        
-        for i in range(num_transactions):
-            transactions.append({
-                'from': f'GEN_ACC_{i % 5:02d}',
-                'to': f'TARGET_{i % 3:02d}',
-                'amount': np.random.uniform(1000, 10000),
-                'timestamp': datetime.now().isoformat(),
-                'generated': True
-            })
-        
-        return transactions
+    def generate_adversarial_pattern(self, conn):
+        """Generate a new adversarial pattern and store it in the pattern library"""
+        batch = generate_patterns(1, self.rng)
+        generated_at = datetime.now().isoformat()
+        number = save_patterns(conn, batch, generated_at)
+        return batch.pattern(0, pattern_id(number), generated_at)
     
     def test_detection(self, pattern):
-        """Test detection accuracy against generated pattern"""
-        # Simulate detection accuracy with some randomness
-        base_accuracy = self.detection_accuracy
-        pattern_complexity = pattern.get('complexity_score', 0.5)
-        
-        # Higher complexity = harder to detect
-        detection_score = base_accuracy - (pattern_complexity * 0.2) + np.random.uniform(-0.1, 0.1)
-        detection_score = max(0.1, min(0.95, detection_score))
-        
-        return {
-            'detected': detection_score > 0.5,
-            'confidence': detection_score,
-            'pattern_id': pattern['pattern_id']
-        }
+        """Score a pattern from its transactions' fan-in, fan-out, amount dispersion and repetition"""
+        return detect_patterns([pattern])[0]
+    
+    def test_detection_batch(self, patterns):
+        """Score many patterns in one vectorized pass"""
+        return detect_patterns(patterns)
 
 # Global HYDRA instance
 hydra_system = SimpleHydraGAN()
@@ -71,7 +65,8 @@ hydra_system = SimpleHydraGAN()
 def generate_pattern():
     """Generate adversarial pattern"""
     try:
-        pattern = hydra_system.generate_adversarial_pattern()
+        with get_pool().connection() as conn:
+            pattern = hydra_system.generate_adversarial_pattern(conn)
         
         return jsonify({
             'status': 'success',
@@ -83,18 +78,162 @@ def generate_pattern():
 
 @hydra_bp.route('/detect', methods=['POST'])
 def test_detection():
-    """Test detection against generated pattern"""
+    """Test detection against one pattern, or a batch sent as {"patterns": [...]}"""
     try:
-        pattern_data = request.get_json()
+        pattern_data = request.get_json(silent=True)
         
-        if not pattern_data:
+        if not pattern_data or not isinstance(pattern_data, dict):
             return jsonify({'status': 'error', 'message': 'No pattern data provided'}), 400
         
-        detection_result = hydra_system.test_detection(pattern_data)
+        patterns = pattern_data.get('patterns')
+        batch = patterns is not None
+        if not batch:
+            patterns = [pattern_data]
+        if not isinstance(patterns, list) or not all(isinstance(p, dict) for p in patterns):
+            return jsonify({'status': 'error', 'message': 'patterns must be a list of pattern objects'}), 400
+        if len(patterns) > MAX_DETECT_PATTERNS:
+            return jsonify({'status': 'error', 'message': f'at most {MAX_DETECT_PATTERNS} patterns per request'}), 400
+        
+        try:
+            detections = hydra_system.test_detection_batch(patterns)
+        except (AttributeError, TypeError, ValueError):
+            return jsonify({'status': 'error', 'message': 'transactions must be objects with from, to and numeric amount'}), 400
+        
+        if not batch:
+            return jsonify({
+                'status': 'success',
+                'detection': detections[0]
+            })
+        
+        detected = sum(d['detected'] for d in detections)
+        return jsonify({
+            'status': 'success',
+            'detections': detections,
+            'summary': {
+                'patterns': len(detections),
+                'detected': detected,
+                'detection_rate': detected / len(detections) if detections else 0.0
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def replay_library(conn, start, limit, missed_limit=DEFAULT_REPLAY_MISSED, results_limit=0):
+    """Re-score stored patterns with the current detector in one batch
+
+    Returns detection totals with confidence intervals, overall and per
+    pattern type, plus the ids of the first missed patterns.
+    """
+    numbers, batch, _ = load_patterns(conn, start, limit)
+    features = batch.features()
+    confidence, detected = score_features(features)
+    
+    replay = SimulationStats.from_result(SimulationResult(batch, confidence, detected)).summary()
+    replay['patterns'] = replay.pop('rounds')
+    replay['first_pattern_id'] = pattern_id(numbers[0]) if len(numbers) else None
+    replay['last_pattern_id'] = pattern_id(numbers[-1]) if len(numbers) else None
+    replay['missed'] = [pattern_id(n) for n in numbers[~detected][:missed_limit]]
+    replay['results'] = [
+        {'pattern_id': pattern_id(number), 'pattern_type': PATTERN_TYPES[code], 'detected': flag, 'confidence': score}
+        for number, code, flag, score in zip(numbers[:results_limit].tolist(), batch.type_codes[:results_limit].tolist(),
+                                             detected[:results_limit].tolist(), confidence[:results_limit].tolist())
+    ]
+    return replay
+
+@hydra_bp.route('/library', methods=['GET'])
+def pattern_library():
+    """Pattern library totals"""
+    try:
+        with get_pool().connection() as conn:
+            stats = library_stats(conn)
+        
+        return jsonify({
+            'status': 'success',
+            'library': stats
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@hydra_bp.route('/library', methods=['POST'])
+def generate_library_patterns():
+    """Generate a batch of adversarial patterns straight into the library"""
+    try:
+        try:
+            count = int(request.args.get('count', 1000))
+            seed = request.args.get('seed')
+            seed = int(seed) if seed is not None else None
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'count and seed must be integers'}), 400
+        if not 1 <= count <= MAX_LIBRARY_GENERATE:
+            return jsonify({'status': 'error', 'message': f'count must be between 1 and {MAX_LIBRARY_GENERATE}'}), 400
+        if seed is not None and seed < 0:
+            return jsonify({'status': 'error', 'message': 'seed must be non-negative'}), 400
+        
+        rng = np.random.default_rng(seed) if seed is not None else hydra_system.rng
+        batch = generate_patterns(count, rng)
+        with get_pool().connection() as conn:
+            first = save_patterns(conn, batch)
+        
+        return jsonify({
+            'status': 'success',
+            'generated': {
+                'patterns': count,
+                'transactions': int(batch.offsets[-1]),
+                'first_pattern_id': pattern_id(first),
+                'last_pattern_id': pattern_id(first + count - 1)
+            }
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@hydra_bp.route('/library/replay', methods=['GET'])
+def replay_pattern_library():
+    """Re-score a range of stored patterns against the current detector"""
+    try:
+        try:
+            start = request.args.get('start')
+            start = pattern_number(start) if start is not None else 1
+            limit = int(request.args.get('limit', MAX_REPLAY_PATTERNS))
+            missed_limit = int(request.args.get('missed_limit', DEFAULT_REPLAY_MISSED))
+            results_limit = int(request.args.get('results_limit', 0))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'start must be a pattern id; limits must be integers'}), 400
+        if not 1 <= limit <= MAX_REPLAY_PATTERNS:
+            return jsonify({'status': 'error', 'message': f'limit must be between 1 and {MAX_REPLAY_PATTERNS}'}), 400
+        
+        started = time.time()
+        with get_pool().connection() as conn:
+            replay = replay_library(conn, start, limit, max(missed_limit, 0), max(results_limit, 0))
+        replay['duration_seconds'] = round(time.time() - started, 3)
         
         return jsonify({
             'status': 'success',
-            'detection': detection_result
+            'replay': replay
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@hydra_bp.route('/library/<pattern_ref>', methods=['GET'])
+def get_library_pattern(pattern_ref):
+    """One stored pattern by library id"""
+    try:
+        try:
+            number = pattern_number(pattern_ref)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
+        with get_pool().connection() as conn:
+            pattern = get_pattern(conn, number)
+        if pattern is None:
+            return jsonify({'status': 'error', 'message': f'pattern {pattern_ref} not found'}), 404
+        
+        return jsonify({
+            'status': 'success',
+            'pattern': pattern
         })
         
     except Exception as e:
@@ -102,40 +241,180 @@ def test_detection():
 
 @hydra_bp.route('/simulation', methods=['GET'])
 def run_simulation():
-    """Run AI vs AI simulation"""
+    """Run AI vs AI simulation: every round generated and scored in one batched pass"""
     try:
-        rounds = int(request.args.get('rounds', 10))
-        
-        simulation_results = []
-        total_detected = 0
-        
-        for i in range(rounds):
-            # Generate pattern
-            pattern = hydra_system.generate_adversarial_pattern()
-            
-            # Test detection
-            detection = hydra_system.test_detection(pattern)
-            
-            if detection['detected']:
-                total_detected += 1
-            
-            simulation_results.append({
-                'round': i + 1,
-                'pattern': pattern['pattern_type'],
-                'complexity': pattern['complexity_score'],
-                'detected': detection['detected'],
-                'confidence': detection['confidence']
-            })
+        try:
+            rounds = int(request.args.get('rounds', 10))
+            seed = request.args.get('seed')
+            seed = int(seed) if seed is not None else None
+            # Per-round results returned (all by default); totals always cover every round
+            results_limit = int(request.args.get('results_limit', rounds))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'rounds, seed and results_limit must be integers'}), 400
+        if not 1 <= rounds <= MAX_SIMULATION_ROUNDS:
+            return jsonify({'status': 'error', 'message': f'rounds must be between 1 and {MAX_SIMULATION_ROUNDS}'}), 400
+        
+        result = run_batch_simulation(rounds, seed)
+        simulation = result.summary()
+        simulation['results'] = result.round_summaries(stop=max(results_limit, 0))
         
         return jsonify({
             'status': 'success',
-            'simulation': {
-                'rounds': rounds,
-                'total_detected': total_detected,
-                'detection_rate': total_detected / rounds,
-                'results': simulation_results
-            }
+            'simulation': simulation
         })
         
     except Exception as e:
-        return jsonify({'status': 'error', 'message': str(e)}), 500
\ No newline at end of file
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def sse_event(event, data):
+    """One server-sent event frame"""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+def stream_simulation_events(rounds, seed, chunk_rounds, include_rounds):
+    """Server-sent events for a chunked simulation: start, then rounds/progress per chunk, then complete
+
+    The WSGI server pulls one chunk at a time as the previous one is
+    written, so a slow client holds back the simulation rather than
+    buffering it; when the client disconnects the generator is closed and
+    no further chunks are simulated.
+    """
+    started = time.time()
+    root_seed = seed if seed is not None else np.random.SeedSequence().entropy
+    yield sse_event('start', {'rounds': rounds, 'seed': root_seed, 'chunk_rounds': chunk_rounds})
+    
+    stats = None
+    for start, result, stats in iter_simulation(rounds, root_seed, chunk_rounds):
+        if include_rounds:
+            records = result.round_summaries()
+            for record in records:
+                record['round'] += start
+            yield sse_event('rounds', {'results': records})
+        progress = stats.summary()
+        progress['completed_rounds'] = stats.rounds
+        progress['progress'] = round(stats.rounds / rounds, 6)
+        yield sse_event('progress', progress)
+    
+    summary = stats.summary()
+    summary['seed'] = root_seed
+    summary['duration_seconds'] = round(time.time() - started, 3)
+    yield sse_event('complete', summary)
+
+@hydra_bp.route('/simulation/stream', methods=['GET'])
+def stream_simulation():
+    """Stream simulation round results and running detection rates as server-sent events"""
+    try:
+        rounds = int(request.args.get('rounds', 10000))
+        seed = request.args.get('seed')
+        seed = int(seed) if seed is not None else None
+        chunk_rounds = int(request.args.get('chunk_rounds', DEFAULT_STREAM_CHUNK_ROUNDS))
+    except ValueError:
+        return jsonify({'status': 'error', 'message': 'rounds, seed and chunk_rounds must be integers'}), 400
+    if not 1 <= rounds <= MAX_MONTE_CARLO_ROUNDS:
+        return jsonify({'status': 'error', 'message': f'rounds must be between 1 and {MAX_MONTE_CARLO_ROUNDS}'}), 400
+    if not 1 <= chunk_rounds <= MAX_STREAM_CHUNK_ROUNDS:
+        return jsonify({'status': 'error', 'message': f'chunk_rounds must be between 1 and {MAX_STREAM_CHUNK_ROUNDS}'}), 400
+    if seed is not None and seed < 0:
+        return jsonify({'status': 'error', 'message': 'seed must be non-negative'}), 400
+    include_rounds = request.args.get('include_rounds', 'true').lower() in ('1', 'true', 'yes')
+    
+    events = stream_simulation_events(rounds, seed, chunk_rounds, include_rounds)
+    return Response(
+        stream_with_context(events),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def parse_monte_carlo_args(max_rounds):
+    """(rounds, seed) from the query string; ValueError with a message for the client"""
+    try:
+        rounds = int(request.args.get('rounds', DEFAULT_MONTE_CARLO_ROUNDS))
+        seed = request.args.get('seed')
+        seed = int(seed) if seed is not None else None
+    except ValueError:
+        raise ValueError('rounds and seed must be integers')
+    if not 1 <= rounds <= max_rounds:
+        raise ValueError(f'rounds must be between 1 and {max_rounds}')
+    if seed is not None and seed < 0:
+        raise ValueError('seed must be non-negative')
+    return rounds, seed
+
+def monte_carlo_summary(rounds, seed, queue=None):
+    """Monte Carlo statistics plus the seed, block, worker and timing details of the run"""
+    started = time.time()
+    stats, entropy = run_monte_carlo(rounds, seed, queue=queue)
+    simulation = stats.summary()
+    # Without a seed one is drawn; passing it back reproduces this run
+    simulation['seed'] = entropy
+    simulation['blocks'] = -(-rounds // MONTE_CARLO_BLOCK_ROUNDS)
+    simulation['workers'] = queue.max_workers if queue is not None else 1
+    simulation['duration_seconds'] = round(time.time() - started, 3)
+    return simulation
+
+def monte_carlo_job(rounds, seed):
+    """Job queue entry point: the blocks run one after another in this worker process"""
+    return monte_carlo_summary(rounds, seed)
+
+@hydra_bp.route('/monte-carlo', methods=['GET'])
+def run_monte_carlo_simulation():
+    """Seeded Monte Carlo simulation across the worker pool, with confidence intervals
+
+    Runs while the request waits, so rounds are capped at
+    MAX_SYNC_MONTE_CARLO_ROUNDS; larger runs go through /monte-carlo/jobs.
+    """
+    try:
+        try:
+            rounds, seed = parse_monte_carlo_args(MAX_SYNC_MONTE_CARLO_ROUNDS)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
+        return jsonify({
+            'status': 'success',
+            'monte_carlo': monte_carlo_summary(rounds, seed, get_job_queue())
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+@hydra_bp.route('/monte-carlo/jobs', methods=['POST'])
+def submit_monte_carlo_job():
+    """Queue a Monte Carlo run of up to MAX_MONTE_CARLO_ROUNDS on the background process pool"""
+    try:
+        try:
+            rounds, seed = parse_monte_carlo_args(MAX_MONTE_CARLO_ROUNDS)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': str(e)}), 400
+        
+        try:
+            job = get_job_queue().submit(monte_carlo_job, rounds, seed, kind='monte_carlo')
+        except QueueFullError as e:
+            response = jsonify({'status': 'error', 'message': str(e)})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        
+        response = jsonify({'status': 'success', 'job': job.to_dict(include_result=False)})
+        response.headers['Location'] = f'{request.path}/{job.id}'
+        return response, 202
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+
+def _monte_carlo_job(job_id):
+    """The queued Monte Carlo job with this id, or None (unknown, expired or another kind)"""
+    job = get_job_queue().get(job_id)
+    return job if job is not None and job.kind == 'monte_carlo' else None
+
+@hydra_bp.route('/monte-carlo/jobs/<job_id>', methods=['GET'])
+def get_monte_carlo_job(job_id):
+    """Job status, plus the Monte Carlo statistics once completed"""
+    job = _monte_carlo_job(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': f'Unknown or expired job: {job_id}'}), 404
+    return jsonify({'status': 'success', 'job': job.to_dict()})
+
+@hydra_bp.route('/monte-carlo/jobs/<job_id>', methods=['DELETE'])
+def cancel_monte_carlo_job(job_id):
+    """Cancel a queued job (a running job's result is discarded)"""
+    if _monte_carlo_job(job_id) is None:
+        return jsonify({'status': 'error', 'message': f'Unknown or expired job: {job_id}'}), 404
+    job = get_job_queue().cancel(job_id)
+    return jsonify({'status': 'success', 'job': job.to_dict(include_result=False)})
@@ -0,0 +1,55 @@
+from flask import Blueprint, jsonify, request
+import io
+import sys
+import os
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from utils.db_pool import get_pool
+from data.ingest import ingest_stream, DEFAULT_BATCH_SIZE, DEFAULT_COMMIT_EVERY
+
+ingest_bp = Blueprint('ingest', __name__)
+
+FORMAT_BY_CONTENT_TYPE = {
+    'application/x-ndjson': 'ndjson',
+    'application/ndjson': 'ndjson',
+    'application/jsonl': 'ndjson',
+    'text/csv': 'csv',
+    'application/csv': 'csv'
+}
+
+def _request_format():
+    """Resolve the feed format from ?format= or the Content-Type header"""
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt.lower()
+    return FORMAT_BY_CONTENT_TYPE.get(request.mimetype, 'ndjson')
+
+@ingest_bp.route('', methods=['POST'])
+def ingest_transactions():
+    """Stream an NDJSON/CSV body into the transactions table"""
+    try:
+        fmt = _request_format()
+        if fmt not in ('ndjson', 'csv'):
+            return jsonify({'status': 'error', 'message': f'Unsupported format: {fmt}'}), 400
+        
+        # Clamped to MAX_BATCH_SIZE / MAX_COMMIT_EVERY by the ingestor
+        try:
+            batch_size = int(request.args.get('batch_size', DEFAULT_BATCH_SIZE))
+            commit_every = int(request.args.get('commit_every', DEFAULT_COMMIT_EVERY))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'batch_size and commit_every must be integers'}), 400
+        
+        # Read the body incrementally instead of buffering it with get_data()
+        stream = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        
+        with get_pool().connection() as conn:
+            stats = ingest_stream(conn, stream, fmt, batch_size, commit_every)
+        
+        return jsonify({
+            'status': 'success',
+            'format': fmt,
+            'ingest': stats
+        })
+        
+    except Exception as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 500
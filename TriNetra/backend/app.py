@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request, send_from_directory
+from flask import Flask, jsonify, send_from_directory
 from flask_cors import CORS
 import os
 import sys
@@ -10,12 +10,46 @@ from config import Config
 from api.chronos_api import chronos_bp
 from api.hydra_api import hydra_bp  
 from api.autosar_api import autosar_bp
+from api.ingest_api import ingest_bp
 from data.synthetic_generator import init_database
+from data.migrations import apply_migrations
+from utils.db_pool import init_pool
+from utils.response_cache import init_response_cache
+from utils.job_queue import init_job_queue
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
     
+    # Shared SQLite connection pool used by every blueprint
+    db_pool = init_pool(
+        app.config['DATABASE_PATH'],
+        max_connections=app.config['DB_POOL_SIZE'],
+        checkout_timeout=app.config['DB_POOL_TIMEOUT'],
+        cache_size_kb=app.config['DB_CACHE_SIZE_KB'],
+        mmap_size=app.config['DB_MMAP_SIZE']
+    )
+    app.extensions['db_pool'] = db_pool
+    
+    # Versioned response cache for the dashboard's polling endpoints
+    response_cache = init_response_cache(
+        max_bytes=app.config['RESPONSE_CACHE_MAX_BYTES'],
+        ttl=app.config['RESPONSE_CACHE_TTL']
+    )
+    app.extensions['response_cache'] = response_cache
+    
+    # Process pool for SAR jobs so CPU-heavy reports never block request threads
+    job_queue = init_job_queue(
+        max_workers=app.config['JOB_WORKERS'],
+        max_pending=app.config['JOB_MAX_PENDING'],
+        result_ttl=app.config['JOB_RESULT_TTL']
+    )
+    app.extensions['job_queue'] = job_queue
+    
+    # Bring the schema (tables + indexes) up to date before serving
+    with db_pool.connection() as conn:
+        apply_migrations(conn)
+    
     # Enable CORS for all routes
     CORS(app)
     
@@ -23,6 +57,7 @@ def create_app():
     app.register_blueprint(chronos_bp, url_prefix='/api/chronos')
     app.register_blueprint(hydra_bp, url_prefix='/api/hydra')
     app.register_blueprint(autosar_bp, url_prefix='/api/autosar')
+    app.register_blueprint(ingest_bp, url_prefix='/api/ingest')
     
     # Serve frontend static files
     @app.route('/')
@@ -38,6 +73,21 @@ def create_app():
     def health_check():
         return jsonify({'status': 'healthy', 'service': 'TriNetra API'})
     
+    # Connection pool statistics for sizing
+    @app.route('/api/health/db')
+    def database_pool_stats():
+        return jsonify({'status': 'success', 'pool': db_pool.stats()})
+    
+    # Response cache hit/miss/eviction counters
+    @app.route('/api/health/cache')
+    def response_cache_stats():
+        return jsonify({'status': 'success', 'cache': response_cache.stats()})
+    
+    # Background job queue depth and outcomes
+    @app.route('/api/health/jobs')
+    def job_queue_stats():
+        return jsonify({'status': 'success', 'jobs': job_queue.stats()})
+    
     return app
 
 if __name__ == '__main__':
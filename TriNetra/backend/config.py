@@ -5,4 +5,26 @@ class Config:
     DATABASE_PATH = os.path.join(os.path.dirname(__file__), 'data', 'transactions.db')
     DEBUG = True
     HOST = '0.0.0.0'
-    PORT = 5001
\ No newline at end of file
+    PORT = 5001
+
+    # SQLite connection pool
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 10.0))
+    DB_CACHE_SIZE_KB = int(os.environ.get('DB_CACHE_SIZE_KB', 65536))
+    DB_MMAP_SIZE = int(os.environ.get('DB_MMAP_SIZE', 268435456))
+
+    # Response cache for read endpoints
+    RESPONSE_CACHE_MAX_BYTES = int(os.environ.get('RESPONSE_CACHE_MAX_BYTES', 32 * 1024 * 1024))
+    RESPONSE_CACHE_TTL = float(os.environ.get('RESPONSE_CACHE_TTL', 60.0))
+
+    # Rows per chunk when SAR generation streams a scenario
+    SAR_CHUNK_SIZE = int(os.environ.get('SAR_CHUNK_SIZE', 20000))
+    # Flagged transactions one SAR keeps for cycle detection and account
+    # activity (roughly 150 bytes each); this, not the chunk size, is what
+    # bounds SAR memory on large scenarios
+    SAR_MAX_EDGES = int(os.environ.get('SAR_MAX_EDGES', 5000000))
+
+    # Background job queue (SAR generation off the request thread)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', min(4, os.cpu_count() or 1)))
+    JOB_MAX_PENDING = int(os.environ.get('JOB_MAX_PENDING', 32))
+    JOB_RESULT_TTL = float(os.environ.get('JOB_RESULT_TTL', 600.0))
@@ -0,0 +1,26 @@
+"""
+Shared pytest fixtures - a Flask app on a throwaway database
+"""
+
+import pytest
+
+from config import Config
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    """App created on a fresh database; its job queue and connections are always released"""
+    from app import create_app
+
+    monkeypatch.setattr(Config, 'DATABASE_PATH', str(tmp_path / 'trinetra_test.db'))
+    app = create_app()
+    try:
+        yield app
+    finally:
+        app.extensions['job_queue'].shutdown()
+        app.extensions['db_pool'].close_all()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,187 @@
+import hashlib
+
+from data.geo import gazetteer
+
+# Reference data shared by the CHRONOS and Auto-SAR enrichment
+INDIAN_LOCATIONS = [
+    {'state': 'Maharashtra', 'city': 'Mumbai', 'region': 'Western', 'country': 'India'},
+    {'state': 'Delhi', 'city': 'New Delhi', 'region': 'Northern', 'country': 'India'},
+    {'state': 'Karnataka', 'city': 'Bangalore', 'region': 'Southern', 'country': 'India'},
+    {'state': 'Tamil Nadu', 'city': 'Chennai', 'region': 'Southern', 'country': 'India'},
+    {'state': 'West Bengal', 'city': 'Kolkata', 'region': 'Eastern', 'country': 'India'},
+    {'state': 'Gujarat', 'city': 'Ahmedabad', 'region': 'Western', 'country': 'India'},
+    {'state': 'Rajasthan', 'city': 'Jaipur', 'region': 'Western', 'country': 'India'},
+    {'state': 'Punjab', 'city': 'Chandigarh', 'region': 'Northern', 'country': 'India'},
+    {'state': 'Uttar Pradesh', 'city': 'Lucknow', 'region': 'Northern', 'country': 'India'},
+]
+
+# International locations for suspicious transactions
+INTERNATIONAL_LOCATIONS = [
+    {'state': 'Dubai', 'city': 'Dubai', 'region': 'Middle East', 'country': 'UAE'},
+    {'state': 'Singapore', 'city': 'Singapore', 'region': 'Southeast Asia', 'country': 'Singapore'},
+    {'state': 'Karachi', 'city': 'Karachi', 'region': 'South Asia', 'country': 'Pakistan'},
+    {'state': 'London', 'city': 'London', 'region': 'Europe', 'country': 'UK'},
+    {'state': 'New York', 'city': 'New York', 'region': 'North America', 'country': 'USA'},
+]
+
+CITY_COORDINATES = {
+    'Mumbai': {'lat': 19.0760, 'lng': 72.8777},
+    'New Delhi': {'lat': 28.6139, 'lng': 77.2090},
+    'Bangalore': {'lat': 12.9716, 'lng': 77.5946},
+    'Chennai': {'lat': 13.0827, 'lng': 80.2707},
+    'Kolkata': {'lat': 22.5726, 'lng': 88.3639},
+    'Ahmedabad': {'lat': 23.0225, 'lng': 72.5714},
+    'Jaipur': {'lat': 26.9124, 'lng': 75.7873},
+    'Chandigarh': {'lat': 30.7333, 'lng': 76.7794},
+    'Lucknow': {'lat': 26.8467, 'lng': 80.9462},
+    'Dubai': {'lat': 25.2048, 'lng': 55.2708},
+    'Singapore': {'lat': 1.3521, 'lng': 103.8198},
+    'Karachi': {'lat': 24.8607, 'lng': 67.0011},
+    'London': {'lat': 51.5074, 'lng': -0.1278},
+    'New York': {'lat': 40.7128, 'lng': -74.0060},
+}
+
+TRANSACTION_METHODS = [
+    'NEFT', 'RTGS', 'IMPS', 'UPI', 'Wire Transfer',
+    'Cryptocurrency', 'Hawala', 'Cash Deposit', 'Cheque', 'Digital Wallet'
+]
+
+BANKS = [
+    'State Bank of India', 'HDFC Bank', 'ICICI Bank', 'Axis Bank',
+    'Punjab National Bank', 'Bank of Baroda', 'Canara Bank', 'IDBI Bank',
+    'Central Bank of India', 'Union Bank of India'
+]
+
+# Country risk levels for transaction locations (anything unlisted is 1, low)
+COUNTRY_RISK_LEVELS = {
+    'Pakistan': 3, 'Afghanistan': 3, 'North Korea': 3, 'Iran': 3,
+    'UAE': 2, 'Malaysia': 2, 'Thailand': 2, 'Myanmar': 2
+}
+
+# Stored enrichment columns, in table order after transaction_id
+ENRICHMENT_COLUMNS = [
+    'loc_city', 'loc_state', 'loc_region', 'loc_country', 'loc_lat', 'loc_lng',
+    'transaction_method', 'bank_name', 'branch_code', 'ifsc_code', 'swift_code',
+    'connected_accounts',
+    'from_city', 'from_lat', 'from_lon', 'to_city', 'to_lat', 'to_lon',
+    'from_state', 'from_country', 'to_state', 'to_country'
+]
+
+# Read queries select transactions as `t` and add these joined columns
+ENRICHMENT_SELECT = ', '.join(f'e.{c}' for c in ENRICHMENT_COLUMNS)
+ENRICHMENT_JOIN = 'LEFT JOIN transaction_enrichment e ON e.transaction_id = t.transaction_id'
+
+def _draws(transaction_id, count):
+    """Stable pseudo-random integers derived from the transaction id"""
+    digest = hashlib.blake2b(str(transaction_id).encode('utf-8'), digest_size=4 * count).digest()
+    return [int.from_bytes(digest[i * 4:(i + 1) * 4], 'big') for i in range(count)]
+
+
+def enrichment_row(transaction_id):
+    """Deterministic enrichment values for one transaction, ordered as ENRICHMENT_COLUMNS
+
+    The same transaction_id always yields the same location, method and bank,
+    so ingest-time rows and on-the-fly fallbacks agree.
+    """
+    d = _draws(transaction_id, 10)
+
+    # 85% chance of Indian location, 15% international
+    if d[0] % 100 < 85:
+        location = INDIAN_LOCATIONS[d[1] % len(INDIAN_LOCATIONS)]
+    else:
+        location = INTERNATIONAL_LOCATIONS[d[1] % len(INTERNATIONAL_LOCATIONS)]
+    coordinates = CITY_COORDINATES.get(location['city'], {'lat': 0, 'lng': 0})
+
+    cities = gazetteer()
+    from_city = d[8] % len(cities)
+    to_city = d[9] % len(cities)
+
+    return (
+        location['city'], location['state'], location['region'], location['country'],
+        coordinates['lat'], coordinates['lng'],
+        TRANSACTION_METHODS[d[2] % len(TRANSACTION_METHODS)],
+        BANKS[d[3] % len(BANKS)],
+        f'BR{1000 + d[4] % 9000}',
+        f'SBIN{100000 + d[5] % 900000}',
+        f'SWIFT{10000 + d[6] % 90000}',
+        2 + d[7] % 14,
+        cities.cities[from_city], float(cities.lat[from_city]), float(cities.lng[from_city]),
+        cities.cities[to_city], float(cities.lat[to_city]), float(cities.lng[to_city]),
+        cities.states[from_city], cities.countries[from_city],
+        cities.states[to_city], cities.countries[to_city]
+    )
+
+
+def store_enrichment(conn, transaction_ids):
+    """Write enrichment rows for the given ids (existing rows are kept)"""
+    column_list = ', '.join(['transaction_id'] + ENRICHMENT_COLUMNS)
+    placeholders = ', '.join('?' for _ in range(len(ENRICHMENT_COLUMNS) + 1))
+    rows = [(str(tx_id),) + enrichment_row(tx_id) for tx_id in transaction_ids]
+    conn.executemany(
+        f'INSERT OR IGNORE INTO transaction_enrichment ({column_list}) VALUES ({placeholders})',
+        rows
+    )
+    return len(rows)
+
+
+def backfill_enrichment(conn, batch_size=10000):
+    """Enrich every transaction that has no enrichment row yet"""
+    total = 0
+    while True:
+        ids = [row[0] for row in conn.execute('''
+            SELECT t.transaction_id FROM transactions t
+            WHERE t.transaction_id IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM transaction_enrichment e WHERE e.transaction_id = t.transaction_id
+            )
+            LIMIT ?
+        ''', (batch_size,))]
+        if not ids:
+            break
+        total += store_enrichment(conn, ids)
+    return total
+
+
+def fill_missing_enrichment(df):
+    """Compute enrichment for joined rows that had no stored row (in place)"""
+    if df.empty or 'loc_city' not in df.columns:
+        return df
+    missing = df['loc_city'].isna().to_numpy()
+    if missing.any():
+        values = [enrichment_row(tx_id) for tx_id in df.loc[missing, 'transaction_id']]
+        for i, column in enumerate(ENRICHMENT_COLUMNS):
+            filled = df[column].to_numpy(dtype=object, copy=True)
+            filled[missing] = [v[i] for v in values]
+            df[column] = filled
+    return df
+
+
+def attach_enrichment(record):
+    """Replace the flat enrichment columns of a joined record with nested fields"""
+    values = {column: record.pop(column, None) for column in ENRICHMENT_COLUMNS}
+    record['aadhar_location'] = {
+        'state': values['loc_state'],
+        'city': values['loc_city'],
+        'region': values['loc_region'],
+        'country': values['loc_country'],
+        'lat': float(values['loc_lat']),
+        'lng': float(values['loc_lng'])
+    }
+    record['transaction_method'] = values['transaction_method']
+    record['bank_details'] = {
+        'bank_name': values['bank_name'],
+        'branch_code': values['branch_code'],
+        'ifsc_code': values['ifsc_code'],
+        'swift_code': values['swift_code']
+    }
+    record['connected_accounts'] = int(values['connected_accounts'])
+    record['from_location'] = {
+        'lat': float(values['from_lat']),
+        'lon': float(values['from_lon']),
+        'city': values['from_city']
+    }
+    record['to_location'] = {
+        'lat': float(values['to_lat']),
+        'lon': float(values['to_lon']),
+        'city': values['to_city']
+    }
+    return record
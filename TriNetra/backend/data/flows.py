@@ -0,0 +1,29 @@
+import pandas as pd
+
+from data.heatmap import ALL_SCENARIOS
+from models.flow_matrix import ENDPOINT_COLUMNS, FlowMatrix
+
+
+def query_flow_matrix(conn, scenario=ALL_SCENARIOS, risk_levels=None):
+    """FlowMatrix of one scenario's stored flow pairs (every scenario's for 'all')
+
+    Reads the city-level pair sums kept current by the flow_pairs triggers,
+    so the cost follows the number of corridors, not the transactions
+    behind them.
+    """
+    conditions = ['transaction_count > 0']
+    params = []
+    if scenario != ALL_SCENARIOS:
+        conditions.append('scenario = ?')
+        params.append(scenario)
+
+    pairs = pd.read_sql_query(f'''
+        SELECT {', '.join(ENDPOINT_COLUMNS)},
+               SUM(transaction_count) AS transaction_count, SUM(total_amount) AS total_amount,
+               SUM(suspicion_sum) AS suspicion_sum
+        FROM flow_pairs
+        WHERE {' AND '.join(conditions)}
+        GROUP BY {', '.join(ENDPOINT_COLUMNS)}
+    ''', conn, params=params)
+    return FlowMatrix(risk_levels).add(pairs[ENDPOINT_COLUMNS], pairs['total_amount'], pairs['suspicion_sum'],
+                                       counts=pairs['transaction_count'])
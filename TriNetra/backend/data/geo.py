@@ -0,0 +1,224 @@
+import json
+import os
+import threading
+
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.195
+
+SIMPLEMAP_PATH = os.path.join(os.path.dirname(__file__), 'simplemap.json')
+
+# Query points handled per vectorized step (bounds the candidate matrices)
+QUERY_CHUNK = 16384
+
+# Up to this many cities a full dot-product scan (one matrix product per
+# chunk) beats gathering per-cell candidates, so the grid is not consulted
+FULL_SCAN_CITIES = 2048
+CITIES_PER_CELL = 4
+GRID_BUILD_CHUNK = 1024
+
+
+def unit_vectors(lat, lng):
+    """Points on the unit sphere; a larger dot product means a shorter great-circle distance"""
+    lat, lng = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lng, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lng), cos_lat * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km; arguments broadcast like NumPy arrays"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=float)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+class Gazetteer:
+    """City reference points as float arrays, with vectorized nearest-city and radius lookups
+
+    Cities are ranked by the dot product of unit vectors, which orders them
+    exactly like great-circle distance without any trigonometry per pair;
+    only the winner's distance is computed with haversine. Small gazetteers
+    (simplemap.json has 162 cities) are scanned in full with one matrix
+    product per chunk. Larger ones use a uniform grid over the cities'
+    extent (sized for a few cities per cell unless cell_degrees is given):
+    each cell keeps the few cities that can be nearest to any point
+    inside it (anything farther than the cell centre's nearest city plus
+    the cell diameter cannot win), and points outside the grid fall back to
+    a full scan. Radius queries narrow candidates by a latitude band over
+    cities sorted by latitude.
+    """
+
+    def __init__(self, cities, states, countries, lat, lng, population=None, cell_degrees=None):
+        self.cities = np.asarray(cities, dtype=object)
+        self.states = np.asarray(states, dtype=object)
+        self.countries = np.asarray(countries, dtype=object)
+        self.lat = np.asarray(lat, dtype=float)
+        self.lng = np.asarray(lng, dtype=float)
+        self.population = (np.zeros(len(self.lat), dtype=np.int64) if population is None
+                           else np.asarray(population, dtype=np.int64))
+        self.cell_degrees = cell_degrees
+        self._xyz = unit_vectors(self.lat, self.lng)
+
+        self._lat_order = np.argsort(self.lat, kind='stable')
+        self._lat_sorted = self.lat[self._lat_order]
+        self._cell_candidates = None
+        if len(self.lat) > FULL_SCAN_CITIES:
+            self._build_grid()
+
+    @classmethod
+    def from_simplemap(cls, path=SIMPLEMAP_PATH, cell_degrees=None):
+        """Parse the simplemaps city list (string lat/lng/population) once"""
+        with open(path, 'r', encoding='utf-8') as f:
+            rows = json.load(f)
+        return cls(
+            [r['city'] for r in rows],
+            [r.get('admin_name', '') for r in rows],
+            [r.get('country', '') for r in rows],
+            [float(r['lat']) for r in rows],
+            [float(r['lng']) for r in rows],
+            [int(float(r.get('population') or 0)) for r in rows],
+            cell_degrees=cell_degrees
+        )
+
+    def __len__(self):
+        return len(self.lat)
+
+    def city(self, i):
+        """One city as a dict"""
+        return {
+            'city': self.cities[i],
+            'state': self.states[i],
+            'country': self.countries[i],
+            'lat': float(self.lat[i]),
+            'lng': float(self.lng[i]),
+            'population': int(self.population[i])
+        }
+
+    def _build_grid(self):
+        size = self.cell_degrees
+        if size is None:
+            # About CITIES_PER_CELL cities per cell over the cities' extent
+            area = max(np.ptp(self.lat) * np.ptp(self.lng), 1e-6)
+            size = self.cell_degrees = float(np.sqrt(area * CITIES_PER_CELL / len(self.lat)))
+        self._lat0 = np.floor(self.lat.min() / size) * size - size
+        self._lng0 = np.floor(self.lng.min() / size) * size - size
+        self._rows = int(np.ceil((self.lat.max() - self._lat0) / size)) + 2
+        self._cols = int(np.ceil((self.lng.max() - self._lng0) / size)) + 2
+
+        row, col = np.divmod(np.arange(self._rows * self._cols), self._cols)
+        south = self._lat0 + row * size
+        west = self._lng0 + col * size
+        centre_lat, centre_lng = south + size / 2, west + size / 2
+        # Farthest corner from the centre (the poleward edge is narrower)
+        radius = np.maximum(haversine_km(centre_lat, centre_lng, south, west),
+                            haversine_km(centre_lat, centre_lng, south + size, west))
+        centres = unit_vectors(centre_lat, centre_lng)
+
+        cells, cities = [], []
+        for start in range(0, len(centres), GRID_BUILD_CHUNK):
+            block = slice(start, start + GRID_BUILD_CHUNK)
+            dots = centres[block] @ self._xyz.T
+            nearest = np.arccos(np.clip(dots.max(axis=1), -1.0, 1.0))
+            limit = np.minimum(nearest + 2 * radius[block] / EARTH_RADIUS_KM, np.pi)
+            cell, city = np.nonzero(dots >= np.cos(limit)[:, None] - 1e-12)
+            cells.append(cell + start)
+            cities.append(city)
+        cells, cities = np.concatenate(cells), np.concatenate(cities)
+
+        # Cells are bucketed by candidate count (rounded up to a power of two)
+        # so dense cells are not padded out to the width of sparse ones
+        counts = np.bincount(cells, minlength=len(centres))
+        bounds = np.concatenate([[0], np.cumsum(counts)])
+        self._cell_class = np.ceil(np.log2(np.maximum(counts, 1))).astype(np.int64)
+        self._cell_slot = np.zeros(len(centres), dtype=np.int64)
+        self._cell_candidates = {}
+        self._cell_vectors = {}
+        for width_class in np.unique(self._cell_class):
+            members = np.flatnonzero(self._cell_class == width_class)
+            self._cell_slot[members] = np.arange(len(members))
+            offsets = np.arange(2 ** width_class)
+            picks = bounds[members, None] + offsets
+            self._cell_candidates[int(width_class)] = np.where(
+                offsets < counts[members, None], cities[np.minimum(picks, len(cities) - 1)], -1
+            )
+            self._cell_vectors[int(width_class)] = self._xyz[self._cell_candidates[int(width_class)]]
+
+    def _cells(self, lat, lng):
+        """Grid cell per point, -1 outside the grid"""
+        row = np.floor((lat - self._lat0) / self.cell_degrees).astype(np.int64)
+        col = np.floor((lng - self._lng0) / self.cell_degrees).astype(np.int64)
+        inside = (row >= 0) & (row < self._rows) & (col >= 0) & (col < self._cols)
+        return np.where(inside, row * self._cols + col, -1)
+
+    def nearest(self, lat, lng):
+        """Index of and distance (km) to the nearest city for each point"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lng = np.atleast_1d(np.asarray(lng, dtype=float))
+        index = np.zeros(len(lat), dtype=np.int64)
+
+        if self._cell_candidates is None:
+            cells = np.full(len(lat), -1)
+        else:
+            cells = self._cells(lat, lng)
+        for start in range(0, len(lat), QUERY_CHUNK):
+            block = np.arange(start, min(start + QUERY_CHUNK, len(lat)))
+            points = unit_vectors(lat[block], lng[block])
+            block_cells = cells[block]
+            outside = block_cells < 0
+            if outside.any():
+                index[block[outside]] = np.argmax(points[outside] @ self._xyz.T, axis=1)
+            if outside.all():
+                continue
+            classes = np.where(outside, -1, self._cell_class[block_cells])
+            for width_class in np.unique(classes[~outside]):
+                chosen = np.flatnonzero(classes == width_class)
+                slots = self._cell_slot[block_cells[chosen]]
+                candidates = self._cell_candidates[int(width_class)][slots]
+                dots = np.einsum('nkd,nd->nk', self._cell_vectors[int(width_class)][slots], points[chosen])
+                dots[candidates < 0] = -2.0
+                best = np.argmax(dots, axis=1)
+                index[block[chosen]] = candidates[np.arange(len(best)), best]
+
+        distance = haversine_km(lat, lng, self.lat[index], self.lng[index])
+        return index, distance
+
+    def within_radius(self, lat, lng, radius_km):
+        """For each point, indices of cities within radius_km, nearest first"""
+        lat = np.atleast_1d(np.asarray(lat, dtype=float))
+        lng = np.atleast_1d(np.asarray(lng, dtype=float))
+        band = radius_km / KM_PER_DEGREE_LAT
+        lo = np.searchsorted(self._lat_sorted, lat - band, side='left')
+        hi = np.searchsorted(self._lat_sorted, lat + band, side='right')
+        counts = hi - lo
+
+        point = np.repeat(np.arange(len(lat)), counts)
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        city = self._lat_order[np.repeat(lo, counts) + offsets]
+        d = haversine_km(lat[point], lng[point], self.lat[city], self.lng[city])
+        keep = d <= radius_km
+        point, city, d = point[keep], city[keep], d[keep]
+
+        order = np.lexsort((d, point))
+        bounds = np.searchsorted(point[order], np.arange(len(lat) + 1))
+        city = city[order]
+        return [city[bounds[i]:bounds[i + 1]] for i in range(len(lat))]
+
+    def reverse_geocode(self, lat, lng, max_km=50.0):
+        """Nearest city name per point, or None where the nearest city is over max_km away"""
+        index, distance = self.nearest(lat, lng)
+        return np.where(distance <= max_km, self.cities[index], None)
+
+
+_gazetteer = None
+_gazetteer_lock = threading.Lock()
+
+
+def gazetteer():
+    """Shared Gazetteer over data/simplemap.json, parsed and indexed on first use"""
+    global _gazetteer
+    if _gazetteer is None:
+        with _gazetteer_lock:
+            if _gazetteer is None:
+                _gazetteer = Gazetteer.from_simplemap()
+    return _gazetteer
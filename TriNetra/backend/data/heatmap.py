@@ -0,0 +1,62 @@
+import math
+
+# Cells per degree at each zoom level: 10, 1, 0.1 and 0.01 degree cells
+HEATMAP_ZOOM_LEVELS = {0: 0.1, 1: 1.0, 2: 10.0, 3: 100.0}
+DEFAULT_HEATMAP_ZOOM = 2
+
+# Tile rows per scenario; this name reads every scenario's rows together
+ALL_SCENARIOS = 'all'
+
+WORLD_BBOX = (-90.0, -180.0, 90.0, 180.0)
+
+
+def cell_range(south, west, north, east, scale):
+    """Inclusive integer cell bounds covering a bounding box"""
+    return (math.floor(south * scale), math.floor(west * scale),
+            math.floor(north * scale), math.floor(east * scale))
+
+
+def query_heatmap_cells(conn, zoom=DEFAULT_HEATMAP_ZOOM, bbox=None, scenario=ALL_SCENARIOS):
+    """Heatmap cells at one zoom level inside bbox (south, west, north, east)
+
+    Reads only the precomputed tile rows in range, so the cost follows the
+    number of cells, not the transactions under them. A bbox with west > east
+    wraps across the antimeridian.
+    """
+    scale = HEATMAP_ZOOM_LEVELS[zoom]
+    south, west, north, east = bbox or WORLD_BBOX
+    lat_low, lng_low, lat_high, lng_high = cell_range(south, west, north, east, scale)
+
+    conditions = ['zoom = ?', 'lat_cell BETWEEN ? AND ?', 'transaction_count > 0']
+    params = [zoom, lat_low, lat_high]
+    if west <= east:
+        conditions.append('lng_cell BETWEEN ? AND ?')
+    else:
+        conditions.append('(lng_cell >= ? OR lng_cell <= ?)')
+    params += [lng_low, lng_high]
+    if scenario != ALL_SCENARIOS:
+        conditions.append('scenario = ?')
+        params.append(scenario)
+
+    rows = conn.execute(f'''
+        SELECT lat_cell, lng_cell, SUM(transaction_count), SUM(total_amount), SUM(risk_score)
+        FROM heatmap_cells
+        WHERE {' AND '.join(conditions)}
+        GROUP BY lat_cell, lng_cell
+    ''', params)
+
+    size = 1 / scale
+    cells = []
+    for lat_cell, lng_cell, count, total_amount, risk_score in rows:
+        avg_risk_score = risk_score / count
+        cells.append({
+            'lat': round((lat_cell + 0.5) * size, 6),
+            'lng': round((lng_cell + 0.5) * size, 6),
+            'cell_size': size,
+            'risk_score': risk_score,
+            'transaction_count': count,
+            'total_amount': total_amount,
+            'avg_risk_score': avg_risk_score,
+            'intensity': min(avg_risk_score * count / 10, 1.0)
+        })
+    return cells
@@ -0,0 +1,237 @@
+import argparse
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from itertools import islice
+
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from data.migrations import apply_migrations, bump_data_version, TRANSACTION_COLUMNS
+from data.enrichment import store_enrichment
+from utils.time_utils import to_epoch
+
+INGEST_COLUMNS = TRANSACTION_COLUMNS + ['ts_epoch']
+
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_COMMIT_EVERY = 100000
+# Upper bounds on both; batch_size caps the rows held in memory at once
+MAX_BATCH_SIZE = 50000
+MAX_COMMIT_EVERY = 1000000
+MAX_ERROR_SAMPLES = 10
+
+
+class IngestError(ValueError):
+    """Raised for a record that cannot be loaded into transactions"""
+
+
+def iter_ndjson(stream):
+    """Yield one dict per non-empty line of a text stream"""
+    for line_number, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except json.JSONDecodeError as e:
+            yield IngestError(f'line {line_number}: invalid JSON ({e.msg})')
+
+
+def iter_csv(stream):
+    """Yield one dict per CSV row of a text stream (header row required)"""
+    for row in csv.DictReader(stream):
+        yield row
+
+
+def iter_records(stream, fmt):
+    """Pick the record parser for a format name"""
+    if fmt == 'ndjson':
+        return iter_ndjson(stream)
+    if fmt == 'csv':
+        return iter_csv(stream)
+    raise ValueError(f'Unsupported ingest format: {fmt}')
+
+
+def _to_float(value, field, default=None):
+    if value is None or value == '':
+        if default is not None:
+            return default
+        raise IngestError(f'missing {field}')
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise IngestError(f'invalid {field}: {value!r}')
+
+
+def normalize_record(record):
+    """Convert a raw feed record into a row tuple matching INGEST_COLUMNS"""
+    if isinstance(record, Exception):
+        raise record
+    if not isinstance(record, dict):
+        raise IngestError('record is not an object')
+
+    transaction_id = record.get('transaction_id') or record.get('id')
+    if not transaction_id:
+        raise IngestError('missing transaction_id')
+
+    timestamp = record.get('timestamp')
+    ts_epoch = to_epoch(timestamp)
+    if ts_epoch is None:
+        raise IngestError(f'invalid timestamp for {transaction_id}: {timestamp!r}')
+
+    return (
+        str(transaction_id),
+        record.get('from_account') or record.get('from'),
+        record.get('to_account') or record.get('to'),
+        _to_float(record.get('amount'), 'amount'),
+        str(timestamp),
+        record.get('transaction_type') or 'transfer',
+        _to_float(record.get('suspicious_score'), 'suspicious_score', default=0.0),
+        record.get('pattern_type') or 'unknown',
+        record.get('scenario') or 'ingested',
+        ts_epoch
+    )
+
+
+class TransactionIngestor:
+    """Streams records into transactions in bounded batches
+
+    Rows are normalized batch_size at a time and written with executemany,
+    committing every commit_every rows so only one batch is held in memory.
+    Both are clamped to MAX_BATCH_SIZE / MAX_COMMIT_EVERY. Duplicate
+    transaction_ids are skipped by the UNIQUE constraint.
+    """
+
+    def __init__(self, conn, batch_size=DEFAULT_BATCH_SIZE, commit_every=DEFAULT_COMMIT_EVERY):
+        self.conn = conn
+        self.batch_size = min(max(1, int(batch_size)), MAX_BATCH_SIZE)
+        self.commit_every = min(max(self.batch_size, int(commit_every)), MAX_COMMIT_EVERY)
+        column_list = ', '.join(INGEST_COLUMNS)
+        placeholders = ', '.join('?' for _ in INGEST_COLUMNS)
+        self.insert_sql = f'INSERT OR IGNORE INTO transactions ({column_list}) VALUES ({placeholders})'
+
+    def _insert_batch(self, rows):
+        """Insert one batch (plus its enrichment) and return how many rows were new"""
+        # rowcount excludes rows touched by triggers, unlike total_changes
+        inserted = self.conn.executemany(self.insert_sql, rows).rowcount
+        store_enrichment(self.conn, [row[0] for row in rows])
+        return inserted
+
+    def _commit(self, changed):
+        """Commit, bumping the data version if this commit adds rows"""
+        if changed:
+            bump_data_version(self.conn)
+        self.conn.commit()
+
+    def ingest(self, records):
+        """Load an iterable of raw records and return ingest statistics"""
+        stats = {
+            'rows_received': 0,
+            'rows_inserted': 0,
+            'duplicates': 0,
+            'rejected': 0,
+            'batches': 0,
+            'errors': []
+        }
+        started = time.perf_counter()
+        uncommitted = 0
+        changed = False
+        records = iter(records)
+
+        try:
+            while True:
+                chunk = list(islice(records, self.batch_size))
+                if not chunk:
+                    break
+
+                rows = []
+                for record in chunk:
+                    try:
+                        rows.append(normalize_record(record))
+                    except IngestError as e:
+                        stats['rejected'] += 1
+                        if len(stats['errors']) < MAX_ERROR_SAMPLES:
+                            stats['errors'].append(str(e))
+                stats['rows_received'] += len(chunk)
+
+                if rows:
+                    inserted = self._insert_batch(rows)
+                    stats['rows_inserted'] += inserted
+                    stats['duplicates'] += len(rows) - inserted
+                    uncommitted += len(rows)
+                    if inserted:
+                        changed = True
+                stats['batches'] += 1
+
+                if uncommitted >= self.commit_every:
+                    self._commit(changed)
+                    changed = False
+                    uncommitted = 0
+
+            self._commit(changed)
+        except Exception:
+            self.conn.rollback()
+            raise
+
+        elapsed = time.perf_counter() - started
+        stats['elapsed_seconds'] = round(elapsed, 3)
+        stats['rows_per_second'] = round(stats['rows_received'] / elapsed, 1) if elapsed > 0 else 0.0
+        return stats
+
+
+def ingest_stream(conn, stream, fmt, batch_size=DEFAULT_BATCH_SIZE, commit_every=DEFAULT_COMMIT_EVERY):
+    """Parse a text stream in the given format and load it into transactions"""
+    ingestor = TransactionIngestor(conn, batch_size=batch_size, commit_every=commit_every)
+    return ingestor.ingest(iter_records(stream, fmt))
+
+
+def detect_format(filename, explicit=None):
+    """Infer ndjson/csv from an explicit flag or the file extension"""
+    if explicit:
+        return explicit
+    return 'csv' if filename.lower().endswith('.csv') else 'ndjson'
+
+
+def main(argv=None):
+    """Command-line bulk loader: python data/ingest.py feed.ndjson [--format csv]"""
+    from config import Config
+
+    parser = argparse.ArgumentParser(description='Bulk load transactions from NDJSON/CSV feeds')
+    parser.add_argument('path', help="Feed file, or '-' for stdin")
+    parser.add_argument('--format', choices=['ndjson', 'csv'], help='Feed format (default: from extension)')
+    parser.add_argument('--db', default=Config.DATABASE_PATH, help='SQLite database path')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument('--commit-every', type=int, default=DEFAULT_COMMIT_EVERY)
+    args = parser.parse_args(argv)
+
+    conn = sqlite3.connect(args.db)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    apply_migrations(conn)
+
+    if args.path == '-':
+        stream = io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8', newline='')
+        fmt = args.format or 'ndjson'
+    else:
+        stream = open(args.path, 'r', encoding='utf-8', newline='')
+        fmt = detect_format(args.path, args.format)
+
+    try:
+        print(f"🔄 Ingesting {args.path} ({fmt}) into {args.db}...")
+        stats = ingest_stream(conn, stream, fmt, args.batch_size, args.commit_every)
+    finally:
+        stream.close()
+        conn.close()
+
+    print(f"✅ {stats['rows_inserted']} inserted, {stats['duplicates']} duplicates, "
+          f"{stats['rejected']} rejected in {stats['elapsed_seconds']}s "
+          f"({stats['rows_per_second']} rows/sec)")
+    for error in stats['errors']:
+        print(f"   ⚠️  {error}")
+    return stats
+
+
+if __name__ == "__main__":
+    main()
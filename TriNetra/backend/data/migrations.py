@@ -0,0 +1,679 @@
+import hashlib
+import json
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+
+# Column layout owned by the migrations below; bulk loaders insert into
+# this schema instead of letting pandas recreate the table
+TRANSACTION_COLUMNS = [
+    'transaction_id', 'from_account', 'to_account', 'amount', 'timestamp',
+    'transaction_type', 'suspicious_score', 'pattern_type', 'scenario'
+]
+
+TRANSACTIONS_DDL = '''
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id TEXT UNIQUE,
+        from_account TEXT,
+        to_account TEXT,
+        amount REAL,
+        timestamp TEXT,
+        transaction_type TEXT,
+        suspicious_score REAL,
+        pattern_type TEXT,
+        scenario TEXT
+    )
+'''
+
+ACCOUNTS_DDL = '''
+    CREATE TABLE IF NOT EXISTS accounts (
+        account_id TEXT PRIMARY KEY,
+        account_name TEXT,
+        account_type TEXT,
+        country TEXT,
+        risk_level TEXT
+    )
+'''
+
+
+def _table_columns(conn, table):
+    """Return the column names of a table (empty if it does not exist)"""
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _create_core_tables(conn):
+    """Create transactions/accounts, rebuilding tables left behind by DataFrame.to_sql"""
+    columns = _table_columns(conn, 'transactions')
+
+    if columns and 'id' not in columns:
+        # Older databases were written with if_exists='replace', which drops
+        # the primary key and UNIQUE constraint; copy rows into the real schema
+        conn.execute('ALTER TABLE transactions RENAME TO transactions_legacy')
+        conn.execute(TRANSACTIONS_DDL)
+        shared = [c for c in TRANSACTION_COLUMNS if c in columns]
+        column_list = ', '.join(shared)
+        conn.execute(
+            f'INSERT OR IGNORE INTO transactions ({column_list}) '
+            f'SELECT {column_list} FROM transactions_legacy ORDER BY rowid'
+        )
+        conn.execute('DROP TABLE transactions_legacy')
+    else:
+        conn.execute(TRANSACTIONS_DDL)
+
+    conn.execute(ACCOUNTS_DDL)
+
+
+def _add_epoch_column(conn):
+    """Add the integer ts_epoch column unless a rebuilt table already has it"""
+    if 'ts_epoch' not in _table_columns(conn, 'transactions'):
+        conn.execute('ALTER TABLE transactions ADD COLUMN ts_epoch INTEGER')
+
+
+# Frozen migration steps
+#
+# Data backfills and generated DDL are copied here as they stood when their
+# migration was written, instead of calling application code, so later
+# edits to enrichment, heatmap or library modules cannot change what an
+# already-applied migration does on a fresh database.
+
+# Migration 5: enrichment reference data (city, state, region, country, lat, lng)
+_V5_INDIAN_LOCATIONS = [
+    ('Mumbai', 'Maharashtra', 'Western', 'India', 19.0760, 72.8777),
+    ('New Delhi', 'Delhi', 'Northern', 'India', 28.6139, 77.2090),
+    ('Bangalore', 'Karnataka', 'Southern', 'India', 12.9716, 77.5946),
+    ('Chennai', 'Tamil Nadu', 'Southern', 'India', 13.0827, 80.2707),
+    ('Kolkata', 'West Bengal', 'Eastern', 'India', 22.5726, 88.3639),
+    ('Ahmedabad', 'Gujarat', 'Western', 'India', 23.0225, 72.5714),
+    ('Jaipur', 'Rajasthan', 'Western', 'India', 26.9124, 75.7873),
+    ('Chandigarh', 'Punjab', 'Northern', 'India', 30.7333, 76.7794),
+    ('Lucknow', 'Uttar Pradesh', 'Northern', 'India', 26.8467, 80.9462),
+]
+_V5_INTERNATIONAL_LOCATIONS = [
+    ('Dubai', 'Dubai', 'Middle East', 'UAE', 25.2048, 55.2708),
+    ('Singapore', 'Singapore', 'Southeast Asia', 'Singapore', 1.3521, 103.8198),
+    ('Karachi', 'Karachi', 'South Asia', 'Pakistan', 24.8607, 67.0011),
+    ('London', 'London', 'Europe', 'UK', 51.5074, -0.1278),
+    ('New York', 'New York', 'North America', 'USA', 40.7128, -74.0060),
+]
+_V5_TRANSACTION_METHODS = [
+    'NEFT', 'RTGS', 'IMPS', 'UPI', 'Wire Transfer',
+    'Cryptocurrency', 'Hawala', 'Cash Deposit', 'Cheque', 'Digital Wallet'
+]
+_V5_BANKS = [
+    'State Bank of India', 'HDFC Bank', 'ICICI Bank', 'Axis Bank',
+    'Punjab National Bank', 'Bank of Baroda', 'Canara Bank', 'IDBI Bank',
+    'Central Bank of India', 'Union Bank of India'
+]
+_V5_ENRICHMENT_COLUMNS = [
+    'loc_city', 'loc_state', 'loc_region', 'loc_country', 'loc_lat', 'loc_lng',
+    'transaction_method', 'bank_name', 'branch_code', 'ifsc_code', 'swift_code',
+    'connected_accounts',
+    'from_city', 'from_lat', 'from_lon', 'to_city', 'to_lat', 'to_lon'
+]
+_V5_CITIES_PATH = os.path.join(os.path.dirname(__file__), 'simplemap.json')
+
+
+def _v5_enrichment_row(transaction_id, cities):
+    digest = hashlib.blake2b(str(transaction_id).encode('utf-8'), digest_size=40).digest()
+    d = [int.from_bytes(digest[i * 4:(i + 1) * 4], 'big') for i in range(10)]
+    if d[0] % 100 < 85:
+        location = _V5_INDIAN_LOCATIONS[d[1] % len(_V5_INDIAN_LOCATIONS)]
+    else:
+        location = _V5_INTERNATIONAL_LOCATIONS[d[1] % len(_V5_INTERNATIONAL_LOCATIONS)]
+    from_city = cities[d[8] % len(cities)]
+    to_city = cities[d[9] % len(cities)]
+    return location + (
+        _V5_TRANSACTION_METHODS[d[2] % len(_V5_TRANSACTION_METHODS)],
+        _V5_BANKS[d[3] % len(_V5_BANKS)],
+        f'BR{1000 + d[4] % 9000}',
+        f'SBIN{100000 + d[5] % 900000}',
+        f'SWIFT{10000 + d[6] % 90000}',
+        2 + d[7] % 14,
+        from_city['city'], float(from_city['lat']), float(from_city['lng']),
+        to_city['city'], float(to_city['lat']), float(to_city['lng'])
+    )
+
+
+def _v5_backfill_enrichment(conn, batch_size=10000):
+    """Enrich every transaction that has no enrichment row yet"""
+    with open(_V5_CITIES_PATH, 'r', encoding='utf-8') as f:
+        cities = json.load(f)
+    column_list = ', '.join(['transaction_id'] + _V5_ENRICHMENT_COLUMNS)
+    placeholders = ', '.join('?' for _ in range(len(_V5_ENRICHMENT_COLUMNS) + 1))
+    while True:
+        ids = [row[0] for row in conn.execute('''
+            SELECT t.transaction_id FROM transactions t
+            WHERE t.transaction_id IS NOT NULL AND NOT EXISTS (
+                SELECT 1 FROM transaction_enrichment e WHERE e.transaction_id = t.transaction_id
+            )
+            LIMIT ?
+        ''', (batch_size,))]
+        if not ids:
+            break
+        conn.executemany(
+            f'INSERT OR IGNORE INTO transaction_enrichment ({column_list}) VALUES ({placeholders})',
+            [(str(tx_id),) + _v5_enrichment_row(tx_id, cities) for tx_id in ids]
+        )
+
+
+# Migration 7: zoom scales (cells per degree) and the country risk CASE
+_V7_ZOOM_LEVELS = [(0, 0.1), (1, 1.0), (2, 10.0), (3, 100.0)]
+_V7_RISK_LEVEL_SQL = (
+    "(CASE WHEN {country} IN ('Pakistan', 'Afghanistan', 'North Korea', 'Iran') THEN 3 "
+    "WHEN {country} IN ('UAE', 'Malaysia', 'Thailand', 'Myanmar') THEN 2 ELSE 1 END)"
+)
+
+
+def _v7_floor_sql(expr):
+    return f'(CAST({expr} AS INTEGER) - (({expr}) < CAST({expr} AS INTEGER)))'
+
+
+def _v7_cell_upsert(tx, location, sign, source='', where='1'):
+    """Add (sign '+') or remove (sign '-') one transaction in every zoom level's cell"""
+    return f'''
+        INSERT INTO heatmap_cells (zoom, scenario, lat_cell, lng_cell,
+                                   transaction_count, total_amount, suspicion_sum, risk_score)
+        SELECT z.zoom, COALESCE({tx}.scenario, ''),
+               {_v7_floor_sql(f'{location}.loc_lat * z.scale')}, {_v7_floor_sql(f'{location}.loc_lng * z.scale')},
+               {sign}1, {sign}COALESCE({tx}.amount, 0), {sign}COALESCE({tx}.suspicious_score, 0),
+               {sign}COALESCE({tx}.suspicious_score, 0) * {_V7_RISK_LEVEL_SQL.format(country=f'{location}.loc_country')}
+        FROM heatmap_zoom_levels z{source}
+        WHERE {location}.loc_lat IS NOT NULL AND {location}.loc_lng IS NOT NULL AND {where}
+        ON CONFLICT (zoom, scenario, lat_cell, lng_cell) DO UPDATE SET
+            transaction_count = transaction_count + excluded.transaction_count,
+            total_amount = total_amount + excluded.total_amount,
+            suspicion_sum = suspicion_sum + excluded.suspicion_sum,
+            risk_score = risk_score + excluded.risk_score
+    '''
+
+
+def _v7_create_heatmap_tiles(conn):
+    """Create the zoom-level tile table, fill it from existing rows and keep it in sync
+
+    Every writer goes through transaction_enrichment (ingest, backfill,
+    synthetic data), so a transaction is counted when its location is
+    stored, moved when its amount/score/scenario changes, and removed just
+    before the transaction row is deleted.
+    """
+    conn.execute('CREATE TABLE IF NOT EXISTS heatmap_zoom_levels (zoom INTEGER PRIMARY KEY, scale REAL NOT NULL)')
+    conn.executemany('INSERT OR REPLACE INTO heatmap_zoom_levels (zoom, scale) VALUES (?, ?)', _V7_ZOOM_LEVELS)
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS heatmap_cells (
+            zoom INTEGER NOT NULL,
+            scenario TEXT NOT NULL,
+            lat_cell INTEGER NOT NULL,
+            lng_cell INTEGER NOT NULL,
+            transaction_count INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            suspicion_sum REAL NOT NULL,
+            risk_score REAL NOT NULL,
+            PRIMARY KEY (zoom, scenario, lat_cell, lng_cell)
+        ) WITHOUT ROWID
+    ''')
+    # Cross-scenario bounding box reads
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_heatmap_cells_zoom_cell ON heatmap_cells (zoom, lat_cell, lng_cell)')
+
+    conn.execute(_v7_cell_upsert('t', 'e', '+', source=' JOIN transactions t JOIN transaction_enrichment e '
+                                                       'ON e.transaction_id = t.transaction_id'))
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_heatmap_enrichment_insert
+        AFTER INSERT ON transaction_enrichment
+        BEGIN
+            {_v7_cell_upsert('t', 'NEW', '+', source=', transactions t', where='t.transaction_id = NEW.transaction_id')};
+        END
+    ''')
+    # BEFORE so the enrichment row is still there whatever order the AFTER triggers run in
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_heatmap_transactions_delete
+        BEFORE DELETE ON transactions
+        BEGIN
+            {_v7_cell_upsert('OLD', 'e', '-', source=', transaction_enrichment e',
+                             where='e.transaction_id = OLD.transaction_id')};
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_heatmap_transactions_update
+        AFTER UPDATE OF amount, suspicious_score, scenario ON transactions
+        BEGIN
+            {_v7_cell_upsert('OLD', 'e', '-', source=', transaction_enrichment e',
+                             where='e.transaction_id = OLD.transaction_id')};
+            {_v7_cell_upsert('NEW', 'e', '+', source=', transaction_enrichment e',
+                             where='e.transaction_id = NEW.transaction_id')};
+        END
+    ''')
+
+
+# Migration 9: state/country of each flow endpoint, and city-level flow pair sums
+_V9_ENDPOINT_COLUMNS = ['from_state', 'from_country', 'to_state', 'to_country']
+_V9_PAIR_KEY = ['scenario', 'from_country', 'from_state', 'from_city', 'to_country', 'to_state', 'to_city']
+
+
+def _v9_add_endpoint_columns(conn):
+    existing = _table_columns(conn, 'transaction_enrichment')
+    for column in _V9_ENDPOINT_COLUMNS:
+        if column not in existing:
+            conn.execute(f'ALTER TABLE transaction_enrichment ADD COLUMN {column} TEXT')
+
+
+def _v9_unit_vectors(lat, lng):
+    lat, lng = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lng, dtype=float))
+    return np.stack([np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)], axis=-1)
+
+
+def _v9_backfill_endpoints(conn, batch_size=10000):
+    """Give stored endpoints the state and country of the nearest simplemap city ('' without coordinates)"""
+    with open(_V5_CITIES_PATH, 'r', encoding='utf-8') as f:
+        cities = json.load(f)
+    states = np.array([c.get('admin_name', '') for c in cities], dtype=object)
+    countries = np.array([c.get('country', '') for c in cities], dtype=object)
+    city_vectors = _v9_unit_vectors([float(c['lat']) for c in cities], [float(c['lng']) for c in cities])
+
+    def resolve(lat, lng):
+        lat = np.array([np.nan if v is None else v for v in lat], dtype=float)
+        lng = np.array([np.nan if v is None else v for v in lng], dtype=float)
+        known = ~(np.isnan(lat) | np.isnan(lng))
+        resolved_states = np.full(len(lat), '', dtype=object)
+        resolved_countries = np.full(len(lat), '', dtype=object)
+        if known.any():
+            nearest = np.argmax(_v9_unit_vectors(lat[known], lng[known]) @ city_vectors.T, axis=1)
+            resolved_states[known] = states[nearest]
+            resolved_countries[known] = countries[nearest]
+        return resolved_states.tolist(), resolved_countries.tolist()
+
+    while True:
+        rows = conn.execute('''
+            SELECT transaction_id, from_lat, from_lon, to_lat, to_lon FROM transaction_enrichment
+            WHERE from_country IS NULL LIMIT ?
+        ''', (batch_size,)).fetchall()
+        if not rows:
+            break
+        ids, from_lat, from_lon, to_lat, to_lon = zip(*rows)
+        conn.executemany(
+            'UPDATE transaction_enrichment SET from_state = ?, from_country = ?, to_state = ?, to_country = ? '
+            'WHERE transaction_id = ?',
+            zip(*resolve(from_lat, from_lon), *resolve(to_lat, to_lon), ids)
+        )
+
+
+def _v9_pair_upsert(tx, enrichment, sign, source, where='1'):
+    """Add (sign '+') or remove (sign '-') one transaction in its flow pair
+
+    A transaction booked in another country (loc_*) than its to_ endpoint
+    flows there instead, which is what makes a flow cross-border.
+    """
+    abroad = f"{enrichment}.loc_country IS NOT NULL AND {enrichment}.loc_country != COALESCE({enrichment}.to_country, '')"
+    to_sql = [f"CASE WHEN {abroad} THEN COALESCE({enrichment}.loc_{part}, '') "
+              f"ELSE COALESCE({enrichment}.to_{part}, '') END" for part in ('country', 'state', 'city')]
+    return f'''
+        INSERT INTO flow_pairs ({', '.join(_V9_PAIR_KEY)}, transaction_count, total_amount, suspicion_sum)
+        SELECT COALESCE({tx}.scenario, ''),
+               COALESCE({enrichment}.from_country, ''), COALESCE({enrichment}.from_state, ''),
+               COALESCE({enrichment}.from_city, ''), {', '.join(to_sql)},
+               {sign}1, {sign}COALESCE({tx}.amount, 0), {sign}COALESCE({tx}.suspicious_score, 0)
+        FROM {source}
+        WHERE {where}
+        ON CONFLICT ({', '.join(_V9_PAIR_KEY)}) DO UPDATE SET
+            transaction_count = transaction_count + excluded.transaction_count,
+            total_amount = total_amount + excluded.total_amount,
+            suspicion_sum = suspicion_sum + excluded.suspicion_sum
+    '''
+
+
+def _v9_create_flow_pairs(conn):
+    """Create the flow pair table, fill it from existing rows and keep it in sync
+
+    Maintained by the same writes as the heatmap tiles: a transaction is
+    counted when its enrichment row is stored, moved when its
+    amount/score/scenario changes, and removed just before the transaction
+    row is deleted.
+    """
+    conn.execute(f'''
+        CREATE TABLE IF NOT EXISTS flow_pairs (
+            {' '.join(f'{column} TEXT NOT NULL,' for column in _V9_PAIR_KEY)}
+            transaction_count INTEGER NOT NULL,
+            total_amount REAL NOT NULL,
+            suspicion_sum REAL NOT NULL,
+            PRIMARY KEY ({', '.join(_V9_PAIR_KEY)})
+        ) WITHOUT ROWID
+    ''')
+    conn.execute(_v9_pair_upsert('t', 'e', '+', 'transactions t JOIN transaction_enrichment e '
+                                                'ON e.transaction_id = t.transaction_id'))
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_flow_pairs_enrichment_insert
+        AFTER INSERT ON transaction_enrichment
+        BEGIN
+            {_v9_pair_upsert('t', 'NEW', '+', 'transactions t', where='t.transaction_id = NEW.transaction_id')};
+        END
+    ''')
+    # BEFORE so the enrichment row is still there whatever order the AFTER triggers run in
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_flow_pairs_transactions_delete
+        BEFORE DELETE ON transactions
+        BEGIN
+            {_v9_pair_upsert('OLD', 'e', '-', 'transaction_enrichment e',
+                             where='e.transaction_id = OLD.transaction_id')};
+        END
+    ''')
+    conn.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_flow_pairs_transactions_update
+        AFTER UPDATE OF amount, suspicious_score, scenario ON transactions
+        BEGIN
+            {_v9_pair_upsert('OLD', 'e', '-', 'transaction_enrichment e',
+                             where='e.transaction_id = OLD.transaction_id')};
+            {_v9_pair_upsert('NEW', 'e', '+', 'transaction_enrichment e',
+                             where='e.transaction_id = NEW.transaction_id')};
+        END
+    ''')
+
+
+# Migration 10: pattern library transaction counts widened from uint8 to uint32
+def _v10_widen_pattern_counts(conn):
+    """Rewrite one-byte transaction_counts blobs as four bytes per pattern"""
+    rows = conn.execute('''
+        SELECT row_id, transaction_counts FROM hydra_pattern_library
+        WHERE LENGTH(transaction_counts) = pattern_count
+    ''').fetchall()
+    conn.executemany(
+        'UPDATE hydra_pattern_library SET transaction_counts = ? WHERE row_id = ?',
+        [(np.frombuffer(blob, dtype=np.uint8).astype(np.uint32).tobytes(), row_id) for row_id, blob in rows]
+    )
+
+
+# Ordered list of (version, name, steps). Steps are SQL strings or callables
+# taking the connection. Never edit an applied migration - append a new one.
+MIGRATIONS = [
+    (1, 'create core tables', [_create_core_tables]),
+    (2, 'transaction query indexes', [
+        'CREATE INDEX IF NOT EXISTS idx_transactions_scenario_timestamp ON transactions (scenario, timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_timestamp ON transactions (timestamp)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_from_account ON transactions (from_account)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_to_account ON transactions (to_account)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_scenario_suspicion ON transactions (scenario, suspicious_score)',
+    ]),
+    (3, 'integer epoch timestamp column', [
+        _add_epoch_column,
+        "UPDATE transactions SET ts_epoch = CAST(strftime('%s', timestamp) AS INTEGER)",
+        'CREATE INDEX IF NOT EXISTS idx_transactions_ts_epoch ON transactions (ts_epoch)',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_scenario_epoch ON transactions (scenario, ts_epoch)',
+        # Keep ts_epoch in sync for every writer, whatever path it inserts through
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_epoch_insert
+        AFTER INSERT ON transactions
+        FOR EACH ROW WHEN NEW.ts_epoch IS NULL
+        BEGIN
+            UPDATE transactions SET ts_epoch = CAST(strftime('%s', NEW.timestamp) AS INTEGER)
+            WHERE id = NEW.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_epoch_update
+        AFTER UPDATE OF timestamp ON transactions
+        FOR EACH ROW
+        BEGIN
+            UPDATE transactions SET ts_epoch = CAST(strftime('%s', NEW.timestamp) AS INTEGER)
+            WHERE id = NEW.id;
+        END
+        ''',
+    ]),
+    (4, 'trigram full-text search index', [
+        # Shadow index keyed by transactions.id; amount is indexed as text so
+        # partial amount searches keep working
+        '''
+        CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+            transaction_id, from_account, to_account, amount_text,
+            tokenize = 'trigram'
+        )
+        ''',
+        '''
+        INSERT INTO transactions_fts (rowid, transaction_id, from_account, to_account, amount_text)
+        SELECT id, transaction_id, from_account, to_account, CAST(amount AS TEXT) FROM transactions
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_insert
+        AFTER INSERT ON transactions
+        BEGIN
+            INSERT INTO transactions_fts (rowid, transaction_id, from_account, to_account, amount_text)
+            VALUES (NEW.id, NEW.transaction_id, NEW.from_account, NEW.to_account, CAST(NEW.amount AS TEXT));
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            DELETE FROM transactions_fts WHERE rowid = OLD.id;
+        END
+        ''',
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_fts_update
+        AFTER UPDATE OF transaction_id, from_account, to_account, amount ON transactions
+        BEGIN
+            UPDATE transactions_fts
+            SET transaction_id = NEW.transaction_id,
+                from_account = NEW.from_account,
+                to_account = NEW.to_account,
+                amount_text = CAST(NEW.amount AS TEXT)
+            WHERE rowid = NEW.id;
+        END
+        ''',
+        'CREATE INDEX IF NOT EXISTS idx_transactions_amount ON transactions (amount)',
+    ]),
+    (5, 'precomputed transaction enrichment', [
+        '''
+        CREATE TABLE IF NOT EXISTS transaction_enrichment (
+            transaction_id TEXT PRIMARY KEY,
+            loc_city TEXT,
+            loc_state TEXT,
+            loc_region TEXT,
+            loc_country TEXT,
+            loc_lat REAL,
+            loc_lng REAL,
+            transaction_method TEXT,
+            bank_name TEXT,
+            branch_code TEXT,
+            ifsc_code TEXT,
+            swift_code TEXT,
+            connected_accounts INTEGER,
+            from_city TEXT,
+            from_lat REAL,
+            from_lon REAL,
+            to_city TEXT,
+            to_lat REAL,
+            to_lon REAL
+        ) WITHOUT ROWID
+        ''',
+        _v5_backfill_enrichment,
+        '''
+        CREATE TRIGGER IF NOT EXISTS trg_transactions_enrichment_delete
+        AFTER DELETE ON transactions
+        BEGIN
+            DELETE FROM transaction_enrichment WHERE transaction_id = OLD.transaction_id;
+        END
+        ''',
+    ]),
+    (6, 'data version counter', [
+        # Single row bumped by bulk writers so cached responses can be invalidated
+        '''
+        CREATE TABLE IF NOT EXISTS data_version (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            version INTEGER NOT NULL
+        )
+        ''',
+        'INSERT OR IGNORE INTO data_version (id, version) VALUES (1, 0)',
+    ]),
+    (7, 'multi-resolution risk heatmap tiles', [_v7_create_heatmap_tiles]),
+    (8, 'columnar HYDRA pattern library', [
+        # One row per run of consecutively numbered patterns, one blob per column
+        '''
+        CREATE TABLE IF NOT EXISTS hydra_pattern_library (
+            row_id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_pattern INTEGER NOT NULL UNIQUE,
+            pattern_count INTEGER NOT NULL,
+            transaction_count INTEGER NOT NULL,
+            created_at TEXT NOT NULL,
+            type_codes BLOB NOT NULL,
+            complexity BLOB NOT NULL,
+            transaction_counts BLOB NOT NULL,
+            amounts BLOB NOT NULL
+        )
+        ''',
+    ]),
+    (9, 'persisted origin-destination flow pairs', [
+        _v9_add_endpoint_columns,
+        _v9_backfill_endpoints,
+        _v9_create_flow_pairs,
+    ]),
+    (10, 'wider pattern library transaction counts', [_v10_widen_pattern_counts]),
+]
+
+
+def _ensure_migrations_table(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name TEXT,
+            applied_at TEXT
+        )
+    ''')
+    conn.commit()
+
+
+def get_schema_version(conn):
+    """Return the highest applied migration version (0 for a fresh database)"""
+    _ensure_migrations_table(conn)
+    row = conn.execute('SELECT MAX(version) FROM schema_migrations').fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn, target_version=None):
+    """Apply pending migrations in order, each inside its own transaction"""
+    current = get_schema_version(conn)
+    applied = []
+
+    for version, name, steps in MIGRATIONS:
+        if version <= current:
+            continue
+        if target_version is not None and version > target_version:
+            break
+
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute('BEGIN')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(
+                'INSERT INTO schema_migrations (version, name, applied_at) VALUES (?, ?, ?)',
+                (version, name, datetime.now().isoformat())
+            )
+            conn.commit()
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+
+        applied.append(version)
+
+    return applied
+
+
+def get_data_version(conn):
+    """Current value of the data version counter"""
+    row = conn.execute('SELECT version FROM data_version WHERE id = 1').fetchone()
+    return row[0] if row else 0
+
+
+def bump_data_version(conn):
+    """Mark transactions as changed; call in the same transaction as the write"""
+    conn.execute('UPDATE data_version SET version = version + 1 WHERE id = 1')
+
+
+# Queries issued by the CHRONOS and Auto-SAR endpoints, with the index each
+# one is expected to use
+HOT_QUERIES = {
+    'timeline_all': (
+        'SELECT * FROM transactions WHERE ts_epoch >= ? ORDER BY ts_epoch',
+        [1735689600],
+        'idx_transactions_ts_epoch'
+    ),
+    'timeline_scenario': (
+        'SELECT * FROM transactions WHERE scenario = ? AND ts_epoch >= ? ORDER BY ts_epoch',
+        ['terrorist_financing', 1735689600],
+        'idx_transactions_scenario_epoch'
+    ),
+    'timeline_page': (
+        'SELECT * FROM transactions WHERE scenario = ? AND (ts_epoch, id) > (?, ?) '
+        'ORDER BY ts_epoch, id LIMIT ?',
+        ['terrorist_financing', 1735689600, 0, 5000],
+        'idx_transactions_scenario_epoch'
+    ),
+    'sar_generate': (
+        'SELECT * FROM transactions WHERE scenario = ? AND suspicious_score > 0.5 ORDER BY ts_epoch, id',
+        ['terrorist_financing'],
+        'idx_transactions_scenario_suspicion'
+    ),
+    'search_all': (
+        """SELECT t.* FROM transactions_fts
+           JOIN transactions t ON t.id = transactions_fts.rowid
+           WHERE transactions_fts MATCH ? ORDER BY transactions_fts.rank LIMIT ?""",
+        ['"DONOR_00"', 100],
+        'transactions_fts VIRTUAL TABLE'
+    ),
+    'search_amount': (
+        'SELECT * FROM transactions WHERE amount = ? ORDER BY ts_epoch DESC LIMIT ?',
+        [250.0, 100],
+        'idx_transactions_amount'
+    ),
+    'account_outflow': (
+        'SELECT * FROM transactions WHERE from_account = ?',
+        ['DONOR_001'],
+        'idx_transactions_from_account'
+    ),
+    'heatmap_bbox': (
+        'SELECT lat_cell, lng_cell, SUM(transaction_count) FROM heatmap_cells '
+        'WHERE zoom = ? AND lat_cell BETWEEN ? AND ? AND lng_cell BETWEEN ? AND ? GROUP BY lat_cell, lng_cell',
+        [2, 80, 300, 600, 900],
+        'idx_heatmap_cells_zoom_cell'
+    ),
+    'account_inflow': (
+        'SELECT * FROM transactions WHERE to_account = ?',
+        ['TERROR_CELL_001'],
+        'idx_transactions_to_account'
+    ),
+}
+
+
+def explain_query(conn, query, params=()):
+    """Return the EXPLAIN QUERY PLAN detail lines for a query"""
+    return [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params)]
+
+
+def check_query_plans(conn):
+    """Check every hot query against its expected index
+
+    Returns a dict of name -> {'index', 'uses_index', 'plan'}.
+    """
+    results = {}
+    for name, (query, params, index_name) in HOT_QUERIES.items():
+        plan = explain_query(conn, query, params)
+        results[name] = {
+            'index': index_name,
+            'uses_index': any(index_name in line for line in plan),
+            'plan': plan
+        }
+    return results
+
+
+def assert_query_plans(conn):
+    """Raise AssertionError if any hot query falls back to a table scan"""
+    failures = {
+        name: result['plan']
+        for name, result in check_query_plans(conn).items()
+        if not result['uses_index']
+    }
+    if failures:
+        raise AssertionError(f'Hot queries not using their indexes: {failures}')
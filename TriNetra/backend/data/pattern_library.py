@@ -0,0 +1,134 @@
+from datetime import datetime
+
+import numpy as np
+
+from models.hydra_engine import PatternBatch
+
+# Library ids are sequential pattern numbers, shown with this prefix
+PATTERN_ID_PREFIX = 'HYDRA_'
+
+# Patterns per stored row; larger saves are split so no single blob grows unbounded
+LIBRARY_ROW_PATTERNS = 50000
+
+# Column name -> stored dtype. Transaction accounts are implied by the pattern's
+# type, complexity and size and the transaction's position within it (see
+# PatternBatch), so only amounts are kept per transaction
+LIBRARY_COLUMNS = {
+    'type_codes': np.uint8,
+    'complexity': np.float64,
+    'transaction_counts': np.uint32,
+    'amounts': np.float64
+}
+
+
+def pattern_id(number):
+    return f'{PATTERN_ID_PREFIX}{int(number):010d}'
+
+
+def pattern_number(pattern_id):
+    """Pattern number of a library id; ValueError for ids not from the library"""
+    if not isinstance(pattern_id, str) or not pattern_id.startswith(PATTERN_ID_PREFIX):
+        raise ValueError(f'not a pattern library id: {pattern_id!r}')
+    return int(pattern_id[len(PATTERN_ID_PREFIX):])
+
+
+def save_patterns(conn, batch, created_at=None):
+    """Append a PatternBatch to the library and commit; returns the first pattern number assigned
+
+    Numbers are taken from the current maximum inside the INSERT itself, so
+    concurrent writers serialised by SQLite's write lock never share one.
+    Raises ValueError if an integer column does not fit its stored dtype.
+    """
+    # Checked before anything is written, so a bad batch leaves no partial rows
+    for name, dtype in LIBRARY_COLUMNS.items():
+        values = getattr(batch, name)
+        if np.issubdtype(dtype, np.integer) and len(values):
+            limits = np.iinfo(dtype)
+            if values.min() < limits.min or values.max() > limits.max:
+                raise ValueError(f'{name} out of range for {np.dtype(dtype).name} storage')
+    created_at = created_at or datetime.now().isoformat()
+    first = None
+    for start in range(0, len(batch), LIBRARY_ROW_PATTERNS):
+        part = batch.slice(start, start + LIBRARY_ROW_PATTERNS)
+        columns = {
+            'type_codes': part.type_codes,
+            'complexity': part.complexity,
+            'transaction_counts': part.transaction_counts,
+            'amounts': part.amounts
+        }
+        blobs = [np.ascontiguousarray(columns[name], dtype=dtype).tobytes() for name, dtype in LIBRARY_COLUMNS.items()]
+        cursor = conn.execute(
+            f'''INSERT INTO hydra_pattern_library
+                (first_pattern, pattern_count, transaction_count, created_at, {', '.join(LIBRARY_COLUMNS)})
+                SELECT COALESCE(MAX(first_pattern + pattern_count), 1), ?, ?, ?, ?, ?, ?, ?
+                FROM hydra_pattern_library''',
+            [len(part), int(part.offsets[-1]), created_at] + blobs
+        )
+        if first is None:
+            first = conn.execute('SELECT first_pattern FROM hydra_pattern_library WHERE row_id = ?',
+                                 (cursor.lastrowid,)).fetchone()[0]
+    conn.commit()
+    return first
+
+
+def _row_batch(row):
+    """PatternBatch from the four column blobs of one stored row"""
+    type_codes, complexity, counts, amounts = (np.frombuffer(blob, dtype=dtype)
+                                               for blob, dtype in zip(row, LIBRARY_COLUMNS.values()))
+    offsets = np.concatenate([[0], np.cumsum(counts, dtype=np.int64)])
+    return PatternBatch(type_codes.astype(np.int64), complexity, offsets, amounts)
+
+
+def load_patterns(conn, start=1, limit=None):
+    """Stored patterns numbered from start, up to limit of them
+
+    Returns (pattern numbers, PatternBatch, created_at per pattern); only
+    rows overlapping the range are read, found by seeking on first_pattern.
+    """
+    end = start + limit if limit is not None else None
+    rows = conn.execute(
+        f'''SELECT first_pattern, pattern_count, created_at, {', '.join(LIBRARY_COLUMNS)}
+            FROM hydra_pattern_library
+            WHERE first_pattern >= (SELECT COALESCE(MAX(first_pattern), 0) FROM hydra_pattern_library
+                                    WHERE first_pattern <= ?)
+              AND first_pattern + pattern_count > ? AND (? IS NULL OR first_pattern < ?)
+            ORDER BY first_pattern''',
+        (start, start, end, end)
+    ).fetchall()
+
+    numbers, batches, created = [], [], []
+    for first, count, created_at, *blobs in rows:
+        low = max(start - first, 0)
+        high = count if end is None else min(end - first, count)
+        batches.append(_row_batch(blobs).slice(low, high))
+        numbers.append(np.arange(first + low, first + high))
+        created.append(np.full(high - low, created_at, dtype=object))
+    if not rows:
+        return np.zeros(0, dtype=np.int64), PatternBatch.concatenate([]), np.zeros(0, dtype=object)
+    return np.concatenate(numbers), PatternBatch.concatenate(batches), np.concatenate(created)
+
+
+def get_pattern(conn, number):
+    """One stored pattern as a pattern dict, or None"""
+    numbers, batch, created = load_patterns(conn, number, 1)
+    if not len(numbers):
+        return None
+    return batch.pattern(0, pattern_id(numbers[0]), created[0])
+
+
+def library_stats(conn):
+    """Pattern, transaction and storage totals of the library"""
+    patterns, transactions, rows, size, first, last = conn.execute(
+        f'''SELECT COALESCE(SUM(pattern_count), 0), COALESCE(SUM(transaction_count), 0), COUNT(*),
+                   COALESCE(SUM({' + '.join(f'LENGTH({name})' for name in LIBRARY_COLUMNS)}), 0),
+                   MIN(first_pattern), MAX(first_pattern + pattern_count) - 1
+            FROM hydra_pattern_library'''
+    ).fetchone()
+    return {
+        'patterns': patterns,
+        'transactions': transactions,
+        'stored_rows': rows,
+        'stored_bytes': size,
+        'first_pattern_id': pattern_id(first) if first is not None else None,
+        'last_pattern_id': pattern_id(last) if last is not None else None
+    }
@@ -4,8 +4,13 @@ import numpy as np
 from datetime import datetime, timedelta
 import json
 import os
+import sys
 from faker import Faker
 
+sys.path.append(os.path.dirname(os.path.dirname(__file__)))
+from data.migrations import apply_migrations, bump_data_version, TRANSACTION_COLUMNS
+from data.enrichment import backfill_enrichment
+
 fake = Faker()
 
 class TriNetraDataGenerator:
@@ -18,39 +23,13 @@ class TriNetraDataGenerator:
         os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
     
     def create_tables(self):
-        """Create database tables"""
+        """Create or upgrade database tables via the migration subsystem"""
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Transactions table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                transaction_id TEXT UNIQUE,
-                from_account TEXT,
-                to_account TEXT,
-                amount REAL,
-                timestamp TEXT,
-                transaction_type TEXT,
-                suspicious_score REAL,
-                pattern_type TEXT,
-                scenario TEXT
-            )
-        ''')
-        
-        # Accounts table
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS accounts (
-                account_id TEXT PRIMARY KEY,
-                account_name TEXT,
-                account_type TEXT,
-                country TEXT,
-                risk_level TEXT
-            )
-        ''')
-        
-        conn.commit()
+        applied = apply_migrations(conn)
         conn.close()
+        
+        if applied:
+            print(f"✅ Applied schema migrations: {applied}")
     
     def generate_scenario_data(self, scenario_name, num_transactions=100):
         """Generate synthetic data for specific scenarios"""
@@ -166,9 +145,19 @@ class TriNetraDataGenerator:
         normal_transactions = self.generate_scenario_data('normal', 300)
         all_transactions.extend(normal_transactions)
         
-        # Insert transactions
-        df = pd.DataFrame(all_transactions)
-        df.to_sql('transactions', conn, if_exists='replace', index=False)
+        # Replace existing rows but keep the migrated schema and its indexes
+        df = pd.DataFrame(all_transactions, columns=TRANSACTION_COLUMNS)
+        column_list = ', '.join(TRANSACTION_COLUMNS)
+        placeholders = ', '.join('?' for _ in TRANSACTION_COLUMNS)
+        with conn:
+            conn.execute("DELETE FROM transactions")
+            conn.executemany(
+                f"INSERT INTO transactions ({column_list}) VALUES ({placeholders})",
+                df.itertuples(index=False, name=None)
+            )
+            # Location/method/bank details are computed once here, not per request
+            backfill_enrichment(conn)
+            bump_data_version(conn)
         
         print(f"✅ Generated {len(all_transactions)} transactions")
         print(f"✅ Database populated at: {self.db_path}")
@@ -0,0 +1,247 @@
+import numpy as np
+
+from utils.time_utils import from_epoch
+
+DEFAULT_MAX_LENGTH = 4
+DEFAULT_MAX_WINDOW = 7 * 86400
+DEFAULT_MAX_DECAY = 0.2
+DEFAULT_MAX_GROWTH = 0.02
+MAX_REPORTED_CYCLES = 20
+MAX_PRUNE_ROUNDS = 8
+
+
+def _empty_edges():
+    return {
+        'src': np.zeros(0, dtype=np.int64),
+        'dst': np.zeros(0, dtype=np.int64),
+        'epoch': np.zeros(0, dtype=np.int64),
+        'amount': np.zeros(0),
+        'transaction_id': np.zeros(0, dtype=object)
+    }
+
+
+class CycleDetector:
+    """Time-respecting circular flows (A->B->C->A) in a transaction graph
+
+    Edges are collected chunk by chunk from TransactionBatch objects and
+    merged like SARAggregate. A cycle is a simple path of 2..max_length
+    transfers that returns to its first account, where every hop happens
+    no earlier than the one before it, the whole loop fits in max_window
+    seconds, and each hop's amount stays within max_decay below / max_growth
+    above the previous hop's (fees and skimming, not fresh money).
+
+    find() first drops accounts that cannot sit on any cycle (no incoming or
+    no outgoing edge left), then indexes the rest by (account, time rank) and
+    extends every partial path one hop per round with vectorized range
+    lookups, so the work follows the number of time-valid paths rather than
+    account pairs. Each occurrence is found once, from its earliest hop.
+    Edges beyond max_edges and paths beyond max_paths per round are dropped
+    and the result is marked truncated.
+    """
+
+    def __init__(self, max_length=DEFAULT_MAX_LENGTH, max_window=DEFAULT_MAX_WINDOW,
+                 max_decay=DEFAULT_MAX_DECAY, max_growth=DEFAULT_MAX_GROWTH,
+                 max_edges=5000000, max_paths=2000000):
+        self.max_length = max_length
+        self.max_window = max_window
+        self.max_decay = max_decay
+        self.max_growth = max_growth
+        self.max_edges = max_edges
+        self.max_paths = max_paths
+        self.edge_count = 0
+        self.truncated = False
+        self._accounts = {}
+        self._chunks = []
+        self._result = None
+
+    def _node_ids(self, accounts):
+        """Global node id per account name (-1 for missing accounts)"""
+        vocabulary = self._accounts
+        return np.fromiter(
+            (vocabulary.setdefault(a, len(vocabulary)) if a == a and a is not None and a != '' else -1
+             for a in accounts),
+            dtype=np.int64, count=len(accounts)
+        )
+
+    def _append(self, edges):
+        room = self.max_edges - self.edge_count
+        if len(edges['src']) > room:
+            self.truncated = True
+            edges = {name: values[:max(room, 0)] for name, values in edges.items()}
+        if len(edges['src']):
+            self._chunks.append(edges)
+            self.edge_count += len(edges['src'])
+        self._result = None
+
+    def add_batch(self, batch):
+        """Collect the dated, non-self transfers of one TransactionBatch"""
+        if not batch.count:
+            return self
+        ids = self._node_ids(batch.accounts)
+        src = ids[batch.from_codes]
+        dst = ids[batch.to_codes]
+        keep = ~np.isnan(batch.row_epochs) & (src >= 0) & (dst >= 0) & (src != dst)
+        self._append({
+            'src': src[keep],
+            'dst': dst[keep],
+            'epoch': batch.row_epochs[keep].astype(np.int64),
+            'amount': batch.amounts[keep].astype(float),
+            'transaction_id': np.asarray(batch.transaction_ids, dtype=object)[keep]
+        })
+        return self
+
+    def merge(self, other):
+        """Add another detector's edges (remapped onto this one's accounts)"""
+        self.truncated = self.truncated or other.truncated
+        if not other.edge_count:
+            return self
+        mapping = self._node_ids(list(other._accounts))
+        for edges in other._chunks:
+            self._append(dict(edges, src=mapping[edges['src']], dst=mapping[edges['dst']]))
+        return self
+
+    def _edges(self):
+        if not self._chunks:
+            return _empty_edges()
+        if len(self._chunks) > 1:
+            self._chunks = [{name: np.concatenate([c[name] for c in self._chunks]) for name in self._chunks[0]}]
+        return self._chunks[0]
+
+    def _prune(self, edges):
+        """Keep edges whose source has an in-edge and whose target has an out-edge"""
+        src, dst = edges['src'], edges['dst']
+        keep = np.arange(len(src))
+        nodes = len(self._accounts)
+        for _ in range(MAX_PRUNE_ROUNDS):
+            has_out = np.bincount(src, minlength=nodes) > 0
+            has_in = np.bincount(dst, minlength=nodes) > 0
+            alive = has_in[src] & has_out[dst]
+            if alive.all():
+                break
+            keep, src, dst = keep[alive], src[alive], dst[alive]
+        return {name: values[keep] for name, values in edges.items()}
+
+    def find(self):
+        """Detected cycle occurrences as a list of edge-index arrays (one row per occurrence), cached"""
+        if self._result is not None:
+            return self._result
+
+        edges = self._prune(self._edges())
+        src, dst, epoch, amount = edges['src'], edges['dst'], edges['epoch'], edges['amount']
+        n = len(src)
+        found = []
+        if n:
+            # Global time rank (ties keep arrival order) and the adjacency
+            # index: edges sorted by (source, rank) under one int64 key
+            by_time = np.argsort(epoch, kind='stable')
+            rank = np.empty(n, dtype=np.int64)
+            rank[by_time] = np.arange(n)
+            epoch_by_rank = epoch[by_time]
+            adjacency = np.lexsort((rank, src))
+            key = src[adjacency] * n + rank[adjacency]
+
+            for block in range(0, n, self.max_paths):
+                found.extend(self._walk(by_time[block:block + self.max_paths], edges, rank,
+                                        epoch_by_rank, adjacency, key))
+
+        self._result = (edges, found)
+        return self._result
+
+    def _walk(self, start_edges, edges, rank, epoch_by_rank, adjacency, key):
+        """Extend paths from a block of start edges one hop per round, collecting closed loops"""
+        src, dst, epoch, amount = edges['src'], edges['dst'], edges['epoch'], edges['amount']
+        n = len(src)
+        start = src[start_edges]
+        current = dst[start_edges]
+        last = start_edges
+        deadline = epoch[start_edges] + self.max_window
+        nodes = np.column_stack([start, current])
+        path = start_edges[:, None]
+        closed = []
+
+        while len(path) and path.shape[1] < self.max_length:
+            # Candidate next hops: out-edges of the current account ranked after
+            # the last hop and no later than the window deadline
+            max_rank = np.searchsorted(epoch_by_rank, deadline, side='right') - 1
+            lo = np.searchsorted(key, current * n + rank[last], side='right')
+            hi = np.searchsorted(key, current * n + max_rank, side='right')
+            counts = np.maximum(hi - lo, 0)
+            total = int(counts.sum())
+            if not total:
+                break
+            if total > self.max_paths:
+                self.truncated = True
+                cut = int(np.searchsorted(np.cumsum(counts), self.max_paths, side='right'))
+                counts[cut:] = 0
+                total = int(counts.sum())
+
+            parent = np.repeat(np.arange(len(path)), counts)
+            offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            candidate = adjacency[np.repeat(lo, counts) + offsets]
+
+            previous = amount[last][parent]
+            step = amount[candidate]
+            ok = (step >= previous * (1 - self.max_decay)) & (step <= previous * (1 + self.max_growth))
+            target = dst[candidate]
+            closes = ok & (target == start[parent])
+            if closes.any():
+                closed.append(np.column_stack([path[parent[closes]], candidate[closes]]))
+
+            extend = ok & ~closes & ~(nodes[parent] == target[:, None]).any(axis=1)
+            parent, candidate = parent[extend], candidate[extend]
+            start, deadline = start[parent], deadline[parent]
+            current, last = dst[candidate], candidate
+            nodes = np.column_stack([nodes[parent], current])
+            path = np.column_stack([path[parent], candidate])
+
+        return closed
+
+    def cycles(self, limit=MAX_REPORTED_CYCLES):
+        """Distinct cycles (by account loop), busiest first, with their members and hops"""
+        edges, found = self.find()
+        if not found:
+            return []
+        accounts = np.array(list(self._accounts), dtype=object)
+
+        groups = []
+        for occurrences in found:
+            members = edges['src'][occurrences]
+            length = members.shape[1]
+            # Same loop entered at a different account is the same cycle
+            shift = np.argmin(members, axis=1)
+            rotation = (shift[:, None] + np.arange(length)) % length
+            canonical = np.take_along_axis(members, rotation, axis=1)
+            unique, inverse = np.unique(canonical, axis=0, return_inverse=True)
+            inverse = inverse.ravel()
+            started = edges['epoch'][occurrences[:, 0]]
+            ended = edges['epoch'][occurrences[:, -1]]
+            counts = np.bincount(inverse, minlength=len(unique))
+            volume = np.bincount(inverse, weights=edges['amount'][occurrences[:, 0]], minlength=len(unique))
+            # Rows grouped by cycle, earliest occurrence first within each group
+            order = np.lexsort((started, inverse))
+            bounds = np.concatenate([[0], np.cumsum(counts)[:-1]])
+            first = order[bounds]
+            last_seen = np.maximum.reduceat(ended[order], bounds)
+            groups.extend(zip(counts.tolist(), volume.tolist(), occurrences[first],
+                              started[first].tolist(), last_seen.tolist()))
+
+        groups.sort(key=lambda g: (-g[0], -g[1]))
+        report = []
+        for occurrences, volume, hops, first_seen, last_seen in groups[:limit]:
+            hop_amounts = edges['amount'][hops]
+            report.append({
+                'members': accounts[edges['src'][hops]].tolist(),
+                'length': len(hops),
+                'occurrences': occurrences,
+                'total_amount': round(volume, 2),
+                'retained_ratio': round(float(hop_amounts[-1] / hop_amounts[0]), 4) if hop_amounts[0] else None,
+                'transaction_ids': edges['transaction_id'][hops].tolist(),
+                'hop_amounts': [round(float(a), 2) for a in hop_amounts],
+                'first_seen': from_epoch(first_seen).isoformat(),
+                'last_seen': from_epoch(last_seen).isoformat()
+            })
+        return report
+
+    def cycle_count(self):
+        """Number of cycle occurrences found"""
+        return sum(len(occurrences) for occurrences in self.find()[1])
@@ -0,0 +1,159 @@
+import numpy as np
+import pandas as pd
+
+# Location key parts, coarsest first; corridors can be read at any prefix
+FLOW_LEVELS = ('country', 'state', 'city')
+ENDPOINT_COLUMNS = [f'{side}_{part}' for side in ('from', 'to') for part in FLOW_LEVELS]
+DEFAULT_TOP_CORRIDORS = 10
+
+# Origin and destination ids share one int64 pair code
+_PAIR_SHIFT = 32
+_PAIR_MASK = (1 << _PAIR_SHIFT) - 1
+
+
+class FlowMatrix:
+    """Sparse origin x destination transaction flows between (country, state, city) locations
+
+    Only pairs that carry transactions are stored, as sorted int64 pair codes
+    with count/amount/suspicion sums alongside, at city granularity; state
+    and country corridors are rolled up from them when read. add() folds a
+    new batch of transactions (or of already summed pairs) into the existing
+    sums in one grouped pass, and merge() combines matrices built from
+    separate chunks. The same pair sums are persisted per scenario in the
+    flow_pairs table, which triggers keep current as transactions are
+    written, so readers load the stored pairs (see data.flows) instead of
+    rescanning transactions.
+
+    risk_levels maps a country to its risk level (1 if absent); a corridor's
+    risk score is its suspicion sum times the higher of its two countries'
+    levels.
+    """
+
+    def __init__(self, risk_levels=None):
+        self.risk_levels = risk_levels or {}
+        self.transaction_count = 0
+        self._locations = {}
+        self._pairs = np.zeros(0, dtype=np.int64)
+        self._count = np.zeros(0, dtype=np.int64)
+        self._amount = np.zeros(0)
+        self._suspicion = np.zeros(0)
+
+    def __len__(self):
+        return len(self._pairs)
+
+    def _location_ids(self, keys):
+        """Global id per (country, state, city) key"""
+        vocabulary = self._locations
+        keys = list(keys)
+        return np.fromiter((vocabulary.setdefault(key, len(vocabulary)) for key in keys),
+                           dtype=np.int64, count=len(keys))
+
+    def _side_ids(self, endpoints, side):
+        """Location id per row for the 'from' or 'to' columns, looking up each distinct location once"""
+        parts = [endpoints[f'{side}_{part}'].fillna('').to_numpy(dtype=object) for part in FLOW_LEVELS]
+        codes = np.zeros(len(endpoints), dtype=np.int64)
+        for values in parts:
+            part_codes, part_uniques = pd.factorize(values)
+            codes = codes * len(part_uniques) + part_codes
+        _, first, inverse = np.unique(codes, return_index=True, return_inverse=True)
+        ids = self._location_ids(zip(*(values[first] for values in parts)))
+        return ids[inverse.ravel()]
+
+    def _accumulate(self, pairs, count, amount, suspicion):
+        pairs = np.concatenate([self._pairs, pairs])
+        self._pairs, inverse = np.unique(pairs, return_inverse=True)
+        inverse = inverse.ravel()
+        size = len(self._pairs)
+        self._count = np.bincount(inverse, weights=np.concatenate([self._count, count]),
+                                  minlength=size).astype(np.int64)
+        self._amount = np.bincount(inverse, weights=np.concatenate([self._amount, amount]), minlength=size)
+        self._suspicion = np.bincount(inverse, weights=np.concatenate([self._suspicion, suspicion]),
+                                      minlength=size)
+
+    def add(self, endpoints, amounts, suspicion=None, counts=None):
+        """Add transactions: endpoints has ENDPOINT_COLUMNS, one row per transaction
+
+        Rows that already sum several transactions pass how many in counts,
+        with their amount and suspicion totals.
+        """
+        if not len(endpoints):
+            return self
+        amounts = np.nan_to_num(np.asarray(amounts, dtype=float))
+        suspicion = (np.zeros(len(amounts)) if suspicion is None
+                     else np.nan_to_num(np.asarray(suspicion, dtype=float)))
+        counts = np.ones(len(amounts), dtype=np.int64) if counts is None else np.asarray(counts, dtype=np.int64)
+        pairs = (self._side_ids(endpoints, 'from') << _PAIR_SHIFT) | self._side_ids(endpoints, 'to')
+
+        unique, inverse = np.unique(pairs, return_inverse=True)
+        inverse = inverse.ravel()
+        self._accumulate(
+            unique,
+            np.bincount(inverse, weights=counts, minlength=len(unique)),
+            np.bincount(inverse, weights=amounts, minlength=len(unique)),
+            np.bincount(inverse, weights=suspicion, minlength=len(unique))
+        )
+        self.transaction_count += int(counts.sum())
+        return self
+
+    def merge(self, other):
+        """Add another matrix's flows (remapped onto this one's locations)"""
+        if not len(other):
+            return self
+        mapping = self._location_ids(other._locations)
+        pairs = (mapping[other._pairs >> _PAIR_SHIFT] << _PAIR_SHIFT) | mapping[other._pairs & _PAIR_MASK]
+        self._accumulate(pairs, other._count, other._amount, other._suspicion)
+        self.transaction_count += other.transaction_count
+        return self
+
+    def corridors(self, level='city', by='volume', limit=DEFAULT_TOP_CORRIDORS, cross_border=False):
+        """Top corridors at a key level, ranked by total amount ('volume') or risk score ('risk')
+
+        cross_border keeps only corridors whose endpoints are in different countries.
+        """
+        if level not in FLOW_LEVELS:
+            raise ValueError(f"level must be one of {', '.join(FLOW_LEVELS)}")
+        if by not in ('volume', 'risk'):
+            raise ValueError("by must be 'volume' or 'risk'")
+        if not len(self):
+            return []
+
+        # Roll locations up to the requested key prefix
+        depth = FLOW_LEVELS.index(level) + 1
+        rolled = {}
+        level_of = np.fromiter((rolled.setdefault(key[:depth], len(rolled)) for key in self._locations),
+                               dtype=np.int64, count=len(self._locations))
+        keys = list(rolled)
+        risk = np.array([self.risk_levels.get(key[0], 1) for key in keys], dtype=np.int64)
+
+        origin = level_of[self._pairs >> _PAIR_SHIFT]
+        destination = level_of[self._pairs & _PAIR_MASK]
+        keep = np.ones(len(origin), dtype=bool)
+        if cross_border:
+            countries = np.array([key[0] for key in keys], dtype=object)
+            keep = countries[origin] != countries[destination]
+        if not keep.any():
+            return []
+
+        unique, inverse = np.unique(origin[keep] * len(keys) + destination[keep], return_inverse=True)
+        inverse = inverse.ravel()
+        count = np.bincount(inverse, weights=self._count[keep], minlength=len(unique))
+        amount = np.bincount(inverse, weights=self._amount[keep], minlength=len(unique))
+        suspicion = np.bincount(inverse, weights=self._suspicion[keep], minlength=len(unique))
+        origin, destination = np.divmod(unique, len(keys))
+        risk_level = np.maximum(risk[origin], risk[destination])
+        risk_score = suspicion * risk_level
+
+        ranking = amount if by == 'volume' else risk_score
+        report = []
+        for i in np.argsort(-ranking, kind='stable')[:limit]:
+            corridor = {f'from_{part}': value for part, value in zip(FLOW_LEVELS, keys[origin[i]])}
+            corridor.update({f'to_{part}': value for part, value in zip(FLOW_LEVELS, keys[destination[i]])})
+            corridor.update({
+                'transaction_count': int(count[i]),
+                'total_amount': float(amount[i]),
+                'avg_suspicion': float(suspicion[i] / count[i]),
+                'risk_level': int(risk_level[i]),
+                'risk_score': float(risk_score[i])
+            })
+            report.append(corridor)
+        return report
@@ -0,0 +1,460 @@
+import math
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+PATTERN_TYPES = [
+    'smurfing_enhanced',
+    'layering_complex',
+    'integration_hidden',
+    'shell_company_web_v2'
+]
+
+# Generated pattern shape: transactions per pattern, complexity and amounts
+MIN_PATTERN_TRANSACTIONS = 10
+MAX_PATTERN_TRANSACTIONS = 30
+COMPLEXITY_RANGE = (0.6, 0.9)
+AMOUNT_RANGE = (1000.0, 10000.0)
+
+# Relative spread of a pattern's amounts around its base amount at the
+# lowest and highest complexity
+AMOUNT_SPREAD = (0.05, 0.9)
+
+# Source and target accounts per transaction of each pattern type at the
+# lowest and highest complexity; more complex patterns spread over more
+# accounts, so they show less fan-in/fan-out and fewer repeated edges
+PATTERN_LAYOUTS = np.array([
+    [[1.0, 0.0], [1.0, 0.5]],  # smurfing: many depositors into a few accounts
+    [[0.1, 0.2], [1.0, 1.0]],  # layering: a small mesh stretched into a chain
+    [[0.0, 1.0], [0.5, 1.0]],  # integration: a few sources paying out widely
+    [[0.3, 0.2], [1.0, 0.9]]   # shell company web: a mesh thinning out
+])
+
+DETECTION_THRESHOLD = 0.5
+
+# Feature detector: logistic score over normalised fan-in, fan-out, amount
+# uniformity and edge repetition of a pattern's transactions
+DETECTOR_WEIGHTS = {'fan_in': 2.0, 'fan_out': 1.5, 'amount_uniformity': 1.5, 'repetition': 1.0}
+DETECTOR_BIAS = -2.5
+
+# Monte Carlo rounds per task; part of the seed-to-result mapping, so changing
+# it changes the results a seed reproduces
+MONTE_CARLO_BLOCK_ROUNDS = 100000
+CONFIDENCE_Z = 1.96
+
+
+class PatternBatch:
+    """Many generated patterns as flat arrays
+
+    Pattern i owns transactions offsets[i]:offsets[i + 1]; transaction j of
+    a pattern goes from source account j % sources to target j % targets,
+    with the account counts from pattern_accounts(), so only amounts are
+    stored per transaction.
+    """
+
+    def __init__(self, type_codes, complexity, offsets, amounts):
+        self.type_codes = type_codes
+        self.complexity = complexity
+        self.offsets = offsets
+        self.amounts = amounts
+
+    def __len__(self):
+        return len(self.type_codes)
+
+    @property
+    def transaction_counts(self):
+        return np.diff(self.offsets)
+
+    def slice(self, start, stop):
+        """Patterns start:stop as a new batch"""
+        offsets = self.offsets[start:stop + 1] if stop is not None else self.offsets[start:]
+        return PatternBatch(self.type_codes[start:stop], self.complexity[start:stop], offsets - offsets[0],
+                            self.amounts[offsets[0]:offsets[-1]])
+
+    @classmethod
+    def concatenate(cls, batches):
+        """One batch holding every pattern of batches, in order"""
+        if not batches:
+            return cls(np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(1, dtype=np.int64), np.zeros(0))
+        counts = np.concatenate([batch.transaction_counts for batch in batches])
+        return cls(np.concatenate([batch.type_codes for batch in batches]),
+                   np.concatenate([batch.complexity for batch in batches]),
+                   np.concatenate([[0], np.cumsum(counts)]),
+                   np.concatenate([batch.amounts for batch in batches]))
+
+    def accounts(self):
+        """pattern_accounts() of every pattern"""
+        return pattern_accounts(self.type_codes, self.complexity, self.transaction_counts)
+
+    def features(self):
+        """pattern_features() of every pattern, from the implied source/target accounts"""
+        sources, targets = self.accounts()
+        pattern_index = np.repeat(np.arange(len(self)), self.transaction_counts)
+        position = np.arange(len(self.amounts)) - self.offsets[:-1][pattern_index]
+        pattern_sources = sources[pattern_index]
+        return pattern_features(pattern_index, position % pattern_sources,
+                                pattern_sources + position % targets[pattern_index], self.amounts, len(self))
+
+    def amount_totals(self):
+        """Total amount per pattern"""
+        return np.add.reduceat(self.amounts, self.offsets[:-1]) if len(self.amounts) else np.zeros(len(self))
+
+    def pattern(self, i, pattern_id, generated_at=None):
+        """One pattern in the dict shape of SimpleHydraGAN.generate_adversarial_pattern"""
+        generated_at = generated_at or datetime.now().isoformat()
+        start, end = self.offsets[i], self.offsets[i + 1]
+        (sources,), (targets,) = pattern_accounts(self.type_codes[i:i + 1], self.complexity[i:i + 1], [end - start])
+        return {
+            'pattern_id': pattern_id,
+            'pattern_type': PATTERN_TYPES[self.type_codes[i]],
+            'complexity_score': float(self.complexity[i]),
+            'transactions': [
+                {
+                    'from': f'GEN_ACC_{j % sources:02d}',
+                    'to': f'TARGET_{j % targets:02d}',
+                    'amount': float(amount),
+                    'timestamp': generated_at,
+                    'generated': True
+                }
+                for j, amount in enumerate(self.amounts[start:end])
+            ],
+            'generated_at': generated_at
+        }
+
+
+def complexity_position(complexity):
+    """Where each complexity lies in COMPLEXITY_RANGE, 0 (lowest) to 1 (highest)"""
+    low, high = COMPLEXITY_RANGE
+    return np.clip((np.asarray(complexity, dtype=float) - low) / (high - low), 0.0, 1.0)
+
+
+def pattern_accounts(type_codes, complexity, transaction_counts):
+    """Distinct source and target accounts per pattern, from its type, complexity and size
+
+    Interpolates PATTERN_LAYOUTS by complexity; a deterministic function of
+    the stored columns, so saved patterns replay with the same accounts.
+    """
+    position = complexity_position(complexity)[:, None]
+    low, high = PATTERN_LAYOUTS[:, 0][type_codes], PATTERN_LAYOUTS[:, 1][type_codes]
+    counts = np.asarray(transaction_counts, dtype=np.int64)[:, None]
+    accounts = np.clip(np.rint((low + (high - low) * position) * counts), 1, np.maximum(counts, 1))
+    return accounts[:, 0].astype(np.int64), accounts[:, 1].astype(np.int64)
+
+
+def generate_patterns(count, rng):
+    """Draw count adversarial patterns at once
+
+    Each pattern's amounts scatter around its own base amount, more widely
+    the more complex the pattern.
+    """
+    type_codes = rng.integers(0, len(PATTERN_TYPES), count)
+    complexity = rng.uniform(*COMPLEXITY_RANGE, count)
+    counts = rng.integers(MIN_PATTERN_TRANSACTIONS, MAX_PATTERN_TRANSACTIONS + 1, count)
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    base = rng.uniform(*AMOUNT_RANGE, count)
+    spread = AMOUNT_SPREAD[0] + (AMOUNT_SPREAD[1] - AMOUNT_SPREAD[0]) * complexity_position(complexity)
+    amounts = np.repeat(base, counts) * (1 + np.repeat(spread, counts) * rng.uniform(-1, 1, int(offsets[-1])))
+    return PatternBatch(type_codes, complexity, offsets, amounts)
+
+
+def pattern_features(pattern_index, senders, receivers, amounts, count):
+    """Graph and amount features per pattern from flat transaction arrays
+
+    pattern_index gives each transaction's pattern (0..count - 1); senders
+    and receivers are non-negative account codes. Fan-in is the most
+    distinct senders paying one receiver, fan-out the most distinct
+    receivers paid by one sender, amount_cv the amounts' coefficient of
+    variation (NaN below two transactions) and repetition the share of
+    transactions that reuse a sender -> receiver edge already seen.
+    """
+    pattern_index = np.asarray(pattern_index, dtype=np.int64)
+    senders = np.asarray(senders, dtype=np.int64)
+    receivers = np.asarray(receivers, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=float)
+    accounts = int(max(senders.max(), receivers.max())) + 1 if len(senders) else 1
+
+    # Distinct (pattern, sender) groups, then distinct edges within them
+    sender_codes, sender_groups = pd.factorize(pattern_index * accounts + senders)
+    edges = pd.unique(sender_codes * accounts + receivers)
+    edge_group = edges // accounts
+    edge_pattern = sender_groups[edge_group] // accounts
+    receiver_codes, receiver_groups = pd.factorize(edge_pattern * accounts + edges % accounts)
+
+    fan_out = np.zeros(count, dtype=np.int64)
+    np.maximum.at(fan_out, sender_groups // accounts, np.bincount(edge_group, minlength=len(sender_groups)))
+    fan_in = np.zeros(count, dtype=np.int64)
+    np.maximum.at(fan_in, receiver_groups // accounts, np.bincount(receiver_codes, minlength=len(receiver_groups)))
+
+    transactions = np.bincount(pattern_index, minlength=count)
+    total = np.bincount(pattern_index, weights=amounts, minlength=count)
+    squares = np.bincount(pattern_index, weights=amounts * amounts, minlength=count)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = total / transactions
+        variance = np.maximum(squares / transactions - mean * mean, 0)
+        amount_cv = np.where((transactions > 1) & (mean > 0), np.sqrt(variance) / mean, np.nan)
+        repetition = np.where(transactions > 0, 1 - np.bincount(edge_pattern, minlength=count) / transactions, 0.0)
+    return {
+        'transaction_count': transactions,
+        'senders': np.bincount(sender_groups // accounts, minlength=count),
+        'receivers': np.bincount(receiver_groups // accounts, minlength=count),
+        'fan_in': fan_in,
+        'fan_out': fan_out,
+        'total_amount': total,
+        'amount_cv': amount_cv,
+        'repetition': repetition
+    }
+
+
+def score_features(features):
+    """Detection confidence and verdict per pattern from pattern_features()"""
+    normalised = {
+        'fan_in': 1 - 1 / np.maximum(features['fan_in'], 1),
+        'fan_out': 1 - 1 / np.maximum(features['fan_out'], 1),
+        'amount_uniformity': np.nan_to_num(1 - np.minimum(features['amount_cv'], 1), nan=0.0),
+        'repetition': features['repetition']
+    }
+    logit = DETECTOR_BIAS + sum(DETECTOR_WEIGHTS[name] * values for name, values in normalised.items())
+    confidence = 1 / (1 + np.exp(-logit))
+    return confidence, confidence > DETECTION_THRESHOLD
+
+
+def detect_patterns(patterns):
+    """Score pattern dicts (generate_adversarial_pattern shape) against their own transactions
+
+    All patterns' transactions are flattened into one set of arrays and
+    featurised and scored in a single vectorized pass. Raises ValueError
+    or TypeError for malformed transactions.
+    """
+    transactions = [pattern.get('transactions') or [] for pattern in patterns]
+    counts = [len(t) for t in transactions]
+    flat = [t for pattern_transactions in transactions for t in pattern_transactions]
+    endpoints = np.array([t.get('from') for t in flat] + [t.get('to') for t in flat], dtype=object)
+    codes, _ = pd.factorize(endpoints, use_na_sentinel=False)
+    amounts = np.array([t.get('amount', 0) for t in flat], dtype=float)
+
+    features = pattern_features(np.repeat(np.arange(len(patterns)), counts), codes[:len(flat)], codes[len(flat):],
+                                amounts, len(patterns))
+    confidence, detected = score_features(features)
+    features['amount_cv'] = np.where(np.isnan(features['amount_cv']), None, features['amount_cv'].round(4))
+    features['repetition'] = features['repetition'].round(4)
+    features['total_amount'] = features['total_amount'].round(2)
+    names = list(features)
+    rows = zip(*(values.tolist() for values in features.values()))
+    return [
+        {
+            'pattern_id': pattern.get('pattern_id'),
+            'detected': flag,
+            'confidence': score,
+            'features': dict(zip(names, row))
+        }
+        for pattern, flag, score, row in zip(patterns, detected.tolist(), confidence.tolist(), rows)
+    ]
+
+
+class SimulationResult:
+    """Per-round arrays of one batch simulation"""
+
+    def __init__(self, patterns, confidence, detected):
+        self.patterns = patterns
+        self.confidence = confidence
+        self.detected = detected
+
+    @property
+    def rounds(self):
+        return len(self.patterns)
+
+    def round_summaries(self, start=0, stop=None):
+        """Per-round result dicts (1-based round numbers), built column-wise"""
+        window = slice(start, stop)
+        types = np.array(PATTERN_TYPES, dtype=object)[self.patterns.type_codes[window]]
+        numbers = np.arange(self.rounds)[window] + 1
+        return [
+            {
+                'round': number,
+                'pattern': pattern,
+                'complexity': complexity,
+                'detected': detected,
+                'confidence': confidence,
+                'transaction_count': count,
+                'total_amount': total
+            }
+            for number, pattern, complexity, detected, confidence, count, total in zip(
+                numbers.tolist(), types.tolist(), self.patterns.complexity[window].tolist(),
+                self.detected[window].tolist(), self.confidence[window].tolist(),
+                self.patterns.transaction_counts[window].tolist(),
+                self.patterns.amount_totals()[window].tolist()
+            )
+        ]
+
+    def by_pattern(self):
+        """Rounds, detections and mean confidence per pattern type"""
+        codes = self.patterns.type_codes
+        rounds = np.bincount(codes, minlength=len(PATTERN_TYPES))
+        detected = np.bincount(codes, weights=self.detected, minlength=len(PATTERN_TYPES))
+        confidence = np.bincount(codes, weights=self.confidence, minlength=len(PATTERN_TYPES))
+        return {
+            name: {
+                'rounds': int(rounds[i]),
+                'detected': int(detected[i]),
+                'detection_rate': float(detected[i] / rounds[i]) if rounds[i] else 0.0,
+                'avg_confidence': float(confidence[i] / rounds[i]) if rounds[i] else 0.0
+            }
+            for i, name in enumerate(PATTERN_TYPES)
+        }
+
+    def summary(self):
+        """Whole-run totals plus the per-pattern breakdown"""
+        total_detected = int(np.count_nonzero(self.detected))
+        return {
+            'rounds': self.rounds,
+            'total_detected': total_detected,
+            'detection_rate': total_detected / self.rounds if self.rounds else 0.0,
+            'avg_confidence': float(self.confidence.mean()) if self.rounds else 0.0,
+            'total_transactions': int(self.patterns.offsets[-1]),
+            'by_pattern': self.by_pattern()
+        }
+
+
+def run_simulation(rounds, seed=None):
+    """Generate every round's pattern and score its features in one vectorized pass"""
+    patterns = generate_patterns(rounds, np.random.default_rng(seed))
+    confidence, detected = score_features(patterns.features())
+    return SimulationResult(patterns, confidence, detected)
+
+
+def wilson_interval(successes, trials, z=CONFIDENCE_Z):
+    """Wilson score interval for a binomial proportion"""
+    if not trials:
+        return (0.0, 0.0)
+    p = successes / trials
+    denominator = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denominator
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denominator
+    return (max(centre - margin, 0.0), min(centre + margin, 1.0))
+
+
+class SimulationStats:
+    """Mergeable detection statistics over one or more blocks of rounds
+
+    Confidence mean and variance merge with Chan et al.'s pairwise update,
+    like SARAggregate's amount statistics; merging blocks in the same order
+    gives bit-identical totals however the blocks were scheduled.
+    """
+
+    def __init__(self):
+        self.rounds = 0
+        self.detected = 0
+        self.transactions = 0
+        self.confidence_mean = 0.0
+        self.confidence_m2 = 0.0
+        self.pattern_rounds = np.zeros(len(PATTERN_TYPES), dtype=np.int64)
+        self.pattern_detected = np.zeros(len(PATTERN_TYPES), dtype=np.int64)
+        self.pattern_confidence = np.zeros(len(PATTERN_TYPES))
+
+    @classmethod
+    def from_result(cls, result):
+        stats = cls()
+        if not result.rounds:
+            return stats
+        codes = result.patterns.type_codes
+        stats.rounds = result.rounds
+        stats.detected = int(np.count_nonzero(result.detected))
+        stats.transactions = int(result.patterns.offsets[-1])
+        stats.confidence_mean = float(result.confidence.mean())
+        stats.confidence_m2 = float(np.sum((result.confidence - stats.confidence_mean) ** 2))
+        stats.pattern_rounds = np.bincount(codes, minlength=len(PATTERN_TYPES))
+        stats.pattern_detected = np.bincount(codes, weights=result.detected,
+                                             minlength=len(PATTERN_TYPES)).astype(np.int64)
+        stats.pattern_confidence = np.bincount(codes, weights=result.confidence, minlength=len(PATTERN_TYPES))
+        return stats
+
+    def merge(self, other):
+        """Fold in another block's statistics"""
+        if not other.rounds:
+            return self
+        n = self.rounds + other.rounds
+        delta = other.confidence_mean - self.confidence_mean
+        self.confidence_m2 += other.confidence_m2 + delta * delta * self.rounds * other.rounds / n
+        self.confidence_mean += delta * other.rounds / n
+        self.rounds = n
+        self.detected += other.detected
+        self.transactions += other.transactions
+        self.pattern_rounds = self.pattern_rounds + other.pattern_rounds
+        self.pattern_detected = self.pattern_detected + other.pattern_detected
+        self.pattern_confidence = self.pattern_confidence + other.pattern_confidence
+        return self
+
+    def summary(self, z=CONFIDENCE_Z):
+        """Detection rate and mean confidence with confidence intervals, overall and per pattern"""
+        rounds = self.rounds
+        std_error = math.sqrt(self.confidence_m2 / (rounds - 1) / rounds) if rounds > 1 else 0.0
+        by_pattern = {}
+        for i, name in enumerate(PATTERN_TYPES):
+            n, detected = int(self.pattern_rounds[i]), int(self.pattern_detected[i])
+            by_pattern[name] = {
+                'rounds': n,
+                'detected': detected,
+                'detection_rate': detected / n if n else 0.0,
+                'detection_rate_ci': list(wilson_interval(detected, n, z)),
+                'avg_confidence': float(self.pattern_confidence[i] / n) if n else 0.0
+            }
+        return {
+            'rounds': rounds,
+            'total_detected': self.detected,
+            'detection_rate': self.detected / rounds if rounds else 0.0,
+            'detection_rate_ci': list(wilson_interval(self.detected, rounds, z)),
+            'avg_confidence': self.confidence_mean,
+            'avg_confidence_ci': [self.confidence_mean - z * std_error, self.confidence_mean + z * std_error],
+            'confidence_std': math.sqrt(self.confidence_m2 / (rounds - 1)) if rounds > 1 else 0.0,
+            'total_transactions': self.transactions,
+            'by_pattern': by_pattern
+        }
+
+
+def simulate_block(seed_sequence, rounds):
+    """Statistics of one Monte Carlo block (runs in a worker process)"""
+    return SimulationStats.from_result(run_simulation(rounds, seed_sequence))
+
+
+def iter_simulation(rounds, seed=None, chunk_rounds=MONTE_CARLO_BLOCK_ROUNDS):
+    """Simulate chunk by chunk, yielding (first round index, chunk result, running stats)
+
+    Chunk i draws from the i-th SeedSequence child of the seed, as in
+    run_monte_carlo, so with the same chunk size the final statistics match
+    a Monte Carlo run of that seed. Only one chunk is held at a time, and
+    nothing is computed until the consumer asks for the next chunk.
+    """
+    root = np.random.SeedSequence(seed)
+    stats = SimulationStats()
+    for start in range(0, rounds, chunk_rounds):
+        # Spawning one child at a time yields the same children as spawn(n)
+        child, = root.spawn(1)
+        result = run_simulation(min(chunk_rounds, rounds - start), child)
+        stats.merge(SimulationStats.from_result(result))
+        yield start, result, stats
+
+
+def run_monte_carlo(rounds, seed=None, queue=None, block_rounds=MONTE_CARLO_BLOCK_ROUNDS):
+    """Seeded simulation split into fixed-size blocks, optionally fanned out over a JobQueue
+
+    Block i always draws from the i-th SeedSequence child of the seed and
+    blocks are merged in index order, so a seed gives identical statistics
+    with any number of workers (or none). Returns (stats, seed entropy).
+    """
+    root = np.random.SeedSequence(seed)
+    sizes = [min(block_rounds, rounds - start) for start in range(0, rounds, block_rounds)]
+    tasks = [(child, size) for child, size in zip(root.spawn(len(sizes)), sizes)]
+
+    blocks = [None] * len(tasks)
+    if queue is None:
+        for i, args in enumerate(tasks):
+            blocks[i] = simulate_block(*args)
+    else:
+        for i, future in queue.imap_unordered(simulate_block, tasks):
+            blocks[i] = future.result()
+
+    stats = SimulationStats()
+    for block in blocks:
+        stats.merge(block)
+    return stats, root.entropy
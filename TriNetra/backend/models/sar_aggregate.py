@@ -0,0 +1,416 @@
+import math
+
+import numpy as np
+import pandas as pd
+
+from models.transaction_batch import REQUIRED_FIELDS, OPTIONAL_FIELDS
+from models.cycle_detector import CycleDetector
+from models.temporal_activity import TemporalActivity
+
+# Countries the SAR location analysis and ML confidence treat as high risk
+HIGH_RISK_COUNTRIES = ['Pakistan', 'Afghanistan', 'Iran', 'North Korea']
+ML_HIGH_RISK_COUNTRIES = ['Pakistan', 'Afghanistan', 'Iran']
+
+MAX_EVIDENCE_IDS = 15
+MAX_REPORTED_ACCOUNTS = 20
+MAX_HIGH_RISK_LOCATIONS = 100
+
+
+def hash_values(values):
+    """Stable 64-bit hashes for an array of account/category values"""
+    return pd.util.hash_array(np.asarray(values, dtype=object))
+
+
+class QuantileSketch:
+    """Mergeable order-statistics sketch
+
+    Values are kept exactly until exact_limit is exceeded; after that they are
+    folded into log-spaced buckets with the given relative accuracy, so memory
+    stays bounded by the bucket count rather than the number of values.
+    """
+
+    def __init__(self, exact_limit=200000, relative_accuracy=0.005):
+        self.exact_limit = exact_limit
+        self.relative_accuracy = relative_accuracy
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+        self.count = 0
+        self._chunks = []
+        self._sorted = None
+        self._positive = None
+        self._negative = None
+        self._zeros = 0
+
+    @property
+    def is_exact(self):
+        return self._positive is None
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return
+        self.count += len(values)
+        if self.is_exact:
+            self._chunks.append(values)
+            self._sorted = None
+            if self.count > self.exact_limit:
+                self._to_buckets()
+        else:
+            self._add_to_buckets(values)
+
+    def merge(self, other):
+        if other.is_exact:
+            for values in other._chunks:
+                self.add(values)
+            return
+        if self.is_exact:
+            self._to_buckets()
+        self.count += other.count
+        self._zeros += other._zeros
+        for mine, theirs in ((self._positive, other._positive), (self._negative, other._negative)):
+            for key, count in theirs.items():
+                mine[key] = mine.get(key, 0) + count
+
+    def _to_buckets(self):
+        values = np.concatenate(self._chunks) if self._chunks else np.zeros(0)
+        self._chunks, self._sorted = [], None
+        self._positive, self._negative, self._zeros = {}, {}, 0
+        self._add_to_buckets(values)
+
+    def _add_to_buckets(self, values):
+        self._zeros += int(np.count_nonzero(values == 0))
+        for target, side in ((self._positive, values[values > 0]), (self._negative, -values[values < 0])):
+            if len(side):
+                keys, counts = np.unique(np.ceil(np.log(side) / self._log_gamma).astype(np.int64), return_counts=True)
+                for key, count in zip(keys.tolist(), counts.tolist()):
+                    target[key] = target.get(key, 0) + count
+
+    def _bucket_value(self, key):
+        return 2 * self._gamma ** key / (self._gamma + 1)
+
+    def _sorted_values(self):
+        if self._sorted is None:
+            self._sorted = np.sort(np.concatenate(self._chunks)) if self._chunks else np.zeros(0)
+            self._chunks = [self._sorted]
+        return self._sorted
+
+    def _ordered_buckets(self):
+        """(value, count) pairs in ascending value order"""
+        buckets = [(-self._bucket_value(k), c) for k, c in sorted(self._negative.items(), reverse=True)]
+        if self._zeros:
+            buckets.append((0.0, self._zeros))
+        buckets.extend((self._bucket_value(k), c) for k, c in sorted(self._positive.items()))
+        return buckets
+
+    def value_at(self, index):
+        """The index-th smallest value (0-based)"""
+        if self.is_exact:
+            return float(self._sorted_values()[index])
+        seen = 0
+        for value, count in self._ordered_buckets():
+            seen += count
+            if index < seen:
+                return value
+        return self._ordered_buckets()[-1][0]
+
+    def median(self):
+        if not self.count:
+            return 0.0
+        if self.is_exact:
+            return float(np.median(self._sorted_values()))
+        middle = self.count // 2
+        if self.count % 2:
+            return self.value_at(middle)
+        return (self.value_at(middle - 1) + self.value_at(middle)) / 2
+
+    def count_below(self, x, inclusive=False):
+        """Number of values < x (or <= x)"""
+        if self.is_exact:
+            side = 'right' if inclusive else 'left'
+            return int(np.searchsorted(self._sorted_values(), x, side=side))
+        total = 0
+        for value, count in self._ordered_buckets():
+            if value < x or (inclusive and value == x):
+                total += count
+        return total
+
+    def count_between(self, low, high):
+        """Number of values strictly between low and high"""
+        return max(self.count_below(high) - self.count_below(low, inclusive=True), 0)
+
+
+class DistinctSketch:
+    """Distinct-value counter: exact hash set up to exact_limit, HyperLogLog after"""
+
+    def __init__(self, exact_limit=200000, precision=14):
+        self.exact_limit = exact_limit
+        self.precision = precision
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._registers = None
+
+    def add_hashes(self, hashes):
+        hashes = np.asarray(hashes, dtype=np.uint64)
+        if self._registers is None:
+            self._hashes = np.union1d(self._hashes, hashes)
+            if len(self._hashes) > self.exact_limit:
+                self._registers = np.zeros(1 << self.precision, dtype=np.uint8)
+                self._add_to_registers(self._hashes)
+                self._hashes = None
+        else:
+            self._add_to_registers(hashes)
+
+    def merge(self, other):
+        if other._registers is None:
+            self.add_hashes(other._hashes)
+        elif self._registers is None:
+            hashes = self._hashes
+            self._hashes, self._registers = None, other._registers.copy()
+            self._add_to_registers(hashes)
+        else:
+            np.maximum(self._registers, other._registers, out=self._registers)
+
+    def _add_to_registers(self, hashes):
+        p = self.precision
+        index = (hashes >> np.uint64(64 - p)).astype(np.int64)
+        rest = (hashes << np.uint64(p)) | np.uint64(1 << (p - 1))
+        # Position of the first set bit in the remaining bits (leading zeros + 1)
+        rank = np.clip(64 - np.floor(np.log2(rest.astype(np.float64))), 1, 64 - p + 1).astype(np.uint8)
+        np.maximum.at(self._registers, index, rank)
+
+    def __len__(self):
+        if self._registers is None:
+            return len(self._hashes)
+        m = len(self._registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / np.sum(np.power(2.0, -self._registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self._registers == 0))
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)
+        return int(round(estimate))
+
+
+class HeavyHitters:
+    """Misra-Gries counters; the top count undercounts by at most n / (capacity + 1)"""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.counters = {}
+
+    def add_counts(self, counts):
+        for key, count in counts.items():
+            self.counters[key] = self.counters.get(key, 0) + count
+        if len(self.counters) > self.capacity:
+            ordered = sorted(self.counters.values(), reverse=True)
+            cut = ordered[self.capacity]
+            self.counters = {k: c - cut for k, c in self.counters.items() if c > cut}
+
+    def add_array(self, keys, counts):
+        """Add exact counts for parallel key/count arrays"""
+        if len(counts) > self.capacity:
+            # Same decrement as add_counts, applied before building the dict
+            cut = np.partition(counts, -(self.capacity + 1))[-(self.capacity + 1)]
+            keep = counts > cut
+            keys, counts = keys[keep], counts[keep] - cut
+        else:
+            keep = counts > 0
+            keys, counts = keys[keep], counts[keep]
+        self.add_counts(dict(zip(keys.tolist(), counts.tolist())))
+
+    def merge(self, other):
+        self.add_counts(other.counters)
+
+    def max_count(self):
+        return max(self.counters.values()) if self.counters else 0
+
+
+def _add_counts(target, counts):
+    for key, count in counts.items():
+        target[key] = target.get(key, 0) + count
+
+
+def _first_seen(target, values, limit):
+    for value in values:
+        if len(target) >= limit:
+            break
+        if value not in target:
+            target.append(value)
+
+
+class SARAggregate:
+    """Mergeable partial aggregates behind every AutoSAR report field
+
+    Built chunk by chunk from TransactionBatch objects. Chunks must arrive in
+    ts_epoch order (and merge() must be given the later partition) so
+    inter-transaction gaps can be carried across chunk boundaries.
+
+    Sketches stop growing at exact_limit values, but cycle detection keeps
+    up to max_edges transfers and account activity two events per transfer,
+    so memory grows with the transaction count until max_edges; past it the
+    extra rows are dropped from those two analyses and marked truncated.
+    """
+
+    def __init__(self, exact_limit=200000, max_edges=5000000):
+        self.exact_limit = exact_limit
+        self.max_edges = max_edges
+        self.count = 0
+
+        # Amount statistics (Chan et al. parallel mean/variance)
+        self.amount_sum = 0.0
+        self.amount_mean = 0.0
+        self.amount_m2 = 0.0
+        self.amount_min = math.inf
+        self.amount_max = -math.inf
+        self.amounts = QuantileSketch(exact_limit)
+        self.small_count = 0
+        self.threshold_count = 0
+        self.round_count = 0
+        self.large_round_count = 0
+
+        self.suspicion_sum = 0.0
+        self.suspicious_count = 0
+        self.critical_count = 0
+
+        # Categorical counts (small vocabularies, first-seen order)
+        self.method_counts = {}
+        self.country_counts = {}
+        self.state_counts = {}
+        self.city_counts = {}
+        self.location_count = 0
+        self.fallback_location_count = 0
+        self.high_risk_location_count = 0
+        self.high_risk_locations = []
+
+        # Accounts
+        self.accounts = DistinctSketch(exact_limit)
+        self.from_accounts = DistinctSketch(exact_limit)
+        self.first_accounts = []
+        self.destinations = HeavyHitters()
+        self.cycles = CycleDetector(max_edges=max_edges)
+
+        # Time
+        self.epoch_count = 0
+        self.epoch_min = None
+        self.epoch_max = None
+        self.off_hours_count = 0
+        self.weekend_count = 0
+        self.rapid_count = 0
+        self.gaps = QuantileSketch(exact_limit)
+        # Both account sides of every transaction
+        self.activity = TemporalActivity(max_events=2 * max_edges)
+
+        self.transaction_ids = []
+        self.field_counts = {field: 0 for field in REQUIRED_FIELDS + OPTIONAL_FIELDS}
+
+    def update(self, batch):
+        """Fold one TransactionBatch into the aggregate"""
+        n = batch.count
+        if not n:
+            return self
+        part = SARAggregate(self.exact_limit, self.max_edges)
+        part._fill(batch)
+        return self.merge(part)
+
+    def _fill(self, batch):
+        amounts = batch.amounts
+        self.count = n = batch.count
+        self.amount_sum = float(amounts.sum())
+        self.amount_mean = self.amount_sum / n
+        self.amount_m2 = float(np.sum((amounts - self.amount_mean) ** 2))
+        self.amount_min = float(amounts.min())
+        self.amount_max = float(amounts.max())
+        self.amounts.add(amounts)
+        self.small_count = int(np.count_nonzero(amounts < 10000))
+        self.threshold_count = int(np.count_nonzero((amounts >= 9000) & (amounts <= 10000)))
+        round_amounts = amounts % 1000 == 0
+        self.round_count = int(np.count_nonzero(round_amounts & (amounts > 1000)))
+        self.large_round_count = int(np.count_nonzero(round_amounts & (amounts >= 10000)))
+
+        self.suspicion_sum = float(batch.suspicion.sum())
+        self.suspicious_count = int(np.count_nonzero(batch.suspicion > 0.5))
+        self.critical_count = int(np.count_nonzero(batch.suspicion > 0.8))
+
+        self.method_counts = batch.category_counts('methods', 'method_codes')
+        self.country_counts = batch.category_counts('countries', 'country_codes')
+        self.state_counts = batch.category_counts('states', 'state_codes')
+        self.city_counts = batch.category_counts('cities', 'city_codes')
+        self.location_count = batch.location_count
+        self.fallback_location_count = batch.fallback_location_count
+        high_risk_rows = batch.country_rows(HIGH_RISK_COUNTRIES)
+        self.high_risk_location_count = len(high_risk_rows)
+        self.high_risk_locations = [batch.location_at(i) for i in high_risk_rows[:MAX_HIGH_RISK_LOCATIONS]]
+
+        account_hashes = hash_values(batch.accounts)
+        self.accounts.add_hashes(account_hashes)
+        self.from_accounts.add_hashes(account_hashes[np.unique(batch.from_codes)])
+        _first_seen(self.first_accounts, (a for a in batch.accounts if pd.notna(a) and a), MAX_REPORTED_ACCOUNTS)
+        self.destinations.add_array(account_hashes, np.bincount(batch.to_codes, minlength=len(account_hashes)))
+        self.cycles.add_batch(batch)
+
+        epochs = batch.epochs
+        self.epoch_count = len(epochs)
+        if len(epochs):
+            self.epoch_min = int(epochs[0])
+            self.epoch_max = int(epochs[-1])
+            hours = (epochs // 3600) % 24
+            self.off_hours_count = int(np.count_nonzero((hours < 5) | (hours >= 23)))
+            # 1970-01-01 was a Thursday
+            self.weekend_count = int(np.count_nonzero((epochs // 86400 + 3) % 7 >= 5))
+            self.rapid_count = int(np.count_nonzero(batch.gaps < 3600))
+            self.gaps.add(batch.gaps)
+        self.activity.add_batch(batch)
+
+        self.transaction_ids = list(batch.transaction_ids[:MAX_EVIDENCE_IDS])
+        self.field_counts = dict(batch.field_counts)
+
+    def merge(self, other):
+        """Combine with the aggregate of a later partition"""
+        if not other.count:
+            return self
+        if not self.count:
+            self.__dict__.update(other.__dict__)
+            return self
+
+        n = self.count + other.count
+        delta = other.amount_mean - self.amount_mean
+        self.amount_m2 += other.amount_m2 + delta * delta * self.count * other.count / n
+        self.amount_mean += delta * other.count / n
+        self.amount_sum += other.amount_sum
+        self.amount_min = min(self.amount_min, other.amount_min)
+        self.amount_max = max(self.amount_max, other.amount_max)
+        self.amounts.merge(other.amounts)
+        for name in ('small_count', 'threshold_count', 'round_count', 'large_round_count',
+                     'suspicion_sum', 'suspicious_count', 'critical_count',
+                     'location_count', 'fallback_location_count', 'high_risk_location_count',
+                     'off_hours_count', 'weekend_count', 'rapid_count'):
+            setattr(self, name, getattr(self, name) + getattr(other, name))
+
+        for name in ('method_counts', 'country_counts', 'state_counts', 'city_counts', 'field_counts'):
+            _add_counts(getattr(self, name), getattr(other, name))
+        room = MAX_HIGH_RISK_LOCATIONS - len(self.high_risk_locations)
+        self.high_risk_locations.extend(other.high_risk_locations[:max(room, 0)])
+
+        self.accounts.merge(other.accounts)
+        self.from_accounts.merge(other.from_accounts)
+        _first_seen(self.first_accounts, other.first_accounts, MAX_REPORTED_ACCOUNTS)
+        self.destinations.merge(other.destinations)
+        # Cycles may span the two partitions, so keep edges rather than answers
+        self.cycles.merge(other.cycles)
+
+        if other.epoch_count:
+            if self.epoch_count:
+                # Gap between the two partitions
+                gap = other.epoch_min - self.epoch_max
+                self.gaps.add([gap])
+                self.rapid_count += int(gap < 3600)
+                self.epoch_max = other.epoch_max
+            else:
+                self.epoch_min, self.epoch_max = other.epoch_min, other.epoch_max
+            self.gaps.merge(other.gaps)
+            self.epoch_count += other.epoch_count
+        # Per-account windows may span the two partitions
+        self.activity.merge(other.activity)
+
+        _first_seen(self.transaction_ids, other.transaction_ids, MAX_EVIDENCE_IDS)
+        self.count = n
+        return self
@@ -0,0 +1,274 @@
+import numpy as np
+import pandas as pd
+
+from utils.time_utils import from_epoch
+
+# Trailing windows for rolling counts and sums, in seconds
+DEFAULT_WINDOWS = {'1h': 3600, '24h': 86400, '7d': 7 * 86400}
+
+# An account bursts when its busiest window holds this many times its
+# average-rate share of the observed period (and at least MIN_BURST_EVENTS)
+BURST_SCORE_THRESHOLD = 5.0
+MIN_BURST_EVENTS = 3
+
+# Interval regularity: gaps within this fraction of the account's mean gap,
+# for accounts with at least MIN_INTERVAL_EVENTS events
+REGULAR_INTERVAL_TOLERANCE = 0.1
+MIN_INTERVAL_EVENTS = 5
+REGULAR_INTERVAL_RATIO = 0.7
+
+MAX_REPORTED_ACCOUNTS = 20
+
+# Account index and relative epoch share one int64 sort key
+_EPOCH_BITS = 34
+
+
+def _empty_events():
+    return {
+        'account': np.zeros(0, dtype=np.int64),
+        'epoch': np.zeros(0, dtype=np.int64),
+        'amount': np.zeros(0)
+    }
+
+
+def rolling_window_stats(keys, epochs, amounts, windows=DEFAULT_WINDOWS):
+    """Trailing per-key counts and sums for every event, in one sorted pass
+
+    keys are non-negative integer ids (accounts), epochs integer seconds.
+    Events are sorted by (key, epoch); for each event and window w the
+    result covers the same key's events in (epoch - w, epoch], found with
+    two binary searches on a combined (key, epoch) sort key and a running
+    amount sum. Returns the sort order, the sorted keys/epochs/amounts and
+    {window name: (counts, sums)} aligned with the sorted events.
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    epochs = np.asarray(epochs, dtype=np.int64)
+    amounts = np.asarray(amounts, dtype=float)
+    order = np.lexsort((epochs, keys))
+    keys, epochs, amounts = keys[order], epochs[order], amounts[order]
+
+    stats = {}
+    if len(keys):
+        relative = epochs - epochs.min()
+        if relative.max() >= 1 << _EPOCH_BITS:
+            raise ValueError('epoch span too large for rolling windows')
+        base = keys << _EPOCH_BITS
+        code = base | relative
+        cumulative = np.concatenate([[0.0], np.cumsum(amounts)])
+        # Events sharing the timestamp all count towards each other's window
+        end = np.searchsorted(code, code, side='right')
+        for name, width in windows.items():
+            start = np.searchsorted(code, base | np.maximum(relative - width + 1, 0), side='left')
+            stats[name] = (end - start, cumulative[end] - cumulative[start])
+    else:
+        stats = {name: (np.zeros(0, dtype=np.int64), np.zeros(0)) for name in windows}
+    return order, keys, epochs, amounts, stats
+
+
+def account_profiles(keys, epochs, amounts, windows=DEFAULT_WINDOWS):
+    """Per-key activity profile: totals, peak window counts/sums, burst scores, interval regularity
+
+    Burst score for window w is the key's peak count in any w-long window
+    divided by the count its average rate over the whole observed period
+    would put in one window. Interval regularity is the share of gaps
+    between consecutive events within REGULAR_INTERVAL_TOLERANCE of the
+    key's mean gap, with the gaps' coefficient of variation alongside.
+    Returns a dict of arrays, one entry per distinct key.
+    """
+    _, keys, epochs, amounts, stats = rolling_window_stats(keys, epochs, amounts, windows)
+    if not len(keys):
+        return {'key': keys, 'event_count': np.zeros(0, dtype=np.int64)}
+
+    starts = np.flatnonzero(np.concatenate([[True], keys[1:] != keys[:-1]]))
+    counts = np.diff(np.concatenate([starts, [len(keys)]]))
+    group = np.repeat(np.arange(len(starts)), counts)
+    period = max(int(epochs.max() - epochs.min()), 1)
+
+    profile = {
+        'key': keys[starts],
+        'event_count': counts,
+        'first_epoch': epochs[starts],
+        'last_epoch': np.maximum.reduceat(epochs, starts),
+        'total_amount': np.add.reduceat(amounts, starts)
+    }
+    for name, width in windows.items():
+        window_counts, window_sums = stats[name]
+        peak = np.maximum.reduceat(window_counts, starts)
+        expected = counts * min(width / period, 1.0)
+        profile[f'peak_count_{name}'] = peak
+        profile[f'peak_amount_{name}'] = np.maximum.reduceat(window_sums, starts)
+        profile[f'burst_score_{name}'] = peak / np.maximum(expected, 1.0)
+
+    # Gaps between consecutive events of the same key
+    same = group[1:] == group[:-1]
+    gap_group = group[1:][same]
+    gaps = np.diff(epochs).astype(float)[same]
+    gap_count = np.bincount(gap_group, minlength=len(starts))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_gap = np.bincount(gap_group, weights=gaps, minlength=len(starts)) / gap_count
+        variance = np.bincount(gap_group, weights=gaps * gaps, minlength=len(starts)) / gap_count - mean_gap ** 2
+        regular = np.abs(gaps - mean_gap[gap_group]) <= REGULAR_INTERVAL_TOLERANCE * mean_gap[gap_group]
+        profile['mean_interval'] = mean_gap
+        profile['interval_cv'] = np.sqrt(np.maximum(variance, 0)) / mean_gap
+        profile['regular_interval_ratio'] = np.bincount(gap_group, weights=regular, minlength=len(starts)) / gap_count
+    return profile
+
+
+class TemporalActivity:
+    """Per-account velocity, bursts and interval regularity over a transaction set
+
+    Events (one per account side of each dated transaction) are collected
+    chunk by chunk from TransactionBatch objects and merged like
+    SARAggregate, so windows that straddle chunk boundaries are counted
+    whole; profiles() then analyses every account in one vectorized pass.
+    Events beyond max_events are dropped and the result marked truncated.
+    """
+
+    def __init__(self, windows=DEFAULT_WINDOWS, max_events=10000000):
+        self.windows = dict(windows)
+        self.max_events = max_events
+        self.event_count = 0
+        self.truncated = False
+        self._accounts = {}
+        self._chunks = []
+        self._profiles = None
+
+    def _account_ids(self, accounts):
+        """Global id per account name (-1 for missing accounts)"""
+        vocabulary = self._accounts
+        return np.fromiter(
+            (vocabulary.setdefault(a, len(vocabulary)) if a == a and a is not None and a != '' else -1
+             for a in accounts),
+            dtype=np.int64, count=len(accounts)
+        )
+
+    def _append(self, events):
+        room = self.max_events - self.event_count
+        if len(events['account']) > room:
+            self.truncated = True
+            events = {name: values[:max(room, 0)] for name, values in events.items()}
+        if len(events['account']):
+            self._chunks.append(events)
+            self.event_count += len(events['account'])
+        self._profiles = None
+
+    def add_batch(self, batch):
+        """Collect sender and receiver events for the dated transactions of one TransactionBatch"""
+        if not batch.count:
+            return self
+        ids = self._account_ids(batch.accounts)
+        dated = ~np.isnan(batch.row_epochs)
+        epochs = batch.row_epochs[dated].astype(np.int64)
+        amounts = batch.amounts[dated].astype(float)
+        account = np.concatenate([ids[batch.from_codes][dated], ids[batch.to_codes][dated]])
+        known = account >= 0
+        self._append({
+            'account': account[known],
+            'epoch': np.concatenate([epochs, epochs])[known],
+            'amount': np.concatenate([amounts, amounts])[known]
+        })
+        return self
+
+    def add_events(self, accounts, epochs, amounts):
+        """Collect events given directly as account names, integer epochs and amounts"""
+        codes, names = pd.factorize(np.asarray(accounts, dtype=object))
+        account = np.where(codes >= 0, self._account_ids(names)[codes], -1) if len(names) else codes.astype(np.int64)
+        known = account >= 0
+        self._append({
+            'account': account[known],
+            'epoch': np.asarray(epochs, dtype=np.int64)[known],
+            'amount': np.asarray(amounts, dtype=float)[known]
+        })
+        return self
+
+    def merge(self, other):
+        """Add another collector's events (remapped onto this one's accounts)"""
+        self.truncated = self.truncated or other.truncated
+        if not other.event_count:
+            return self
+        mapping = self._account_ids(list(other._accounts))
+        for events in other._chunks:
+            self._append(dict(events, account=mapping[events['account']]))
+        return self
+
+    def _events(self):
+        if not self._chunks:
+            return _empty_events()
+        if len(self._chunks) > 1:
+            self._chunks = [{name: np.concatenate([c[name] for c in self._chunks]) for name in self._chunks[0]}]
+        return self._chunks[0]
+
+    def profiles(self):
+        """account_profiles() over every collected event, cached"""
+        if self._profiles is None:
+            events = self._events()
+            self._profiles = account_profiles(events['account'], events['epoch'], events['amount'], self.windows)
+        return self._profiles
+
+    def bursting(self, window='1h'):
+        """Profile indices of accounts whose window burst score crosses the threshold"""
+        profile = self.profiles()
+        if not len(profile['key']):
+            return np.zeros(0, dtype=np.int64)
+        return np.flatnonzero((profile[f'burst_score_{window}'] >= BURST_SCORE_THRESHOLD)
+                              & (profile[f'peak_count_{window}'] >= MIN_BURST_EVENTS))
+
+    def regular(self):
+        """Profile indices of accounts transacting at near-constant intervals"""
+        profile = self.profiles()
+        if not len(profile['key']):
+            return np.zeros(0, dtype=np.int64)
+        with np.errstate(invalid='ignore'):
+            return np.flatnonzero((profile['event_count'] >= MIN_INTERVAL_EVENTS)
+                                  & (profile['regular_interval_ratio'] > REGULAR_INTERVAL_RATIO))
+
+    def _account_record(self, i, names):
+        profile = self.profiles()
+        record = {
+            'account': names[profile['key'][i]],
+            'transactions': int(profile['event_count'][i]),
+            'total_amount': round(float(profile['total_amount'][i]), 2),
+            'first_seen': from_epoch(profile['first_epoch'][i]).isoformat(),
+            'last_seen': from_epoch(profile['last_epoch'][i]).isoformat(),
+            'windows': {
+                name: {
+                    'peak_count': int(profile[f'peak_count_{name}'][i]),
+                    'peak_amount': round(float(profile[f'peak_amount_{name}'][i]), 2),
+                    'burst_score': round(float(profile[f'burst_score_{name}'][i]), 2)
+                }
+                for name in self.windows
+            }
+        }
+        for name in ('interval_cv', 'regular_interval_ratio'):
+            value = profile[name][i]
+            record[name] = None if np.isnan(value) else round(float(value), 3)
+        return record
+
+    def summary(self, limit=MAX_REPORTED_ACCOUNTS, window='1h'):
+        """Report section: per-window peaks across accounts plus the most bursting and regular accounts"""
+        profile = self.profiles()
+        if not len(profile['key']):
+            return {'accounts_analyzed': 0, 'truncated': self.truncated, 'windows': {},
+                    'bursting_accounts': [], 'regular_interval_accounts': []}
+        names = np.array(list(self._accounts), dtype=object)
+
+        windows = {}
+        for name in self.windows:
+            busiest = int(np.argmax(profile[f'peak_count_{name}']))
+            windows[name] = {
+                'max_count': int(profile[f'peak_count_{name}'][busiest]),
+                'max_count_account': names[profile['key'][busiest]],
+                'max_amount': round(float(profile[f'peak_amount_{name}'].max()), 2)
+            }
+
+        bursting = self.bursting(window)
+        bursting = bursting[np.argsort(-profile[f'burst_score_{window}'][bursting], kind='stable')][:limit]
+        regular = self.regular()
+        regular = regular[np.argsort(-profile['event_count'][regular], kind='stable')][:limit]
+        return {
+            'accounts_analyzed': len(profile['key']),
+            'truncated': self.truncated,
+            'windows': windows,
+            'bursting_accounts': [self._account_record(i, names) for i in bursting],
+            'regular_interval_accounts': [self._account_record(i, names) for i in regular]
+        }
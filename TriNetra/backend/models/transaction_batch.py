@@ -0,0 +1,191 @@
+import numpy as np
+import pandas as pd
+
+from utils.time_utils import to_epoch
+
+REQUIRED_FIELDS = ['transaction_id', 'amount', 'from_account', 'to_account', 'timestamp']
+OPTIONAL_FIELDS = ['aadhar_location', 'transaction_method', 'suspicious_score']
+
+
+def _code(vocabulary, value):
+    """Index of value in an insertion-ordered vocabulary dict, adding it if new"""
+    code = vocabulary.get(value)
+    if code is None:
+        code = vocabulary[value] = len(vocabulary)
+    return code
+
+
+def _present(value):
+    return value is not None and value != ''
+
+
+class TransactionBatch:
+    """Columnar features for a chunk of transactions, built in one scan
+
+    Amounts, suspicion scores and epochs are arrays; accounts, methods and
+    locations are integer codes into first-seen category lists (-1 where a
+    row has no location). Missing values follow the dict helpers they
+    replace: amount/suspicion default to 0, accounts and methods to '',
+    location parts to 'Unknown'. Build from dicts with the constructor or
+    from an enrichment-joined DataFrame with from_frame().
+    """
+
+    def __init__(self, transactions=()):
+        transactions = list(transactions)
+        self.count = n = len(transactions)
+
+        amounts = np.zeros(n)
+        suspicion = np.zeros(n)
+        epochs = np.full(n, np.nan)
+        from_codes = np.zeros(n, dtype=np.int64)
+        to_codes = np.zeros(n, dtype=np.int64)
+        method_codes = np.zeros(n, dtype=np.int64)
+        country_codes = np.full(n, -1, dtype=np.int64)
+        state_codes = np.full(n, -1, dtype=np.int64)
+        city_codes = np.full(n, -1, dtype=np.int64)
+
+        accounts, methods, countries, states, cities = {}, {}, {}, {}, {}
+        field_counts = dict.fromkeys(REQUIRED_FIELDS + OPTIONAL_FIELDS, 0)
+        locations = {}
+        fallback = 0
+        for i, t in enumerate(transactions):
+            amounts[i] = float(t.get('amount') or 0)
+            suspicion[i] = float(t.get('suspicious_score') or 0)
+
+            epoch = t.get('ts_epoch')
+            if epoch is None or epoch != epoch:  # missing or NaN from pandas
+                epoch = to_epoch(t.get('timestamp'))
+            if epoch is not None:
+                epochs[i] = int(epoch)
+
+            from_codes[i] = _code(accounts, t.get('from_account', ''))
+            to_codes[i] = _code(accounts, t.get('to_account', ''))
+            method_codes[i] = _code(methods, t.get('transaction_method', ''))
+
+            location = t.get('aadhar_location')
+            if location is not None:
+                country_codes[i] = _code(countries, location.get('country', 'Unknown'))
+                state_codes[i] = _code(states, location.get('state', 'Unknown'))
+                city_codes[i] = _code(cities, location.get('city', 'Unknown'))
+                locations[i] = location
+            elif 'from_location' in t:
+                # Legacy records only carry a city
+                city_codes[i] = _code(cities, t['from_location'].get('city', 'Unknown'))
+                fallback += 1
+
+            for field in field_counts:
+                if _present(t.get(field)):
+                    field_counts[field] += 1
+
+        self.transaction_ids = [t.get('transaction_id', t.get('id', '')) for t in transactions]
+        self.amounts = amounts
+        self.suspicion = suspicion
+        self.from_codes = from_codes
+        self.to_codes = to_codes
+        self.method_codes = method_codes
+        self.country_codes = country_codes
+        self.state_codes = state_codes
+        self.city_codes = city_codes
+        self.accounts = list(accounts)
+        self.methods = list(methods)
+        self.countries = list(countries)
+        self.states = list(states)
+        self.cities = list(cities)
+        self.location_count = len(locations) + fallback
+        self.fallback_location_count = fallback
+        self.field_counts = field_counts
+        self._locations = locations
+        self._set_epochs(epochs)
+
+    @classmethod
+    def from_frame(cls, df):
+        """Build a batch from a transactions frame joined with its enrichment columns"""
+        batch = cls()
+        batch.count = n = len(df)
+        batch.transaction_ids = df['transaction_id'].tolist()
+        # NULL amounts/scores from the database default to 0 like the dict path
+        batch.amounts = df['amount'].astype(float).fillna(0.0).to_numpy()
+        batch.suspicion = df['suspicious_score'].astype(float).fillna(0.0).to_numpy()
+
+        epochs = df['ts_epoch'].astype(float).to_numpy(copy=True) if 'ts_epoch' in df else np.full(n, np.nan)
+        missing = np.flatnonzero(np.isnan(epochs))
+        for i in missing:
+            epoch = to_epoch(df['timestamp'].iat[i])
+            if epoch is not None:
+                epochs[i] = epoch
+        batch._set_epochs(epochs)
+
+        # Interleave from/to so account codes follow first appearance like the dict path
+        pairs = np.column_stack([df['from_account'].to_numpy(dtype=object), df['to_account'].to_numpy(dtype=object)])
+        codes, accounts = pd.factorize(pairs.ravel(), use_na_sentinel=False)
+        batch.from_codes, batch.to_codes = codes[0::2], codes[1::2]
+        batch.accounts = list(accounts)
+
+        methods = df['transaction_method'] if 'transaction_method' in df else pd.Series([''] * n)
+        batch.method_codes, uniques = pd.factorize(methods.to_numpy(dtype=object), use_na_sentinel=False)
+        batch.methods = list(uniques)
+
+        has_location = df['loc_city'].notna().to_numpy() if 'loc_city' in df else np.zeros(n, dtype=bool)
+        for column, codes_attr, vocab_attr in (('loc_country', 'country_codes', 'countries'),
+                                               ('loc_state', 'state_codes', 'states'),
+                                               ('loc_city', 'city_codes', 'cities')):
+            if column in df:
+                codes, uniques = pd.factorize(df[column].fillna('Unknown').to_numpy(dtype=object))
+                codes = np.where(has_location, codes, -1)
+            else:
+                codes, uniques = np.full(n, -1, dtype=np.int64), []
+            setattr(batch, codes_attr, codes)
+            setattr(batch, vocab_attr, list(uniques))
+        batch.location_count = int(np.count_nonzero(has_location))
+        batch.fallback_location_count = 0
+
+        batch.field_counts = {}
+        for field in REQUIRED_FIELDS + OPTIONAL_FIELDS:
+            if field == 'aadhar_location':
+                batch.field_counts[field] = batch.location_count
+            elif field in df:
+                column = df[field]
+                present = column.notna()
+                if column.dtype == object or pd.api.types.is_string_dtype(column):
+                    present &= column != ''
+                batch.field_counts[field] = int(present.sum())
+            else:
+                batch.field_counts[field] = 0
+        batch._frame = df
+        return batch
+
+    def _set_epochs(self, epochs):
+        # Per-row epochs (NaN where unknown) for edge-level analysis, then the
+        # valid epochs only, ascending, plus the gaps between neighbours
+        self.row_epochs = epochs
+        self.epochs = np.sort(epochs[~np.isnan(epochs)]).astype(np.int64)
+        self.gaps = np.diff(self.epochs)
+
+    def __len__(self):
+        return self.count
+
+    def category_counts(self, vocab_attr, codes_attr):
+        """{category: rows} for one coded column, in first-seen order"""
+        codes = getattr(self, codes_attr)
+        counts = np.bincount(codes[codes >= 0], minlength=len(getattr(self, vocab_attr)))
+        return {value: int(count) for value, count in zip(getattr(self, vocab_attr), counts) if count}
+
+    def country_rows(self, names):
+        """Row positions whose location country is one of names"""
+        matches = np.array([country in names for country in self.countries] + [False], dtype=bool)
+        # Code -1 (no location) indexes the trailing False
+        return np.flatnonzero(matches[self.country_codes]).tolist()
+
+    def location_at(self, i):
+        """Aadhar location dict for row i"""
+        if i in self._locations:
+            return self._locations[i]
+        row = self._frame.iloc[i]
+        return {
+            'state': row['loc_state'],
+            'city': row['loc_city'],
+            'region': row['loc_region'],
+            'country': row['loc_country'],
+            'lat': float(row['loc_lat']),
+            'lng': float(row['loc_lng'])
+        }
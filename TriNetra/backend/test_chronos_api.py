@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+CHRONOS API tests - timeline paging, columnar enrichment, trigram search and its short-term fallback
+"""
+
+import io
+import json
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.chronos_api import (
+    BASE_FIELDS, TIMELINE_FIELDS, build_search_query, enrichment_query, enrich_transactions, _location_records
+)
+from data.enrichment import attach_enrichment
+
+
+def _ingest(client, count, scenario='terrorist_financing'):
+    """Ingest count transactions spread over the last week; ids CH_00000.., accounts ACC_000..ACC_019"""
+    now = datetime.now()
+    lines = [
+        json.dumps({
+            'transaction_id': f'CH_{i:05d}',
+            'from_account': f'ACC_{i % 20:03d}',
+            'to_account': f'ACC_{(i + 7) % 20:03d}',
+            'amount': 1000.0 + i,
+            'timestamp': (now - timedelta(minutes=10 * (count - i))).isoformat(),
+            'suspicious_score': (i % 10) / 10 + 0.05,
+            'scenario': scenario
+        })
+        for i in range(count)
+    ]
+    response = client.post('/api/ingest', data=io.BytesIO('\n'.join(lines).encode()),
+                           content_type='application/x-ndjson')
+    assert response.status_code == 200
+
+
+def _search(client, **body):
+    return client.post('/api/chronos/search', json=body)
+
+
+def test_timeline_cursor_pages_cover_range_once(client):
+    """Following next_cursor visits every transaction in order with no overlap and no gaps"""
+    _ingest(client, 230)
+    first = client.get('/api/chronos/timeline?page_size=50').get_json()
+    assert first['total_transactions'] == 230 and first['page_size'] == 50
+
+    pages, page = [first], first
+    while page['has_more']:
+        page = client.get(f"/api/chronos/timeline?page_size=50&cursor={page['next_cursor']}").get_json()
+        assert 'layering_summary' not in page
+        pages.append(page)
+    assert [p['returned'] for p in pages] == [50, 50, 50, 50, 30]
+    assert pages[-1]['next_cursor'] is None
+    ids = [r['id'] for p in pages for r in p['data']]
+    assert ids == [f'CH_{i:05d}' for i in range(230)]
+
+
+def test_timeline_without_page_size_is_paged(client, monkeypatch):
+    """A request with no page_size gets the default page and a cursor; following it alone covers the range"""
+    monkeypatch.setattr('api.chronos_api.DEFAULT_PAGE_SIZE', 40)
+    _ingest(client, 100)
+    page = client.get('/api/chronos/timeline?time_quantum=3y').get_json()
+    assert page['returned'] == 40 and page['has_more'] and page['total_transactions'] == 100
+
+    # What the dashboard's getTimelineData does: same query plus cursor, until has_more is false
+    ids = [r['id'] for r in page['data']]
+    while page['has_more']:
+        page = client.get(f"/api/chronos/timeline?time_quantum=3y&cursor={page['next_cursor']}").get_json()
+        ids.extend(r['id'] for r in page['data'])
+    assert ids == [f'CH_{i:05d}' for i in range(100)]
+
+
+def test_timeline_fields_projection(client):
+    """?fields= returns only the requested fields; the critical overlay defaults to the base fields"""
+    _ingest(client, 20)
+    page = client.get('/api/chronos/timeline?fields=amount,id,aadhar_location').get_json()
+    assert page['fields'] == ['id', 'amount', 'aadhar_location']
+    assert len(page['data']) == 20 and all(set(r) == set(page['fields']) for r in page['data'])
+
+    overlay = client.get('/api/chronos/timeline?resolution=day&include_critical=true&critical_limit=2').get_json()
+    assert [set(r) for r in overlay['critical_overlay']] == [set(BASE_FIELDS)] * 2
+    assert overlay['critical_overlay_truncated'] is True
+
+
+def test_timeline_rejects_bad_input(client):
+    """Malformed paging, projection and resolution parameters are a 400, not a 500"""
+    for query in ('page_size=ten', 'page_size=', 'critical_limit=x&resolution=day', 'cursor=not-a-cursor',
+                  'fields=id,password', 'resolution=minute'):
+        response = client.get(f'/api/chronos/timeline?{query}')
+        assert response.status_code == 400, query
+        assert response.get_json()['status'] == 'error'
+
+
+def test_enrichment_matches_stored_rows(app):
+    """Each record carries its stored enrichment; rows in one city share one location dict"""
+    client = app.test_client()
+    _ingest(client, 300)
+    with app.extensions['db_pool'].connection() as conn:
+        df = pd.read_sql_query(enrichment_query('1 = 1', 't.id'), conn, params=[1000])
+    expected = [attach_enrichment(row) for row in df.to_dict('records')]
+
+    records = enrich_transactions(df)
+    assert len(records) == 300 and list(records[0]) == TIMELINE_FIELDS
+    by_city = {}
+    for record, stored in zip(records, expected):
+        assert record['id'] == stored['transaction_id']
+        assert record['aadhar_location'] == stored['aadhar_location']
+        assert record['transaction_method'] == stored['transaction_method']
+        assert record['bank_details'] == stored['bank_details']
+        assert by_city.setdefault(record['aadhar_location']['city'], record['aadhar_location']) is record['aadhar_location']
+        threat = record['layering_analysis']['layer_3_integration']['threat_level']
+        score = record['suspicious_score']
+        assert threat == ('CRITICAL' if score > 0.8 else 'MEDIUM' if score > 0.5 else 'LOW')
+        high_risk = record['aadhar_location']['country'] in ('Pakistan', 'Afghanistan', 'North Korea', 'Iran')
+        assert (record['country_risk_level']['level'] == 3) == high_risk
+
+    projected = enrich_transactions(df, ['amount', 'country_risk_level', 'id'])
+    assert all(list(r) == ['id', 'amount', 'country_risk_level'] for r in projected)
+    assert [r['country_risk_level'] for r in projected] == [r['country_risk_level'] for r in records]
+    assert [list(r) for r in enrich_transactions(df.iloc[:3], BASE_FIELDS)] == [BASE_FIELDS] * 3
+    assert enrich_transactions(df.iloc[:0]) == []
+
+
+def test_location_records_handle_missing_cities():
+    """Distinct cities get one dict each in first-seen order; rows without a city map to None"""
+    cities = ['Mumbai', None, 'Pune', 'Mumbai', np.nan, 'Pune']
+    df = pd.DataFrame({
+        'loc_city': cities,
+        'loc_state': ['Maharashtra'] * 6,
+        'loc_region': ['West'] * 6,
+        'loc_country': ['India'] * 6,
+        'loc_lat': [19.0, 0.0, 18.5, 19.1, 0.0, 18.6],
+        'loc_lng': [72.8] * 6
+    })
+    codes, locations = _location_records(df)
+    assert [locations[c]['city'] if locations[c] else None for c in codes] == ['Mumbai', None, 'Pune', 'Mumbai', None, 'Pune']
+    assert len(locations) == 3
+    assert locations[codes[3]] is locations[codes[0]] and locations[codes[0]]['lat'] == 19.0
+
+
+def test_search_uses_trigram_index_for_long_terms(client):
+    """Terms of three or more characters are matched through FTS5, limited to the requested columns"""
+    assert 'transactions_fts MATCH' in build_search_query('ACC_004', 'account', 10)[0]
+    _ingest(client, 200)
+
+    results = _search(client, term='ACC_004', type='account').get_json()['results']
+    assert len(results) == 20
+    assert all('ACC_004' in (r['from_account'], r['to_account']) for r in results)
+    assert all(r['match_type'] == 'account' for r in results)
+
+    # Substring match inside the id column only
+    results = _search(client, term='0012', type='id').get_json()['results']
+    assert sorted(r['id'] for r in results) == ['CH_00012', 'CH_00120', 'CH_00121', 'CH_00122', 'CH_00123',
+                                                'CH_00124', 'CH_00125', 'CH_00126', 'CH_00127', 'CH_00128',
+                                                'CH_00129']
+    assert len(_search(client, term='0012', type='id', limit=3).get_json()['results']) == 3
+    assert _search(client, term='nothing like this').get_json()['results'] == []
+
+
+def test_search_falls_back_for_short_terms(client):
+    """One- and two-character terms bypass the trigram index with a bounded LIKE scan"""
+    assert 'MATCH' not in build_search_query('19', 'id', 10)[0]
+    _ingest(client, 200)
+
+    results = _search(client, term='19', type='id', limit=1000).get_json()['results']
+    assert sorted(r['id'] for r in results) == sorted(f'CH_{i:05d}' for i in range(200) if '19' in f'{i:05d}')
+    assert len(_search(client, term='1', limit=5).get_json()['results']) == 5
+
+    results = _search(client, term='1042', type='amount').get_json()['results']
+    assert [r['id'] for r in results] == ['CH_00042']
+    assert results[0]['match_score'] == 1.0
+
+
+def test_search_rejects_bad_input(client):
+    """A non-numeric amount or limit is a 400, and a missing body searches with the defaults"""
+    response = _search(client, term='abc', type='amount')
+    assert response.status_code == 400 and response.get_json()['status'] == 'error'
+    assert _search(client, term='ACC', limit='many').status_code == 400
+    assert _search(client, term='ACC', limit=None).status_code == 400
+
+    response = client.post('/api/chronos/search')
+    assert response.status_code == 200 and response.get_json()['limit'] == 100
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Connection pool tests - WAL mode, bounded checkout and stats
+"""
+
+import os
+import tempfile
+
+from utils.db_pool import ConnectionPool, PoolTimeoutError
+
+
+def _make_pool(**kwargs):
+    db_dir = tempfile.mkdtemp()
+    return ConnectionPool(os.path.join(db_dir, 'pool_test.db'), **kwargs)
+
+
+def test_connections_use_wal_and_are_reused():
+    """Pooled connections run in WAL mode and are handed out again"""
+    pool = _make_pool(max_connections=2)
+
+    with pool.connection() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.execute('INSERT INTO t VALUES (1)')
+        first = conn
+
+    with pool.connection() as conn:
+        assert conn is first
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 1
+
+    stats = pool.stats()
+    assert stats['checkouts'] == 2
+    assert stats['open_connections'] == 1
+    assert stats['in_use'] == 0
+    pool.close_all()
+
+
+def test_rollback_on_error():
+    """A failing block rolls back and still returns its connection"""
+    pool = _make_pool(max_connections=1)
+    with pool.connection() as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+
+    try:
+        with pool.connection() as conn:
+            conn.execute('INSERT INTO t VALUES (1)')
+            raise ValueError('boom')
+    except ValueError:
+        pass
+
+    with pool.connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 0
+    assert pool.stats()['in_use'] == 0
+    pool.close_all()
+
+
+def test_bounded_pool_waits_and_times_out():
+    """Checkouts beyond the pool size wait, and give up after the timeout"""
+    pool = _make_pool(max_connections=1, checkout_timeout=0.05)
+
+    with pool.connection():
+        try:
+            with pool.connection():
+                assert False, 'second checkout should not succeed'
+        except PoolTimeoutError:
+            pass
+
+    stats = pool.stats()
+    assert stats['waits'] == 1
+    assert stats['timeouts'] == 1
+    assert stats['open_connections'] == 1
+    pool.close_all()
+
+
+if __name__ == "__main__":
+    test_connections_use_wal_and_are_reused()
+    test_rollback_on_error()
+    test_bounded_pool_waits_and_times_out()
+    print("✅ Connection pool tests passed")
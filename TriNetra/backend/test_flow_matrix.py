@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Flow matrix tests - sparse origin x destination corridors, built incrementally
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from models.flow_matrix import FlowMatrix, ENDPOINT_COLUMNS
+
+LOCATIONS = [
+    ('India', 'Maharashtra', 'Mumbai'),
+    ('India', 'Maharashtra', 'Pune'),
+    ('India', 'Delhi', 'New Delhi'),
+    ('UAE', 'Dubai', 'Dubai'),
+    ('Pakistan', 'Sindh', 'Karachi')
+]
+RISK_LEVELS = {'Pakistan': 3, 'UAE': 2}
+
+
+def _transactions(count, seed=0):
+    """Endpoint columns plus amount/suspicion for random location pairs"""
+    rng = np.random.default_rng(seed)
+    origin = rng.integers(0, len(LOCATIONS), count)
+    destination = rng.integers(0, len(LOCATIONS), count)
+    table = np.array(LOCATIONS, dtype=object)
+    endpoints = pd.DataFrame(np.hstack([table[origin], table[destination]]), columns=ENDPOINT_COLUMNS)
+    return endpoints, rng.uniform(100, 10000, count), rng.uniform(0, 1, count)
+
+
+def _direct(endpoints, amounts, suspicion, columns):
+    """Reference corridor totals with a pandas groupby"""
+    frame = endpoints.assign(amount=amounts, suspicion=suspicion)
+    return frame.groupby(columns).agg(count=('amount', 'size'), amount=('amount', 'sum'),
+                                      suspicion=('suspicion', 'sum'))
+
+
+def test_corridors_match_groupby():
+    """City, state and country corridors agree with a direct groupby"""
+    endpoints, amounts, suspicion = _transactions(2000)
+    flows = FlowMatrix(RISK_LEVELS).add(endpoints, amounts, suspicion)
+    assert flows.transaction_count == 2000
+    assert len(flows) == len(_direct(endpoints, amounts, suspicion, ENDPOINT_COLUMNS))
+
+    expected = _direct(endpoints, amounts, suspicion, ['from_country', 'to_country'])
+    corridors = flows.corridors('country', limit=100)
+    assert len(corridors) == len(expected)
+    for c in corridors:
+        row = expected.loc[(c['from_country'], c['to_country'])]
+        assert c['transaction_count'] == row['count']
+        assert abs(c['total_amount'] - row['amount']) < 1e-6
+        assert c['risk_level'] == max(RISK_LEVELS.get(c['from_country'], 1), RISK_LEVELS.get(c['to_country'], 1))
+        assert abs(c['risk_score'] - row['suspicion'] * c['risk_level']) < 1e-6
+    assert [c['total_amount'] for c in corridors] == sorted((c['total_amount'] for c in corridors), reverse=True)
+
+    states = flows.corridors('state', limit=3)
+    assert len(states) == 3 and set(states[0]) >= {'from_state', 'to_state'} and 'from_city' not in states[0]
+
+    risky = flows.corridors('country', by='risk', cross_border=True, limit=100)
+    assert all(c['from_country'] != c['to_country'] for c in risky)
+    assert risky[0]['risk_level'] == 3
+
+
+def test_incremental_and_merge_match_single_pass():
+    """Adding chunks, merging partial matrices or adding summed pairs gives the same corridors as one pass"""
+    endpoints, amounts, suspicion = _transactions(3000, seed=1)
+    whole = FlowMatrix(RISK_LEVELS).add(endpoints, amounts, suspicion)
+
+    incremental = FlowMatrix(RISK_LEVELS)
+    merged = FlowMatrix(RISK_LEVELS)
+    for start in range(0, 3000, 700):
+        part = slice(start, start + 700)
+        incremental.add(endpoints.iloc[part], amounts[part], suspicion[part])
+        merged.merge(FlowMatrix().add(endpoints.iloc[part].iloc[::-1], amounts[part][::-1], suspicion[part][::-1]))
+
+    # Pre-summed pairs (as stored in flow_pairs) carry their transaction counts
+    summed = _direct(endpoints, amounts, suspicion, ENDPOINT_COLUMNS).reset_index()
+    stored = FlowMatrix(RISK_LEVELS).add(summed[ENDPOINT_COLUMNS], summed['amount'], summed['suspicion'],
+                                         counts=summed['count'])
+
+    for flows in (incremental, merged, stored):
+        assert flows.transaction_count == 3000
+        for a, b in zip(whole.corridors('city', limit=50), flows.corridors('city', limit=50)):
+            assert a['from_city'] == b['from_city'] and a['to_city'] == b['to_city']
+            assert a['transaction_count'] == b['transaction_count']
+            assert abs(a['total_amount'] - b['total_amount']) < 1e-6
+
+
+def test_missing_endpoints_and_errors():
+    """Missing location parts form their own key; bad levels are rejected"""
+    endpoints = pd.DataFrame([['India', None, 'Mumbai', 'UAE', 'Dubai', 'Dubai']], columns=ENDPOINT_COLUMNS)
+    flows = FlowMatrix().add(endpoints, [100.0])
+    assert flows.corridors('state')[0]['from_state'] == ''
+    assert FlowMatrix().corridors() == []
+    try:
+        flows.corridors('region')
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
+
+
+def test_million_transaction_flows():
+    """Benchmark: 1M transactions added in chunks, then top corridors"""
+    endpoints, amounts, suspicion = _transactions(1000000, seed=2)
+
+    started = time.time()
+    flows = FlowMatrix(RISK_LEVELS)
+    for start in range(0, 1000000, 250000):
+        part = slice(start, start + 250000)
+        flows.add(endpoints.iloc[part], amounts[part], suspicion[part])
+    top = flows.corridors('city', by='risk')
+    elapsed = time.time() - started
+
+    print(f"\n📊 flow matrix: 1,000,000 transactions in {elapsed:.3f}s ({1000000 / elapsed:,.0f} transactions/sec)")
+    assert flows.transaction_count == 1000000 and len(top) == 10
+    assert elapsed < 10
+
+
+if __name__ == "__main__":
+    test_corridors_match_groupby()
+    test_incremental_and_merge_match_single_pass()
+    test_missing_endpoints_and_errors()
+    test_million_transaction_flows()
+    print("✅ Flow matrix tests passed")
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Geo tests - shared gazetteer, nearest-city and radius lookups checked against brute force
+"""
+
+import time
+
+import numpy as np
+
+from data import geo
+from data.geo import Gazetteer, gazetteer, haversine_km
+
+
+def _brute_nearest(g, lat, lng):
+    """Nearest distance per point by scanning every city"""
+    return np.concatenate([
+        haversine_km(lat[i:i + 1000, None], lng[i:i + 1000, None], g.lat, g.lng).min(axis=1)
+        for i in range(0, len(lat), 1000)
+    ])
+
+
+def _synthetic(count, seed=0):
+    """A gazetteer large enough to be served from the grid"""
+    rng = np.random.default_rng(seed)
+    return Gazetteer([f'C{i}' for i in range(count)], [''] * count, [''] * count,
+                     rng.uniform(8, 34, count), rng.uniform(69, 95, count))
+
+
+def test_gazetteer_loads_once():
+    """simplemap.json is parsed lazily into float arrays and shared"""
+    cities = gazetteer()
+    assert cities is gazetteer()
+    assert len(cities) == 162
+    assert cities.lat.dtype == float and cities.lng.dtype == float
+    mumbai = cities.city(int(np.flatnonzero(cities.cities == 'Mumbai')[0]))
+    assert mumbai['country'] == 'India' and abs(mumbai['lat'] - 19.076) < 0.01
+
+
+def test_nearest_matches_brute_force():
+    """Full-scan and grid lookups return the true nearest city, inside and outside the grid"""
+    rng = np.random.default_rng(1)
+    lat = rng.uniform(-20, 50, 5000)
+    lng = rng.uniform(40, 120, 5000)
+
+    cities = gazetteer()
+    _, distance = cities.nearest(lat, lng)
+    assert np.allclose(distance, _brute_nearest(cities, lat, lng))
+
+    large = _synthetic(geo.FULL_SCAN_CITIES * 2)
+    assert large._cell_candidates is not None
+    index, distance = large.nearest(lat, lng)
+    assert np.allclose(distance, _brute_nearest(large, lat, lng))
+    assert np.allclose(distance, haversine_km(lat, lng, large.lat[index], large.lng[index]))
+
+
+def test_radius_and_reverse_geocode():
+    """Radius queries return every city in range, nearest first"""
+    cities = gazetteer()
+    lat, lng = np.array([19.076, 28.61, 0.0]), np.array([72.8777, 77.21, 0.0])
+    found = cities.within_radius(lat, lng, 150)
+
+    for i, indices in enumerate(found):
+        expected = np.flatnonzero(haversine_km(lat[i], lng[i], cities.lat, cities.lng) <= 150)
+        assert sorted(indices.tolist()) == expected.tolist()
+        distances = haversine_km(lat[i], lng[i], cities.lat[indices], cities.lng[indices])
+        assert np.all(np.diff(distances) >= 0)
+    assert len(found[2]) == 0
+
+    assert cities.reverse_geocode([19.076, 25.2], [72.8777, 55.27]).tolist() == ['Mumbai', None]
+
+
+def test_million_point_reverse_geocode():
+    """Benchmark: nearest city for 1M points"""
+    rng = np.random.default_rng(2)
+    lat = rng.uniform(8, 34, 1000000)
+    lng = rng.uniform(69, 95, 1000000)
+    cities = gazetteer()
+
+    started = time.time()
+    index, _ = cities.nearest(lat, lng)
+    elapsed = time.time() - started
+
+    print(f"\n📊 reverse geocode: 1,000,000 points in {elapsed:.3f}s ({1000000 / elapsed:,.0f} points/sec)")
+    assert len(index) == 1000000 and index.max() < len(cities)
+    assert elapsed < 10
+
+
+if __name__ == "__main__":
+    test_gazetteer_loads_once()
+    test_nearest_matches_brute_force()
+    test_radius_and_reverse_geocode()
+    test_million_point_reverse_geocode()
+    print("✅ Geo tests passed")
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+HYDRA engine tests - batched pattern generation, simulation scoring and feature-based detection
+"""
+
+import json
+import time
+
+import numpy as np
+import pytest
+
+from models.hydra_engine import (
+    PATTERN_TYPES, MIN_PATTERN_TRANSACTIONS, MAX_PATTERN_TRANSACTIONS, COMPLEXITY_RANGE,
+    PatternBatch, SimulationResult, SimulationStats, generate_patterns, run_simulation, run_monte_carlo,
+    iter_simulation, wilson_interval, detect_patterns, pattern_accounts
+)
+from api.hydra_api import MAX_MONTE_CARLO_ROUNDS, MAX_SYNC_MONTE_CARLO_ROUNDS
+from utils.job_queue import JobQueue
+
+
+def test_patterns_follow_generator_shape():
+    """Counts, complexity and amounts stay in the single-pattern generator's ranges"""
+    batch = generate_patterns(5000, np.random.default_rng(0))
+    counts = batch.transaction_counts
+    assert counts.min() >= MIN_PATTERN_TRANSACTIONS and counts.max() <= MAX_PATTERN_TRANSACTIONS
+    assert COMPLEXITY_RANGE[0] <= batch.complexity.min() and batch.complexity.max() <= COMPLEXITY_RANGE[1]
+    assert set(np.unique(batch.type_codes)) == set(range(len(PATTERN_TYPES)))
+
+    sources, targets = batch.accounts()
+    assert (sources >= 1).all() and (targets >= 1).all() and (sources <= counts).all() and (targets <= counts).all()
+    assert (batch.amounts > 0).all()
+
+    pattern = batch.pattern(7, 'GEN_TEST')
+    assert len(pattern['transactions']) == counts[7]
+    assert len({t['from'] for t in pattern['transactions']}) == sources[7]
+    assert len({t['to'] for t in pattern['transactions']}) == targets[7]
+    assert abs(sum(t['amount'] for t in pattern['transactions']) - batch.amount_totals()[7]) < 1e-6
+
+
+def test_simulation_scores_and_summaries():
+    """Round summaries, totals and the per-pattern breakdown agree; seeds reproduce runs"""
+    result = run_simulation(2000, seed=42)
+    rounds = result.round_summaries()
+    assert [r['round'] for r in rounds[:3]] == [1, 2, 3]
+    assert all(0 < r['confidence'] < 1 and r['detected'] == (r['confidence'] > 0.5) for r in rounds)
+
+    summary = result.summary()
+    assert summary['total_detected'] == sum(r['detected'] for r in rounds)
+    assert summary['total_transactions'] == sum(r['transaction_count'] for r in rounds)
+    assert sum(p['rounds'] for p in summary['by_pattern'].values()) == 2000
+
+    assert run_simulation(2000, seed=42).round_summaries() == rounds
+    assert result.round_summaries(10, 12) == rounds[10:12]
+
+
+def test_simulation_scores_pattern_features():
+    """Simulated verdicts are the detector's verdicts on the generated patterns and vary with layout"""
+    result = run_simulation(4000, seed=21)
+    patterns = [result.patterns.pattern(i, f'P{i}') for i in range(500)]
+    detections = detect_patterns(patterns)
+    assert [d['detected'] for d in detections] == result.detected[:500].tolist()
+    assert np.allclose([d['confidence'] for d in detections], result.confidence[:500])
+
+    summary = result.summary()
+    assert 0.2 < summary['detection_rate'] < 0.9
+    rates = [p['detection_rate'] for p in summary['by_pattern'].values()]
+    assert max(rates) - min(rates) > 0.3
+    simple = result.patterns.complexity < np.mean(COMPLEXITY_RANGE)
+    assert result.detected[simple].mean() > result.detected[~simple].mean()
+
+    # Simplest smurfing: every transaction from its own depositor into one collector
+    assert [n.tolist() for n in pattern_accounts(np.array([0]), np.array([COMPLEXITY_RANGE[0]]), [12])] == [[12], [1]]
+
+
+def test_hundred_thousand_rounds():
+    """Benchmark: 100k rounds generated, featurised and scored in one pass"""
+    started = time.time()
+    result = run_simulation(100000, seed=1)
+    summary = result.summary()
+    elapsed = time.time() - started
+    print(f"\n📊 HYDRA simulation: 100,000 rounds in {elapsed:.3f}s ({100000 / elapsed:,.0f} rounds/sec)")
+    assert summary['rounds'] == 100000
+    assert elapsed < 3
+
+
+def _pattern(pattern_id, edges, amounts):
+    return {'pattern_id': pattern_id,
+            'transactions': [{'from': a, 'to': b, 'amount': amount} for (a, b), amount in zip(edges, amounts)]}
+
+
+def test_detection_features_match_direct_count():
+    """Fan-in, fan-out, dispersion and repetition agree with a per-pattern count"""
+    rng = np.random.default_rng(8)
+    patterns = []
+    for i in range(300):
+        n = int(rng.integers(0, 25))
+        edges = [(f'S{rng.integers(0, 6)}', f'R{rng.integers(0, 4)}') for _ in range(n)]
+        patterns.append(_pattern(f'P{i}', edges, rng.uniform(100, 9000, n).round(2).tolist()))
+    for pattern, detection in zip(patterns, detect_patterns(patterns)):
+        features = detection['features']
+        edges = [(t['from'], t['to']) for t in pattern['transactions']]
+        amounts = np.array([t['amount'] for t in pattern['transactions']])
+        assert detection['pattern_id'] == pattern['pattern_id']
+        assert features['transaction_count'] == len(edges)
+        assert features['fan_out'] == max([len({b for a, b in set(edges) if a == s}) for s, _ in edges], default=0)
+        assert features['fan_in'] == max([len({a for a, b in set(edges) if b == r}) for _, r in edges], default=0)
+        assert features['repetition'] == (round(1 - len(set(edges)) / len(edges), 4) if edges else 0.0)
+        if len(edges) > 1:
+            assert abs(features['amount_cv'] - amounts.std() / amounts.mean()) < 1e-3
+        else:
+            assert features['amount_cv'] is None
+
+
+def test_detection_ranks_structured_patterns_higher():
+    """Many senders paying one account near-identical sums outscore a single transfer"""
+    smurfing = _pattern('SMURF', [(f'MULE_{i}', 'COLLECTOR') for i in range(12)], [9800 + i for i in range(12)])
+    single = _pattern('ONE', [('A', 'B')], [4200.0])
+    scattered = _pattern('SCATTER', [('A', 'B'), ('C', 'D'), ('E', 'F')], [150.0, 7000.0, 52000.0])
+    # A low-complexity smurfing pattern: eleven depositors into one account
+    generated = generate_patterns(10, np.random.default_rng(0)).pattern(6, 'GEN')
+    scores = {d['pattern_id']: d for d in detect_patterns([smurfing, single, scattered, generated])}
+    assert scores['SMURF']['detected'] and scores['GEN']['detected']
+    assert not scores['ONE']['detected'] and not scores['SCATTER']['detected']
+    assert scores['SMURF']['confidence'] > scores['SCATTER']['confidence']
+    assert detect_patterns([{'pattern_id': 'EMPTY'}])[0]['features']['transaction_count'] == 0
+
+
+def test_detection_throughput():
+    """Benchmark: 20k generated patterns featurised and scored in one batch"""
+    batch = generate_patterns(20000, np.random.default_rng(4))
+    patterns = [batch.pattern(i, f'P{i}') for i in range(len(batch))]
+    started = time.time()
+    detections = detect_patterns(patterns)
+    elapsed = time.time() - started
+    print(f"\n📊 HYDRA detection: 20,000 patterns in {elapsed:.3f}s ({20000 / elapsed:,.0f} patterns/sec)")
+    assert len(detections) == 20000
+    assert [d['features']['transaction_count'] for d in detections] == batch.transaction_counts.tolist()
+    assert elapsed < 5
+
+
+def test_monte_carlo_same_seed_any_worker_count():
+    """A seed gives identical statistics in-process and on pools of different sizes"""
+    expected, entropy = run_monte_carlo(50000, seed=11, block_rounds=4000)
+    assert entropy == 11
+    for workers in (1, 3):
+        queue = JobQueue(max_workers=workers)
+        try:
+            stats, _ = run_monte_carlo(50000, seed=11, queue=queue, block_rounds=4000)
+        finally:
+            queue.shutdown()
+        assert stats.summary() == expected.summary()
+    assert run_monte_carlo(50000, seed=12, block_rounds=4000)[0].summary() != expected.summary()
+
+
+def test_monte_carlo_statistics():
+    """Merged block statistics match one pass; intervals bracket the estimates"""
+    result = run_simulation(6000, seed=3)
+    whole = SimulationStats.from_result(result)
+    merged = SimulationStats()
+    patterns = result.patterns
+    for start in range(0, 6000, 1000):
+        block = slice(start, start + 1000)
+        offsets = patterns.offsets[start:start + 1001]
+        part = PatternBatch(patterns.type_codes[block], patterns.complexity[block], offsets - offsets[0],
+                            patterns.amounts[offsets[0]:offsets[-1]])
+        merged.merge(SimulationStats.from_result(SimulationResult(part, result.confidence[block], result.detected[block])))
+    a, b = whole.summary(), merged.summary()
+    assert a['total_detected'] == b['total_detected'] and a['total_transactions'] == b['total_transactions']
+    for name in PATTERN_TYPES:
+        assert a['by_pattern'][name]['detection_rate_ci'] == b['by_pattern'][name]['detection_rate_ci']
+        assert abs(a['by_pattern'][name]['avg_confidence'] - b['by_pattern'][name]['avg_confidence']) < 1e-12
+    assert abs(a['avg_confidence'] - b['avg_confidence']) < 1e-12
+    assert abs(a['confidence_std'] - b['confidence_std']) < 1e-12
+
+    low, high = a['detection_rate_ci']
+    assert low <= a['detection_rate'] <= high
+    assert a['avg_confidence_ci'][0] < a['avg_confidence'] < a['avg_confidence_ci'][1]
+    assert wilson_interval(0, 0) == (0.0, 0.0)
+    low, high = wilson_interval(50, 100)
+    assert abs(low - 0.4038) < 1e-3 and abs(high - 0.5962) < 1e-3
+
+
+def _sse_events(chunks):
+    """(event, data) pairs from server-sent event frames"""
+    events = []
+    for frame in b''.join(chunks).decode().split('\n\n'):
+        if frame:
+            event, data = frame.split('\n')
+            events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+def test_streamed_chunks_match_monte_carlo():
+    """Chunks are produced on demand and their running stats end at the Monte Carlo result"""
+    chunks = iter_simulation(25000, seed=5, chunk_rounds=4000)
+    first_start, first, stats = next(chunks)
+    assert first_start == 0 and len(first.confidence) == 4000 and stats.rounds == 4000
+    *_, (last_start, last, stats) = chunks
+    assert last_start == 24000 and len(last.confidence) == 1000
+    assert stats.summary() == run_monte_carlo(25000, seed=5, block_rounds=4000)[0].summary()
+
+
+def test_simulation_stream_endpoint(client):
+    """The stream sends renumbered rounds and progress per chunk, and stops when the client leaves"""
+    response = client.get('/api/hydra/simulation/stream?rounds=2500&seed=4&chunk_rounds=1000')
+    assert response.mimetype == 'text/event-stream'
+    events = _sse_events(response.response)
+    assert [e for e, _ in events] == ['start'] + ['rounds', 'progress'] * 3 + ['complete']
+    rounds = [r for e, data in events if e == 'rounds' for r in data['results']]
+    assert [r['round'] for r in rounds] == list(range(1, 2501))
+    assert [data['completed_rounds'] for e, data in events if e == 'progress'] == [1000, 2000, 2500]
+    complete = events[-1][1]
+    assert complete['seed'] == 4 and complete['total_detected'] == sum(r['detected'] for r in rounds)
+    assert complete['detection_rate'] == run_monte_carlo(2500, seed=4, block_rounds=1000)[0].summary()['detection_rate']
+
+    quiet = _sse_events(client.get('/api/hydra/simulation/stream?rounds=300&chunk_rounds=100&include_rounds=false').response)
+    assert 'rounds' not in [e for e, _ in quiet] and quiet[-1][1]['rounds'] == 300
+
+    # A client that disconnects after the first chunk stops the simulation
+    response = client.get('/api/hydra/simulation/stream?rounds=50000000&chunk_rounds=100000', buffered=False)
+    frames = iter(response.response)
+    assert next(frames).startswith(b'event: start')
+    assert next(frames).startswith(b'event: rounds')
+    started = time.time()
+    response.close()
+    assert time.time() - started < 1
+
+    assert client.get('/api/hydra/simulation/stream?rounds=0').status_code == 400
+    assert client.get('/api/hydra/simulation/stream?chunk_rounds=0').status_code == 400
+    assert client.get('/api/hydra/simulation/stream?seed=x').status_code == 400
+
+
+def test_simulation_endpoint(client):
+    """The endpoint validates its arguments and returns per-round summaries"""
+    simulation = client.get('/api/hydra/simulation?rounds=500&seed=7').get_json()['simulation']
+    assert simulation['rounds'] == 500 and len(simulation['results']) == 500
+    assert simulation['total_detected'] == sum(r['detected'] for r in simulation['results'])
+
+    limited = client.get('/api/hydra/simulation?rounds=500&seed=7&results_limit=5').get_json()['simulation']
+    assert limited['results'] == simulation['results'][:5]
+    assert limited['total_detected'] == simulation['total_detected']
+
+    assert client.get('/api/hydra/simulation?rounds=0').status_code == 400
+    assert client.get('/api/hydra/simulation?rounds=abc').status_code == 400
+    pattern = client.post('/api/hydra/generate').get_json()['pattern']
+    assert pattern['pattern_type'] in PATTERN_TYPES
+    single = client.post('/api/hydra/detect', json=pattern).get_json()['detection']
+    assert single['pattern_id'] == pattern['pattern_id'] and single == detect_patterns([pattern])[0]
+    batch = client.post('/api/hydra/detect', json={'patterns': [pattern] * 3}).get_json()
+    assert batch['detections'] == [single] * 3 and batch['summary']['patterns'] == 3
+    assert client.post('/api/hydra/detect', json={'patterns': 'x'}).status_code == 400
+    assert client.post('/api/hydra/detect', json={'transactions': [{'from': 'A', 'amount': 'lots'}]}).status_code == 400
+    assert client.post('/api/hydra/detect', data='not json').status_code == 400
+
+    monte_carlo = client.get('/api/hydra/monte-carlo?rounds=250000&seed=9').get_json()['monte_carlo']
+    assert monte_carlo['rounds'] == 250000 and monte_carlo['seed'] == 9 and monte_carlo['blocks'] == 3
+    assert monte_carlo['detection_rate'] == run_monte_carlo(250000, seed=9)[0].summary()['detection_rate']
+    unseeded = client.get('/api/hydra/monte-carlo?rounds=1000').get_json()['monte_carlo']
+    assert client.get(f"/api/hydra/monte-carlo?rounds=1000&seed={unseeded['seed']}").get_json()[
+        'monte_carlo']['total_detected'] == unseeded['total_detected']
+    assert client.get('/api/hydra/monte-carlo?seed=-1').status_code == 400
+    assert client.get(f'/api/hydra/monte-carlo?rounds={MAX_SYNC_MONTE_CARLO_ROUNDS + 1}').status_code == 400
+
+
+def test_monte_carlo_jobs(client, monkeypatch):
+    """Runs past the synchronous cap are queued; the job polls through to the same statistics"""
+    monkeypatch.setattr('api.hydra_api.MAX_SYNC_MONTE_CARLO_ROUNDS', 100000)
+    assert client.get('/api/hydra/monte-carlo?rounds=250000').status_code == 400
+
+    response = client.post('/api/hydra/monte-carlo/jobs?rounds=250000&seed=9')
+    assert response.status_code == 202
+    job_id = response.get_json()['job']['job_id']
+    assert response.headers['Location'] == f'/api/hydra/monte-carlo/jobs/{job_id}'
+    deadline = time.time() + 60
+    while True:
+        job = client.get(f'/api/hydra/monte-carlo/jobs/{job_id}').get_json()['job']
+        if job['status'] in ('completed', 'failed') or time.time() > deadline:
+            break
+        time.sleep(0.1)
+    assert job['status'] == 'completed' and job['kind'] == 'monte_carlo'
+    result = job['result']
+    assert result['seed'] == 9 and result['blocks'] == 3 and result['workers'] == 1
+    assert result['detection_rate'] == run_monte_carlo(250000, seed=9)[0].summary()['detection_rate']
+    cancelled = client.delete(f'/api/hydra/monte-carlo/jobs/{job_id}').get_json()['job']
+    assert cancelled['status'] == 'completed' and 'result' not in cancelled
+
+    assert client.post(f'/api/hydra/monte-carlo/jobs?rounds={MAX_MONTE_CARLO_ROUNDS + 1}').status_code == 400
+    assert client.post('/api/hydra/monte-carlo/jobs?seed=x').status_code == 400
+    assert client.get('/api/hydra/monte-carlo/jobs/unknown').status_code == 404
+    assert client.delete('/api/hydra/monte-carlo/jobs/unknown').status_code == 404
+    sar_job = client.post('/api/autosar/jobs', json={'pattern': {'scenario': 'crypto_sanctions'}}).get_json()['job']
+    assert client.get(f"/api/hydra/monte-carlo/jobs/{sar_job['job_id']}").status_code == 404
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Streaming ingest tests - chunked NDJSON/CSV loading with dedupe
+"""
+
+import io
+import json
+import os
+import sqlite3
+import tempfile
+
+import pytest
+
+from data.ingest import MAX_BATCH_SIZE, MAX_COMMIT_EVERY, TransactionIngestor, ingest_stream
+from data.migrations import apply_migrations
+from data.enrichment import ENRICHMENT_COLUMNS, enrichment_row
+
+
+def _migrated_connection():
+    conn = sqlite3.connect(os.path.join(tempfile.mkdtemp(), 'ingest_test.db'))
+    apply_migrations(conn)
+    return conn
+
+
+def test_ndjson_ingest_dedupes_and_rejects():
+    """Duplicates are skipped, bad lines are rejected, and epochs are stored"""
+    lines = [
+        json.dumps({'transaction_id': f'IN_{i:04d}', 'from_account': 'A', 'to_account': 'B',
+                    'amount': 100 + i, 'timestamp': '2025-06-01T12:00:00'})
+        for i in range(25)
+    ]
+    lines.append(lines[0])
+    lines.append('{not json')
+    conn = _migrated_connection()
+
+    stats = ingest_stream(conn, io.StringIO('\n'.join(lines)), 'ndjson', batch_size=10, commit_every=10)
+
+    assert stats['rows_received'] == 27
+    assert stats['rows_inserted'] == 25
+    assert stats['duplicates'] == 1
+    assert stats['rejected'] == 1
+    assert stats['batches'] == 3
+    assert conn.execute('SELECT COUNT(*) FROM transactions WHERE ts_epoch IS NULL').fetchone()[0] == 0
+    conn.close()
+
+
+def test_csv_ingest():
+    """CSV rows with a header load like NDJSON records"""
+    body = (
+        'transaction_id,from_account,to_account,amount,timestamp,scenario\n'
+        'CSV_1,A,B,10.5,2025-06-01T12:00:00,feed\n'
+        'CSV_2,B,C,,2025-06-01T13:00:00,feed\n'
+    )
+    conn = _migrated_connection()
+
+    stats = ingest_stream(conn, io.StringIO(body), 'csv')
+
+    assert stats['rows_inserted'] == 1
+    assert stats['rejected'] == 1
+    assert conn.execute("SELECT scenario FROM transactions").fetchone()[0] == 'feed'
+    conn.close()
+
+
+def test_ingest_stores_deterministic_enrichment():
+    """Each ingested transaction gets one enrichment row derived from its id"""
+    body = '\n'.join(
+        json.dumps({'transaction_id': f'EN_{i}', 'amount': 5, 'timestamp': '2025-06-01T12:00:00'})
+        for i in range(3)
+    )
+    conn = _migrated_connection()
+
+    ingest_stream(conn, io.StringIO(body), 'ndjson')
+
+    columns = ', '.join(ENRICHMENT_COLUMNS)
+    stored = conn.execute(
+        f"SELECT {columns} FROM transaction_enrichment WHERE transaction_id = 'EN_1'"
+    ).fetchone()
+    assert stored == enrichment_row('EN_1') == enrichment_row('EN_1')
+    assert conn.execute('SELECT COUNT(*) FROM transaction_enrichment').fetchone()[0] == 3
+    conn.close()
+
+
+def test_batch_sizes_are_clamped():
+    """Oversized batch_size/commit_every are capped so one batch never holds an unbounded number of rows"""
+    conn = _migrated_connection()
+    ingestor = TransactionIngestor(conn, batch_size=100000000, commit_every=10 ** 12)
+    assert ingestor.batch_size == MAX_BATCH_SIZE and ingestor.commit_every == MAX_COMMIT_EVERY
+    ingestor = TransactionIngestor(conn, batch_size=0, commit_every=1)
+    assert ingestor.batch_size == 1 and ingestor.commit_every == 1
+
+    lines = '\n'.join(json.dumps({'transaction_id': f'CL_{i}', 'amount': 1, 'timestamp': '2025-06-01T12:00:00'})
+                      for i in range(30))
+    stats = ingest_stream(conn, io.StringIO(lines), 'ndjson', batch_size=100000000)
+    assert stats['rows_inserted'] == 30 and stats['batches'] == 1
+    conn.close()
+
+
+def test_ingest_endpoint_rejects_bad_sizes(client):
+    """Non-integer batch_size or commit_every is a 400, not a 500"""
+    body = json.dumps({'transaction_id': 'EP_1', 'amount': 1, 'timestamp': '2025-06-01T12:00:00'})
+    for query in ('batch_size=abc', 'commit_every=1e6', 'batch_size='):
+        response = client.post(f'/api/ingest?{query}', data=body, content_type='application/x-ndjson')
+        assert response.status_code == 400, query
+        assert response.get_json()['status'] == 'error'
+
+    response = client.post('/api/ingest?batch_size=100000000', data=body, content_type='application/x-ndjson')
+    assert response.status_code == 200 and response.get_json()['ingest']['rows_inserted'] == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
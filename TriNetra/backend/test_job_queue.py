@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Job queue tests - process-pool jobs, queue depth, cancellation and result TTL
+"""
+
+import io
+import json
+import threading
+import time
+
+import pytest
+
+from utils.job_queue import JobQueue, QueueFullError
+
+
+def _wait(queue, job_id, timeout=60):
+    """Poll until the job reaches a final state"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.get(job_id)
+        if job is None or job.done:
+            return job
+        time.sleep(0.05)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def test_jobs_complete_fail_and_expire():
+    """Results and errors are recorded, then dropped after the TTL"""
+    queue = JobQueue(max_workers=1, max_pending=4, result_ttl=0.5)
+    try:
+        ok = queue.submit(pow, 2, 10)
+        bad = queue.submit(int, 'not a number')
+
+        assert _wait(queue, ok.id).to_dict()['result'] == 1024
+        failed = _wait(queue, bad.id).to_dict()
+        assert failed['status'] == 'failed' and failed['error'].startswith('ValueError')
+
+        time.sleep(0.6)
+        assert queue.get(ok.id) is None
+        stats = queue.stats()
+        assert stats['completed'] == 1 and stats['failed'] == 1 and stats['expired'] == 2
+    finally:
+        queue.shutdown()
+
+
+def test_queue_depth_limit_and_cancellation():
+    """Submissions beyond max_pending are rejected; queued jobs can be cancelled"""
+    queue = JobQueue(max_workers=1, max_pending=3, result_ttl=60)
+    try:
+        slow = queue.submit(time.sleep, 1.0)
+        queue.submit(time.sleep, 0)
+        waiting = queue.submit(time.sleep, 0)
+        try:
+            queue.submit(time.sleep, 0)
+            raise AssertionError('expected QueueFullError')
+        except QueueFullError:
+            pass
+
+        assert queue.cancel(waiting.id).status == 'cancelled'
+        assert queue.cancel('missing') is None
+        assert _wait(queue, slow.id).status == 'completed'
+        assert queue.stats()['rejected'] == 1
+    finally:
+        queue.shutdown()
+
+
+def test_imap_unordered_yields_every_task():
+    """Batch fan-out returns each task's index with its future, errors included"""
+    queue = JobQueue(max_workers=2, max_pending=1, result_ttl=60)
+    try:
+        results = {}
+        for index, future in queue.imap_unordered(pow, [(2, 3), (3, 2), (2, 'x')]):
+            results[index] = future.exception() or future.result()
+        assert results[0] == 8 and results[1] == 9
+        assert isinstance(results[2], TypeError)
+        assert queue.stats()['batch_tasks'] == 3
+    finally:
+        queue.shutdown()
+
+
+class _DepthRecordingQueue(JobQueue):
+    """Records the queue depth seen by every executor submission"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.depths = []
+
+    def _submit(self, fn, args):
+        self.depths.append(self._pending())
+        return super()._submit(fn, args)
+
+
+def test_imap_unordered_respects_max_pending():
+    """Fan-out tasks share the max_pending budget with jobs and are submitted a window at a time"""
+    queue = _DepthRecordingQueue(max_workers=2, max_pending=3, result_ttl=60)
+    try:
+        job = queue.submit(time.sleep, 0.3)
+        indexes = [index for index, _ in queue.imap_unordered(time.sleep, [(0.05,)] * 8)]
+        assert sorted(indexes) == list(range(8))
+        assert max(queue.depths) < 3
+        assert _wait(queue, job.id).status == 'completed'
+        assert queue.stats()['pending'] == 0 and queue.stats()['batch_tasks'] == 8
+
+        # While a fan-out holds every slot, new jobs are rejected
+        fan_out = threading.Thread(target=lambda: list(queue.imap_unordered(time.sleep, [(0.5,)] * 4, window=3)))
+        fan_out.start()
+        time.sleep(0.2)
+        try:
+            with pytest.raises(QueueFullError):
+                queue.submit(time.sleep, 0)
+        finally:
+            fan_out.join()
+        assert _wait(queue, queue.submit(time.sleep, 0).id).status == 'completed'
+    finally:
+        queue.shutdown()
+
+
+def test_imap_unordered_close_releases_slots():
+    """Closing a fan-out early cancels its queued tasks and gives their slots back"""
+    queue = JobQueue(max_workers=1, max_pending=4, result_ttl=60)
+    try:
+        fan_out = queue.imap_unordered(time.sleep, [(0.1,)] * 10, window=4)
+        next(fan_out)
+        fan_out.close()
+        deadline = time.time() + 10
+        while queue.stats()['pending'] and time.time() < deadline:
+            time.sleep(0.05)
+        assert queue.stats()['pending'] == 0
+        assert queue.stats()['batch_tasks'] < 10
+    finally:
+        queue.shutdown()
+
+
+def test_sar_job_endpoint(app):
+    """POST /jobs returns 202 and the job id polls through to a SAR payload"""
+    client = app.test_client()
+    response = client.post('/api/autosar/jobs', json={'pattern': {'scenario': 'crypto_sanctions'}})
+    assert response.status_code == 202
+    job_id = response.get_json()['job']['job_id']
+    assert response.headers['Location'].endswith(job_id)
+
+    _wait(app.extensions['job_queue'], job_id)
+    job = client.get(f'/api/autosar/jobs/{job_id}').get_json()['job']
+    assert job['status'] == 'completed', job
+    assert job['result']['transaction_count'] == 0
+    assert 'sar_report' in job['result']
+
+    assert client.get('/api/autosar/jobs/unknown').status_code == 404
+    assert client.post('/api/autosar/jobs', json={'transaction_limit': 'x'}).status_code == 400
+
+
+def test_sar_batch_endpoint(app):
+    """One batch call streams an NDJSON report per scenario/account group, then a summary"""
+    from data.ingest import ingest_stream
+
+    lines = [
+        json.dumps({'transaction_id': f'BT_{i:03d}', 'from_account': f'ACC_{i % 4}', 'to_account': 'ACC_HUB',
+                    'amount': 1000 + i, 'timestamp': f'2025-06-01T{i % 24:02d}:00:00',
+                    'suspicious_score': 0.9, 'scenario': 'smurfing' if i % 2 else 'crypto_sanctions'})
+        for i in range(40)
+    ]
+    with app.extensions['db_pool'].connection() as conn:
+        ingest_stream(conn, io.StringIO('\n'.join(lines)), 'ndjson')
+
+    client = app.test_client()
+    response = client.post('/api/autosar/generate/batch', json={
+        'scenarios': ['smurfing', 'crypto_sanctions', 'terrorist_financing'],
+        'account_groups': [{'account_group': 'ring', 'accounts': ['ACC_1']}],
+        'transaction_limit': 5
+    })
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    records = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    summary = records.pop()
+    assert summary['status'] == 'complete' and summary['summary']['reports'] == 4
+    by_index = {r['index']: r for r in records}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert all(r['status'] == 'success' for r in records)
+    assert by_index[0]['transaction_count'] == 20 and len(by_index[0]['transactions']) == 5
+    assert by_index[1]['transaction_count'] == 20
+    assert by_index[2]['transaction_count'] == 0
+    assert by_index[3]['transaction_count'] == 10 and by_index[3]['pattern']['account_group'] == 'ring'
+
+    assert client.post('/api/autosar/generate/batch', json={'transaction_limit': 5}).status_code == 400
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+Location mapping tests - single-pass grouped aggregation, heatmap tiles and flow pairs for SAR maps
+"""
+
+import io
+import json
+import sqlite3
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from api.autosar_api import (
+    location_points_frame, aggregate_location_points, summarize_location_clusters, analyze_cross_border_flows
+)
+from models.flow_matrix import FlowMatrix
+from data.migrations import apply_migrations
+from data.ingest import ingest_stream
+from data.enrichment import COUNTRY_RISK_LEVELS
+from data.flows import query_flow_matrix
+from data.geo import gazetteer
+from data.heatmap import HEATMAP_ZOOM_LEVELS, query_heatmap_cells
+
+CITIES = [
+    ('Mumbai', 'Maharashtra', 'India', 19.076, 72.8777),
+    ('Pune', 'Maharashtra', 'India', 18.5204, 73.8567),
+    ('Karachi', 'Sindh', 'Pakistan', 24.8607, 67.0011),
+    ('Dubai', 'Dubai', 'UAE', 25.2048, 55.2708)
+]
+
+
+def _frame(count, seed=0):
+    """Enrichment-joined transaction rows spread over CITIES"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(CITIES), count)
+    city, state, country, lat, lng = (np.array(column, dtype=object)[picks] for column in zip(*CITIES))
+    return pd.DataFrame({
+        'transaction_id': [f'L{i}' for i in range(count)],
+        'amount': rng.uniform(100, 50000, count),
+        'suspicious_score': rng.uniform(0, 1, count),
+        'timestamp': ['2025-06-01T12:00:00'] * count,
+        'loc_city': city,
+        'loc_state': state,
+        'loc_country': country,
+        'loc_lat': lat.astype(float) + rng.uniform(-0.2, 0.2, count),
+        'loc_lng': lng.astype(float)
+    })
+
+
+def _ingest(conn, count, start=0, scenario='crypto_sanctions'):
+    lines = [
+        json.dumps({'transaction_id': f'HM_{i:05d}', 'from_account': 'A', 'to_account': 'B', 'amount': 100.0,
+                    'timestamp': '2025-06-01T12:00:00', 'suspicious_score': 0.5, 'scenario': scenario})
+        for i in range(start, start + count)
+    ]
+    ingest_stream(conn, io.StringIO('\n'.join(lines)), 'ndjson')
+
+
+def _stored_points(conn):
+    """(lat, lng, country, suspicious_score) for every stored transaction"""
+    return conn.execute('''
+        SELECT e.loc_lat, e.loc_lng, e.loc_country, t.suspicious_score FROM transactions t
+        JOIN transaction_enrichment e ON e.transaction_id = t.transaction_id
+    ''').fetchall()
+
+
+def test_rollups_match_per_point_totals():
+    """Cluster and country roll-ups agree with direct per-point sums"""
+    points = location_points_frame(_frame(500))
+    groups = aggregate_location_points(points)
+
+    clusters = summarize_location_clusters(groups)
+    mumbai = points[points['cluster_id'] == 'Mumbai_Maharashtra']
+    assert clusters['Mumbai_Maharashtra']['location'] == 'Mumbai, Maharashtra'
+    assert clusters['Mumbai_Maharashtra']['transaction_count'] == len(mumbai)
+    assert abs(clusters['Mumbai_Maharashtra']['avg_suspicion'] - mumbai['suspicious_score'].mean()) < 1e-9
+    assert clusters['Karachi_Sindh']['risk_level'] == 3
+
+    flows = analyze_cross_border_flows(groups, FlowMatrix())
+    by_country = {c['country']: c for c in flows['country_summary']}
+    assert sum(c['transaction_count'] for c in by_country.values()) == 500
+    assert abs(by_country['UAE']['total_amount'] - points.loc[points['country'] == 'UAE', 'amount'].sum()) < 1e-6
+    assert [c['country'] for c in flows['high_risk_countries']] == ['Pakistan']
+
+
+def test_million_point_aggregation():
+    """Benchmark: one grouped pass plus roll-ups over 1M points"""
+    points = location_points_frame(_frame(1000000, seed=1))
+
+    started = time.time()
+    groups = aggregate_location_points(points)
+    summarize_location_clusters(groups)
+    analyze_cross_border_flows(groups, FlowMatrix())
+    elapsed = time.time() - started
+
+    print(f"\n📊 location aggregation: 1,000,000 points in {elapsed:.3f}s ({1000000 / elapsed:,.0f} points/sec)")
+    assert groups['transaction_count'].sum() == 1000000
+    assert elapsed < 10
+
+
+def _scanned_flows(conn, scenario=None):
+    """Flows built per transaction from the stored rows, resolving endpoints by nearest gazetteer city"""
+    df = pd.read_sql_query('''
+        SELECT t.amount, t.suspicious_score, e.* FROM transactions t
+        JOIN transaction_enrichment e ON e.transaction_id = t.transaction_id
+        WHERE ? IS NULL OR t.scenario = ?
+    ''', conn, params=[scenario, scenario])
+    cities = gazetteer()
+    endpoints = {}
+    for side, lng_column in (('from', 'from_lon'), ('to', 'to_lon')):
+        index, _ = cities.nearest(df[f'{side}_lat'], df[lng_column])
+        endpoints[f'{side}_country'] = cities.countries[index]
+        endpoints[f'{side}_state'] = cities.states[index]
+        endpoints[f'{side}_city'] = df[f'{side}_city'].to_numpy(dtype=object)
+    abroad = df['loc_country'].to_numpy(dtype=object) != endpoints['to_country']
+    for part in ('country', 'state', 'city'):
+        endpoints[f'to_{part}'] = np.where(abroad, df[f'loc_{part}'].to_numpy(dtype=object), endpoints[f'to_{part}'])
+    return FlowMatrix(COUNTRY_RISK_LEVELS).add(pd.DataFrame(endpoints), df['amount'], df['suspicious_score'])
+
+
+def _corridor_set(flows, level):
+    """Every corridor at a level, rounded and sorted so ranking ties cannot reorder them"""
+    return sorted(
+        tuple(round(v, 6) if isinstance(v, float) else v for v in corridor.values())
+        for corridor in flows.corridors(level, limit=None)
+    )
+
+
+def test_flow_pairs_follow_writes(tmp_path):
+    """Stored flow pairs match a scan of the transactions through ingest, updates and deletes"""
+    conn = sqlite3.connect(str(tmp_path / 'flows_test.db'))
+    apply_migrations(conn)
+    _ingest(conn, 300)
+    _ingest(conn, 200, start=300, scenario='smurfing')
+
+    def check():
+        for scenario in (None, 'smurfing'):
+            stored = query_flow_matrix(conn, scenario or 'all', COUNTRY_RISK_LEVELS)
+            scanned = _scanned_flows(conn, scenario)
+            assert stored.transaction_count == scanned.transaction_count
+            for level in ('country', 'city'):
+                assert _corridor_set(stored, level) == _corridor_set(scanned, level)
+
+    check()
+    flows = query_flow_matrix(conn, 'all', COUNTRY_RISK_LEVELS)
+    assert flows.transaction_count == 500
+    assert flows.corridors('country', cross_border=True)
+
+    conn.execute("UPDATE transactions SET suspicious_score = 1.0, amount = 250 WHERE scenario = 'smurfing'")
+    conn.execute("UPDATE transactions SET scenario = 'smurfing' WHERE transaction_id < 'HM_00050'")
+    conn.execute("DELETE FROM transactions WHERE transaction_id >= 'HM_00450'")
+    conn.commit()
+    check()
+    assert query_flow_matrix(conn, 'smurfing').transaction_count == 200
+    conn.close()
+
+
+def test_heatmap_tiles_follow_writes(tmp_path):
+    """Tiles are updated by ingest, score updates and deletes, at every zoom level"""
+    conn = sqlite3.connect(str(tmp_path / 'heatmap_test.db'))
+    apply_migrations(conn)
+    _ingest(conn, 300)
+    _ingest(conn, 200, start=300, scenario='smurfing')
+
+    for zoom in HEATMAP_ZOOM_LEVELS:
+        cells = query_heatmap_cells(conn, zoom)
+        assert sum(c['transaction_count'] for c in cells) == 500
+        assert abs(sum(c['total_amount'] for c in cells) - 50000.0) < 1e-6
+    assert sum(c['transaction_count'] for c in query_heatmap_cells(conn, 2, scenario='smurfing')) == 200
+
+    # Bounding box around India at 0.1 degree cells
+    india = query_heatmap_cells(conn, 2, bbox=(5, 68, 35, 90))
+    expected = [p for p in _stored_points(conn) if 5 <= p[0] <= 35 and 68 <= p[1] <= 90]
+    assert sum(c['transaction_count'] for c in india) == len(expected)
+    assert all(5 <= c['lat'] <= 35 and 68 <= c['lng'] <= 90 for c in india)
+
+    # Score updates and deletes move the tiles with the rows
+    conn.execute("UPDATE transactions SET suspicious_score = 1.0 WHERE scenario = 'smurfing'")
+    conn.execute("DELETE FROM transactions WHERE transaction_id < 'HM_00100'")
+    conn.commit()
+    cells = query_heatmap_cells(conn, 1)
+    assert sum(c['transaction_count'] for c in cells) == 400
+    levels = {'Pakistan': 3, 'UAE': 2}
+    weighted = sum(score * levels.get(country, 1) for _, _, country, score in _stored_points(conn))
+    assert abs(sum(c['risk_score'] for c in cells) - weighted) < 1e-6
+
+    # A box crossing the antimeridian: Singapore (103.8) and New York (-74) but not India
+    wrapped = query_heatmap_cells(conn, 0, bbox=(-90, 100, 90, -60))
+    assert wrapped and {c['lng'] for c in wrapped} <= {105.0, -75.0}
+    conn.close()
+
+
+def test_location_mapping_endpoint(app):
+    """The endpoint returns clusters with real suspicion averages and tile heatmaps"""
+    from data.synthetic_generator import TriNetraDataGenerator
+
+    TriNetraDataGenerator(app.config['DATABASE_PATH']).populate_database()
+    client = app.test_client()
+    response = client.post('/api/autosar/location-mapping', json={'scenario': 'crypto_sanctions'})
+    mapping = response.get_json()['location_mapping']
+
+    assert mapping['summary']['total_locations'] == 100
+    assert all(cluster['avg_suspicion'] > 0 for cluster in mapping['clusters'].values())
+    assert sum(c['transaction_count'] for c in mapping['clusters'].values()) == 100
+    # The heatmap comes from the tiles, so it covers all 150 crypto_sanctions rows
+    assert sum(c['transaction_count'] for c in mapping['risk_heatmap']) == 150
+    assert mapping['heatmap_zoom'] == 2
+    # Corridors come from every transaction's real endpoints
+    flows = mapping['cross_border_flows']
+    assert flows['flow_transaction_count'] == 150
+    assert sum(c['transaction_count'] for c in flows['top_corridors']['by_volume']) <= 150
+    assert all(c['from_country'] != c['to_country'] for c in flows['cross_border_flows'])
+    by_risk = [c['risk_score'] for c in flows['top_corridors']['by_risk']]
+    assert by_risk == sorted(by_risk, reverse=True)
+
+    coarse = client.post('/api/autosar/location-mapping',
+                         json={'scenario': 'crypto_sanctions', 'zoom': 0, 'bbox': [0, 60, 40, 100]})
+    assert all(c['cell_size'] == 10 for c in coarse.get_json()['location_mapping']['risk_heatmap'])
+    bad = client.post('/api/autosar/location-mapping', json={'scenario': 'crypto_sanctions', 'zoom': 9})
+    assert bad.status_code == 400
+    assert client.post('/api/autosar/location-mapping', json=['crypto_sanctions']).status_code == 400
+
+
+def test_location_mapping_defaults_to_all_scenarios(app):
+    """Without a body (or with scenario 'all') points, heatmap and flows cover every scenario"""
+    from data.synthetic_generator import TriNetraDataGenerator
+
+    TriNetraDataGenerator(app.config['DATABASE_PATH']).populate_database()
+    with sqlite3.connect(app.config['DATABASE_PATH']) as conn:
+        total, scenarios = conn.execute('SELECT COUNT(*), COUNT(DISTINCT scenario) FROM transactions').fetchone()
+    assert scenarios > 1
+
+    client = app.test_client()
+    response = client.post('/api/autosar/location-mapping')
+    assert response.status_code == 200
+    mapping = response.get_json()['location_mapping']
+    assert mapping['summary']['total_locations'] == 100
+    assert sum(c['transaction_count'] for c in mapping['risk_heatmap']) == total
+    assert mapping['cross_border_flows']['flow_transaction_count'] == total
+    explicit = client.post('/api/autosar/location-mapping', json={'scenario': 'all'}).get_json()['location_mapping']
+    assert explicit['cross_border_flows'] == mapping['cross_border_flows']
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
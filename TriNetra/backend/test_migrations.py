@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Schema migration tests - versioning, legacy upgrade and index usage
+"""
+
+import os
+import sqlite3
+import tempfile
+
+from data.migrations import (
+    MIGRATIONS, apply_migrations, get_schema_version, check_query_plans, assert_query_plans
+)
+from data.synthetic_generator import TriNetraDataGenerator
+from utils.time_utils import to_epoch
+
+
+def _temp_db_path():
+    return os.path.join(tempfile.mkdtemp(), 'migrations_test.db')
+
+
+def test_migrations_are_versioned_and_idempotent():
+    """A fresh database reaches the latest version once, and reapplying is a no-op"""
+    conn = sqlite3.connect(_temp_db_path())
+    applied = apply_migrations(conn)
+    assert applied == [version for version, _, _ in MIGRATIONS]
+    assert get_schema_version(conn) == MIGRATIONS[-1][0]
+    assert apply_migrations(conn) == []
+    conn.close()
+
+
+def test_legacy_to_sql_table_is_rebuilt():
+    """A table written by DataFrame.to_sql gets the real schema and keeps its rows"""
+    conn = sqlite3.connect(_temp_db_path())
+    conn.execute('''
+        CREATE TABLE transactions (
+            transaction_id TEXT, from_account TEXT, to_account TEXT, amount REAL,
+            timestamp TEXT, transaction_type TEXT, suspicious_score REAL,
+            pattern_type TEXT, scenario TEXT
+        )
+    ''')
+    conn.execute(
+        "INSERT INTO transactions VALUES ('TF_0001', 'DONOR_001', 'TERROR_CELL_001', 250.0, "
+        "'2025-01-01T10:00:00', 'transfer', 0.8, 'micro_donations', 'terrorist_financing')"
+    )
+    conn.commit()
+
+    apply_migrations(conn)
+
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(transactions)')]
+    assert 'id' in columns
+    assert conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0] == 1
+    conn.close()
+
+
+def test_epoch_column_tracks_timestamp():
+    """ts_epoch is filled on insert and follows timestamp updates"""
+    conn = sqlite3.connect(_temp_db_path())
+    apply_migrations(conn)
+    conn.execute(
+        "INSERT INTO transactions (transaction_id, timestamp) VALUES ('TX_1', '2025-01-01T00:00:00.250000')"
+    )
+    assert conn.execute("SELECT ts_epoch FROM transactions").fetchone()[0] == to_epoch('2025-01-01T00:00:00')
+
+    conn.execute("UPDATE transactions SET timestamp = '2025-01-02T01:00:00' WHERE transaction_id = 'TX_1'")
+    assert conn.execute("SELECT ts_epoch FROM transactions").fetchone()[0] == to_epoch('2025-01-02T01:00:00')
+    conn.close()
+
+
+def test_search_index_follows_writes():
+    """The trigram index sees inserts, updates and deletes"""
+    conn = sqlite3.connect(_temp_db_path())
+    apply_migrations(conn)
+    match = "SELECT COUNT(*) FROM transactions_fts WHERE transactions_fts MATCH ?"
+
+    conn.execute("INSERT INTO transactions (transaction_id, from_account) VALUES ('TX_1', 'SHELL_ALPHA')")
+    assert conn.execute(match, ['"hell_al"']).fetchone()[0] == 1
+
+    conn.execute("UPDATE transactions SET from_account = 'WALLET_BETA' WHERE transaction_id = 'TX_1'")
+    assert conn.execute(match, ['"hell_al"']).fetchone()[0] == 0
+    assert conn.execute(match, ['"let_be"']).fetchone()[0] == 1
+
+    conn.execute("DELETE FROM transactions")
+    assert conn.execute(match, ['"let_be"']).fetchone()[0] == 0
+    conn.close()
+
+
+def test_hot_queries_use_indexes_after_bulk_load():
+    """Timeline, search and SAR queries are index seeks even after populate_database"""
+    db_path = _temp_db_path()
+    generator = TriNetraDataGenerator(db_path)
+    generator.create_tables()
+    generator.populate_database()
+
+    conn = sqlite3.connect(db_path)
+    assert_query_plans(conn)
+    for name, result in check_query_plans(conn).items():
+        assert 'SCAN transactions' not in result['plan'], name
+    conn.close()
+
+
+def test_repopulating_keeps_derived_tables_in_sync():
+    """Search index, enrichment, heatmap tiles and flow pairs match transactions after a second populate"""
+    db_path = _temp_db_path()
+    generator = TriNetraDataGenerator(db_path)
+    generator.create_tables()
+    generator.populate_database()
+    generator.populate_database()
+
+    conn = sqlite3.connect(db_path)
+    transactions = conn.execute('SELECT COUNT(*) FROM transactions').fetchone()[0]
+    assert conn.execute('SELECT COUNT(*) FROM transactions_fts').fetchone()[0] == transactions
+    assert conn.execute('SELECT COUNT(*) FROM transaction_enrichment').fetchone()[0] == transactions
+    assert conn.execute('SELECT SUM(transaction_count) FROM heatmap_cells WHERE zoom = 0').fetchone()[0] == transactions
+    assert conn.execute('SELECT SUM(transaction_count) FROM flow_pairs').fetchone()[0] == transactions
+    conn.close()
+
+
+def test_flow_pairs_backfilled_on_upgrade():
+    """Upgrading a populated version 8 database resolves stored endpoints and fills the flow pairs"""
+    from data.enrichment import ENRICHMENT_COLUMNS, enrichment_row
+
+    conn = sqlite3.connect(_temp_db_path())
+    apply_migrations(conn, target_version=8)
+    conn.executemany(
+        "INSERT INTO transactions (transaction_id, amount, suspicious_score, scenario, timestamp) "
+        "VALUES (?, 10.0, 0.5, 'smurfing', '2025-01-01T00:00:00')",
+        [(f'UP_{i}',) for i in range(50)]
+    )
+    conn.execute("INSERT INTO transactions (transaction_id, amount, scenario) VALUES ('UP_NOLOC', 5.0, 'smurfing')")
+    columns = ENRICHMENT_COLUMNS[:-4]
+    conn.executemany(
+        f"INSERT INTO transaction_enrichment (transaction_id, {', '.join(columns)}) "
+        f"VALUES (?, {', '.join('?' for _ in columns)})",
+        [(f'UP_{i}',) + enrichment_row(f'UP_{i}')[:-4] for i in range(50)] + [('UP_NOLOC',) + (None,) * len(columns)]
+    )
+    conn.commit()
+
+    assert apply_migrations(conn) == [9, 10]
+    stored = conn.execute(f"SELECT {', '.join(ENRICHMENT_COLUMNS)} FROM transaction_enrichment "
+                          "WHERE transaction_id LIKE 'UP/_%' ESCAPE '/' AND transaction_id != 'UP_NOLOC' "
+                          "ORDER BY CAST(SUBSTR(transaction_id, 4) AS INTEGER)").fetchall()
+    assert stored == [enrichment_row(f'UP_{i}') for i in range(50)]
+    assert conn.execute("SELECT from_country, to_state FROM transaction_enrichment "
+                        "WHERE transaction_id = 'UP_NOLOC'").fetchone() == ('', '')
+    assert conn.execute('SELECT SUM(transaction_count), SUM(total_amount) FROM flow_pairs').fetchone() == (51, 505.0)
+    conn.close()
+
+
+def test_pattern_counts_widened_on_upgrade():
+    """Library rows saved with one-byte transaction counts load back unchanged after the upgrade"""
+    import numpy as np
+    from data.pattern_library import load_patterns
+
+    conn = sqlite3.connect(_temp_db_path())
+    apply_migrations(conn, target_version=9)
+    counts = np.array([10, 30, 255], dtype=np.uint8)
+    conn.execute(
+        "INSERT INTO hydra_pattern_library (first_pattern, pattern_count, transaction_count, created_at, "
+        "type_codes, complexity, transaction_counts, amounts) VALUES (1, 3, 295, '2025-01-01', ?, ?, ?, ?)",
+        (np.array([0, 1, 2], dtype=np.uint8).tobytes(), np.full(3, 0.7).tobytes(), counts.tobytes(),
+         np.arange(295, dtype=np.float64).tobytes())
+    )
+    conn.commit()
+
+    assert apply_migrations(conn) == [10]
+    _, batch, _ = load_patterns(conn)
+    assert batch.transaction_counts.tolist() == [10, 30, 255]
+    assert np.array_equal(batch.amounts, np.arange(295))
+    conn.close()
+
+
+def test_migrations_do_not_call_application_code():
+    """Applied migrations are frozen copies, not imports of modules that keep changing"""
+    import data.migrations as migrations
+    for module in ('data.enrichment', 'data.heatmap', 'data.pattern_library'):
+        assert not any(getattr(value, '__module__', None) == module for value in vars(migrations).values())
+    for _, _, steps in MIGRATIONS:
+        assert all(isinstance(step, str) or step.__module__ == 'data.migrations' for step in steps)
+
+
+if __name__ == "__main__":
+    test_migrations_are_versioned_and_idempotent()
+    test_legacy_to_sql_table_is_rebuilt()
+    test_epoch_column_tracks_timestamp()
+    test_search_index_follows_writes()
+    test_hot_queries_use_indexes_after_bulk_load()
+    test_repopulating_keeps_derived_tables_in_sync()
+    test_flow_pairs_backfilled_on_upgrade()
+    test_pattern_counts_widened_on_upgrade()
+    test_migrations_do_not_call_application_code()
+    print("✅ Migration tests passed")
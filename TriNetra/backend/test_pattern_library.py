@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Pattern library tests - columnar storage, unique ids and batch replay against the detector
+"""
+
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+import data.pattern_library as pattern_library
+from data.migrations import apply_migrations
+from data.pattern_library import save_patterns, load_patterns, get_pattern, library_stats, pattern_id, pattern_number
+from models.hydra_engine import PatternBatch, generate_patterns, detect_patterns, score_features
+
+
+def _library():
+    conn = sqlite3.connect(':memory:')
+    apply_migrations(conn)
+    return conn
+
+
+def test_round_trip_and_unique_ids():
+    """Saved batches get consecutive, never reused numbers and load back unchanged"""
+    conn = _library()
+    original_rows = pattern_library.LIBRARY_ROW_PATTERNS
+    pattern_library.LIBRARY_ROW_PATTERNS = 300
+    try:
+        first = generate_patterns(1000, np.random.default_rng(0))
+        second = generate_patterns(50, np.random.default_rng(1))
+        assert save_patterns(conn, first) == 1
+        assert save_patterns(conn, second) == 1001
+    finally:
+        pattern_library.LIBRARY_ROW_PATTERNS = original_rows
+
+    numbers, batch, _ = load_patterns(conn)
+    assert numbers.tolist() == list(range(1, 1051))
+    assert np.array_equal(batch.amounts, np.concatenate([first.amounts, second.amounts]))
+    assert np.array_equal(batch.type_codes[:1000], first.type_codes)
+
+    # A range straddling stored rows and saves
+    numbers, batch, _ = load_patterns(conn, 950, 80)
+    assert numbers.tolist() == list(range(950, 1030))
+    assert np.array_equal(batch.complexity[:51], first.complexity[949:])
+    assert np.array_equal(batch.transaction_counts[51:], second.transaction_counts[:29])
+
+    stored = get_pattern(conn, 1001)
+    assert stored == second.pattern(0, 'HYDRA_0000001001', stored['generated_at'])
+    assert get_pattern(conn, 2000) is None
+    stats = library_stats(conn)
+    assert stats['patterns'] == 1050 and stats['stored_rows'] == 5 and stats['last_pattern_id'] == pattern_id(1050)
+    assert pattern_number(pattern_id(42)) == 42
+    try:
+        pattern_number('GEN_123456')
+        assert False, 'expected ValueError'
+    except ValueError:
+        pass
+
+
+def test_large_transaction_counts_round_trip():
+    """Counts past one byte are stored intact; values that do not fit a column's dtype are refused"""
+    conn = _library()
+    counts = np.array([12, 300, 70000])
+    batch = PatternBatch(np.array([0, 1, 3]), np.full(3, 0.7), np.concatenate([[0], np.cumsum(counts)]),
+                         np.ones(counts.sum()))
+    first = save_patterns(conn, batch)
+    _, stored, _ = load_patterns(conn)
+    assert stored.transaction_counts.tolist() == [12, 300, 70000]
+    assert len(get_pattern(conn, first + 1)['transactions']) == 300
+
+    bad = PatternBatch(np.array([256]), np.full(1, 0.7), np.array([0, 1]), np.ones(1))
+    with pytest.raises(ValueError):
+        save_patterns(conn, bad)
+    assert library_stats(conn)['patterns'] == 3
+
+
+def test_replay_matches_pattern_detection():
+    """Scoring stored columns gives the same verdicts as scoring the pattern dicts"""
+    conn = _library()
+    save_patterns(conn, generate_patterns(400, np.random.default_rng(2)))
+    numbers, batch, _ = load_patterns(conn)
+    confidence, detected = score_features(batch.features())
+    expected = detect_patterns([batch.pattern(i, pattern_id(n)) for i, n in enumerate(numbers)])
+    assert detected.tolist() == [d['detected'] for d in expected]
+    assert np.allclose(confidence, [d['confidence'] for d in expected])
+
+
+def test_hundred_thousand_pattern_replay():
+    """Benchmark: 100k stored patterns loaded and re-scored in one batch"""
+    conn = _library()
+    save_patterns(conn, generate_patterns(100000, np.random.default_rng(3)))
+    from api.hydra_api import replay_library
+    started = time.time()
+    replay = replay_library(conn, 1, 100000)
+    elapsed = time.time() - started
+    print(f"\n📊 pattern replay: 100,000 patterns in {elapsed:.3f}s ({100000 / elapsed:,.0f} patterns/sec)")
+    assert replay['patterns'] == 100000 and replay['last_pattern_id'] == pattern_id(100000)
+    assert elapsed < 5
+
+
+def test_library_endpoints(client):
+    """Generated patterns are stored with unique ids and replayed by range"""
+    ids = [client.post('/api/hydra/generate').get_json()['pattern']['pattern_id'] for _ in range(3)]
+    assert ids == [pattern_id(1), pattern_id(2), pattern_id(3)]
+    stored = client.get(f'/api/hydra/library/{ids[1]}').get_json()['pattern']
+    assert stored['pattern_id'] == ids[1] and stored['transactions']
+
+    generated = client.post('/api/hydra/library?count=5000&seed=6').get_json()['generated']
+    assert generated['first_pattern_id'] == pattern_id(4) and generated['last_pattern_id'] == pattern_id(5003)
+    assert client.get('/api/hydra/library').get_json()['library']['patterns'] == 5003
+
+    replay = client.get(f'/api/hydra/library/replay?start={pattern_id(4)}&limit=5000&results_limit=5').get_json()['replay']
+    assert replay['patterns'] == 5000 and replay['first_pattern_id'] == pattern_id(4)
+    assert replay['total_detected'] == sum(p['detected'] for p in replay['by_pattern'].values())
+    assert len(replay['results']) == 5 and replay['results'][0]['pattern_id'] == pattern_id(4)
+    assert replay['results'][0]['detected'] == client.post('/api/hydra/detect', json=client.get(
+        f'/api/hydra/library/{pattern_id(4)}').get_json()['pattern']).get_json()['detection']['detected']
+    assert all(pattern_number(i) >= 4 for i in replay['missed'])
+
+    assert client.get('/api/hydra/library/replay?start=abc').status_code == 400
+    assert client.get('/api/hydra/library/replay?limit=0').status_code == 400
+    assert client.get(f'/api/hydra/library/{pattern_id(99999)}').status_code == 404
+    assert client.post('/api/hydra/library?count=0').status_code == 400
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Response cache tests - LRU byte budget, TTL, data versions and ETag/304
+"""
+
+import io
+import json
+import time
+
+import pytest
+
+from utils.response_cache import ResponseCache
+
+
+def test_lru_respects_byte_budget_and_versions():
+    """Least recently used entries are evicted and stale versions are dropped"""
+    cache = ResponseCache(max_bytes=25, ttl=60)
+    cache.put('a', b'x' * 10, 'application/json', 1)
+    cache.put('b', b'x' * 10, 'application/json', 1)
+    assert cache.get('a', 1) is not None
+    cache.put('c', b'x' * 10, 'application/json', 1)
+
+    assert cache.get('b', 1) is None
+    assert cache.get('a', 1) is not None
+    assert cache.get('c', 2) is None
+
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['invalidations'] == 1
+    assert stats['entries'] == 1
+    assert stats['bytes'] == 10
+
+
+def test_entries_expire_after_ttl():
+    """Entries older than the TTL count as misses"""
+    cache = ResponseCache(max_bytes=1024, ttl=0.01)
+    cache.put('a', b'{}', 'application/json', 0)
+    time.sleep(0.02)
+    assert cache.get('a', 0) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_endpoint_etag_304_and_ingest_invalidation(client):
+    """Repeat polls revalidate to 304 until ingest bumps the data version"""
+    first = client.get('/api/chronos/patterns')
+    etag = first.headers['ETag']
+    assert first.headers['X-Cache'] == 'MISS'
+
+    second = client.get('/api/chronos/patterns', headers={'If-None-Match': etag})
+    assert second.status_code == 304
+    assert second.headers['X-Cache'] == 'HIT'
+
+    feed = json.dumps({'transaction_id': 'C_1', 'amount': 1, 'timestamp': '2025-06-01T12:00:00'})
+    client.post('/api/ingest', data=io.BytesIO(feed.encode()), content_type='application/x-ndjson')
+
+    third = client.get('/api/chronos/patterns', headers={'If-None-Match': etag})
+    assert third.status_code == 200
+    assert third.headers['ETag'] != etag
+
+    stats = client.get('/api/health/cache').get_json()['cache']
+    assert stats['hits'] == 1
+    assert stats['invalidations'] == 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
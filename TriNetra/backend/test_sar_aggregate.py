@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+SARAggregate tests - chunked SAR statistics and bounded-memory sketches
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from models.transaction_batch import TransactionBatch
+from models.sar_aggregate import SARAggregate, QuantileSketch, DistinctSketch, hash_values
+from api.autosar_api import run_sar_generation, sar_generator
+
+
+def _frame(start, count):
+    """Joined transaction/enrichment rows, one every 10 minutes"""
+    ids = range(start, start + count)
+    return pd.DataFrame({
+        'transaction_id': [f'S{i}' for i in ids],
+        'amount': [1000.0 + (i * 37) % 9000 for i in ids],
+        'suspicious_score': [0.6 + (i % 4) * 0.1 for i in ids],
+        'from_account': [f'ACC_{i % 7}' for i in ids],
+        'to_account': [f'ACC_{(i * 3) % 11}' for i in ids],
+        'timestamp': [''] * count,
+        'ts_epoch': [1735689600 + i * 600 for i in ids],
+        'transaction_method': [['UPI', 'Hawala', 'NEFT'][i % 3] for i in ids],
+        'loc_city': [['Mumbai', 'Karachi'][i % 2] for i in ids],
+        'loc_state': [['Maharashtra', 'Karachi'][i % 2] for i in ids],
+        'loc_region': [['Western', 'South Asia'][i % 2] for i in ids],
+        'loc_country': [['India', 'Pakistan'][i % 2] for i in ids],
+        'loc_lat': [19.0] * count,
+        'loc_lng': [72.8] * count
+    })
+
+
+def test_chunked_report_matches_single_batch():
+    """Merging per-chunk aggregates gives the same report as one batch"""
+    pattern = {'scenario': 'terrorist_financing'}
+    whole = sar_generator.generate_sar_report_from_batches(pattern, [TransactionBatch.from_frame(_frame(0, 120))])
+    chunked = sar_generator.generate_sar_report_from_batches(
+        pattern, [TransactionBatch.from_frame(_frame(start, 25)) for start in range(0, 120, 25)][:4]
+        + [TransactionBatch.from_frame(_frame(100, 20))]
+    )
+
+    for section in ('details', 'ml_detection', 'evidence', 'location_analysis', 'quality_metrics'):
+        assert chunked[section] == whole[section], section
+    assert whole['details']['total_transactions'] == 120
+    assert len(whole['location_analysis']['high_risk_locations']) == 60
+
+
+def test_sketches_stay_accurate_past_exact_limit():
+    """Quantiles stay within the relative accuracy and distinct counts near exact"""
+    values = np.random.default_rng(7).lognormal(9, 1, 20000)
+    sketch = QuantileSketch(exact_limit=1000, relative_accuracy=0.01)
+    for chunk in np.array_split(values, 10):
+        part = QuantileSketch(exact_limit=1000, relative_accuracy=0.01)
+        part.add(chunk)
+        sketch.merge(part)
+
+    assert not sketch.is_exact and sketch.count == 20000
+    assert abs(sketch.median() - np.median(values)) <= 0.01 * np.median(values) * 1.01
+
+    distinct = DistinctSketch(exact_limit=1000)
+    distinct.add_hashes(hash_values([f'ACC_{i}' for i in range(50000)]))
+    assert abs(len(distinct) - 50000) < 50000 * 0.05
+
+    # Pair tracking and gaps carry across chunk boundaries
+    aggregate = SARAggregate(exact_limit=50)
+    for start in range(0, 400, 100):
+        aggregate.update(TransactionBatch.from_frame(_frame(start, 100)))
+    single = SARAggregate().update(TransactionBatch.from_frame(_frame(0, 400)))
+    assert aggregate.count == 400 and aggregate.gaps.count == 399
+    assert aggregate.rapid_count == single.rapid_count
+    assert aggregate.cycles.cycles() == single.cycles.cycles()
+    assert len(aggregate.accounts) == len(single.accounts) == 11
+
+
+def test_edge_cap_bounds_retained_state():
+    """Past max_edges, cycle edges and activity events stop growing; the counts still cover every row"""
+    aggregate = SARAggregate(max_edges=50)
+    for start in range(0, 400, 100):
+        aggregate.update(TransactionBatch.from_frame(_frame(start, 100)))
+    assert aggregate.count == 400
+    assert aggregate.cycles.edge_count == 50 and aggregate.cycles.truncated
+    assert aggregate.activity.event_count == 100 and aggregate.activity.truncated
+
+
+def test_null_amounts_count_as_zero(app):
+    """NULL amounts read from the database are 0 in every reduction, not NaN"""
+    frame = _frame(0, 10)
+    frame['amount'] = frame['amount'].astype(object)
+    frame.loc[[2, 5], 'amount'] = None
+    batch = TransactionBatch.from_frame(frame)
+    assert batch.amounts[[2, 5]].tolist() == [0.0, 0.0] and not np.isnan(batch.amounts).any()
+
+    with app.extensions['db_pool'].connection() as conn:
+        conn.executemany(
+            "INSERT INTO transactions (transaction_id, from_account, to_account, amount, timestamp, "
+            "suspicious_score, scenario) VALUES (?, 'A', 'B', ?, '2025-06-01T12:00:00', 0.9, 'null_amounts')",
+            [('NA_1', 5000.0), ('NA_2', None), ('NA_3', 2500.0)]
+        )
+        conn.commit()
+        payload = run_sar_generation(conn, {'scenario': 'null_amounts'})
+    assert payload['transaction_count'] == 3
+    # Serialising without NaN fails loudly if any reduction picked one up
+    json.dumps(payload['sar_report'], allow_nan=False, default=str)
+
+
+if __name__ == "__main__":
+    raise SystemExit(pytest.main([__file__, "-q"]))
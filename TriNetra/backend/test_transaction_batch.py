@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+TransactionBatch tests - single-scan feature columns for SAR analysis
+"""
+
+from models.transaction_batch import TransactionBatch
+from api.autosar_api import sar_generator
+
+
+TRANSACTIONS = [
+    {'transaction_id': 'B1', 'amount': 9500, 'timestamp': '2025-01-04T23:30:00', 'from_account': 'A',
+     'to_account': 'B', 'suspicious_score': 0.9, 'transaction_method': 'Cryptocurrency',
+     'aadhar_location': {'country': 'Pakistan'}},
+    {'transaction_id': 'B2', 'amount': 20000, 'timestamp': 'not a date', 'from_account': 'B', 'to_account': 'A'},
+    {'transaction_id': 'B3', 'amount': 3000, 'ts_epoch': 1736034000, 'timestamp': None,
+     'from_account': 'C', 'to_account': 'B', 'transaction_method': 'Hawala'},
+]
+
+
+def test_batch_columns():
+    """Amounts, epochs and categorical codes come from one pass over the dicts"""
+    batch = TransactionBatch(TRANSACTIONS)
+
+    assert batch.count == 3
+    assert batch.amounts.tolist() == [9500.0, 20000.0, 3000.0]
+    assert batch.suspicion.tolist() == [0.9, 0.0, 0.0]
+    # Unparseable timestamps are skipped; stored ts_epoch wins over parsing
+    assert batch.epochs.tolist() == [1736033400, 1736034000]
+    assert batch.accounts == ['A', 'B', 'C']
+    assert batch.category_counts('methods', 'method_codes') == {'Cryptocurrency': 1, '': 1, 'Hawala': 1}
+    assert batch.country_rows(['Pakistan']) == [0]
+    assert batch.field_counts['timestamp'] == 2
+
+
+def test_report_reads_batch_features():
+    """SAR report statistics match the transactions they were built from"""
+    report = sar_generator.generate_sar_report({'scenario': 'terrorist_financing'}, TRANSACTIONS)
+    details = report['details']
+
+    assert details['total_amount'] == 32500.0
+    assert details['median_amount'] == 9500.0
+    assert details['critical_transactions'] == 1
+    assert details['accounts_involved'] == ['A', 'B', 'C']
+    # A->B->A is not a loop here: B2 is undated and more than doubles the amount
+    assert not any(p.startswith('Circular') for p in report['evidence']['suspicious_patterns'])
+    assert report['evidence']['circular_flows'] == []
+
+    empty = sar_generator.generate_sar_report({'scenario': 'terrorist_financing'}, [])
+    assert empty['details']['time_period'] == 'Unknown'
+
+
+if __name__ == "__main__":
+    test_batch_columns()
+    test_report_reads_batch_features()
+    print("✅ TransactionBatch tests passed")
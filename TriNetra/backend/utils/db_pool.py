@@ -0,0 +1,199 @@
+import sqlite3
+import threading
+import queue
+import time
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no pooled connection becomes available in time"""
+
+
+class ConnectionPool:
+    """Bounded pool of long-lived SQLite connections tuned for concurrent reads"""
+
+    def __init__(self, db_path, max_connections=8, checkout_timeout=10.0,
+                 busy_timeout=30.0, cache_size_kb=65536, mmap_size=268435456,
+                 cached_statements=256):
+        self.db_path = db_path
+        self.max_connections = max_connections
+        self.checkout_timeout = checkout_timeout
+        self.busy_timeout = busy_timeout
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size = mmap_size
+        self.cached_statements = cached_statements
+
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open_connections = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+            'connections_created': 0,
+            'peak_in_use': 0
+        }
+        self._in_use = 0
+
+    def _create_connection(self):
+        """Open and tune a new SQLite connection"""
+        # Connections migrate between request threads, but only one thread
+        # holds a checked-out connection at a time
+        conn = sqlite3.connect(
+            self.db_path,
+            timeout=self.busy_timeout,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kb)}')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.execute('PRAGMA foreign_keys=ON')
+        return conn
+
+    def _acquire(self):
+        """Take an idle connection, open a new one, or wait for a release"""
+        if self._closed:
+            raise PoolTimeoutError('Connection pool is closed')
+
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            conn = None
+
+        if conn is None:
+            with self._lock:
+                can_open = self._open_connections < self.max_connections
+                if can_open:
+                    self._open_connections += 1
+            if can_open:
+                try:
+                    conn = self._create_connection()
+                except Exception:
+                    with self._lock:
+                        self._open_connections -= 1
+                    raise
+                with self._lock:
+                    self._stats['connections_created'] += 1
+            else:
+                started = time.perf_counter()
+                with self._lock:
+                    self._stats['waits'] += 1
+                try:
+                    conn = self._idle.get(timeout=self.checkout_timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PoolTimeoutError(
+                        f'No database connection available after {self.checkout_timeout}s '
+                        f'(pool size {self.max_connections})'
+                    )
+                finally:
+                    with self._lock:
+                        self._stats['wait_time_total'] += time.perf_counter() - started
+
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._in_use += 1
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], self._in_use)
+
+        return conn
+
+    def _release(self, conn):
+        """Return a connection to the idle set"""
+        with self._lock:
+            self._in_use -= 1
+        if self._closed:
+            self._discard(conn)
+        else:
+            self._idle.put(conn)
+
+    def _discard(self, conn):
+        """Close a connection and forget about it"""
+        try:
+            conn.close()
+        finally:
+            with self._lock:
+                self._open_connections -= 1
+
+    @contextmanager
+    def connection(self):
+        """Check out a connection; commits on success and rolls back on error"""
+        conn = self._acquire()
+        try:
+            yield conn
+            if conn.in_transaction:
+                conn.commit()
+        except Exception:
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                # Connection is unusable, do not hand it out again
+                with self._lock:
+                    self._in_use -= 1
+                self._discard(conn)
+                raise
+            self._release(conn)
+            raise
+        else:
+            self._release(conn)
+
+    def stats(self):
+        """Snapshot of pool usage counters for sizing"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['open_connections'] = self._open_connections
+            snapshot['in_use'] = self._in_use
+        snapshot['idle'] = self._idle.qsize()
+        snapshot['max_connections'] = self.max_connections
+        snapshot['avg_wait_ms'] = round(
+            snapshot['wait_time_total'] / snapshot['waits'] * 1000, 3
+        ) if snapshot['waits'] else 0.0
+        snapshot['wait_time_total'] = round(snapshot['wait_time_total'], 6)
+        return snapshot
+
+    def close_all(self):
+        """Close every idle connection and stop handing out new ones"""
+        self._closed = True
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(conn)
+
+
+# Process-wide pool shared by all blueprints
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def init_pool(db_path, **kwargs):
+    """Create (or replace) the shared connection pool"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close_all()
+        _pool = ConnectionPool(db_path, **kwargs)
+    return _pool
+
+
+def get_pool():
+    """Return the shared pool, creating it from Config on first use"""
+    global _pool
+    if _pool is None:
+        from config import Config
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    Config.DATABASE_PATH,
+                    max_connections=Config.DB_POOL_SIZE,
+                    checkout_timeout=Config.DB_POOL_TIMEOUT,
+                    cache_size_kb=Config.DB_CACHE_SIZE_KB,
+                    mmap_size=Config.DB_MMAP_SIZE
+                )
+    return _pool
@@ -0,0 +1,274 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+
+class QueueFullError(Exception):
+    """Raised when the job queue already holds max_pending unfinished jobs"""
+
+
+class Job:
+    """One submitted unit of work and its outcome"""
+
+    __slots__ = ('id', 'kind', 'state', 'submitted_at', 'finished_at', 'expires_at',
+                 'result', 'error', 'future', 'cancel_requested')
+
+    def __init__(self, kind):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.state = 'queued'
+        self.submitted_at = time.time()
+        self.finished_at = None
+        self.expires_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+        self.cancel_requested = False
+
+    @property
+    def status(self):
+        if self.state == 'queued' and self.future is not None and self.future.running():
+            return 'running'
+        return self.state
+
+    @property
+    def done(self):
+        return self.state in ('completed', 'failed', 'cancelled')
+
+    def to_dict(self, include_result=True):
+        data = {
+            'job_id': self.id,
+            'kind': self.kind,
+            'status': self.status,
+            'submitted_at': self.submitted_at,
+            'finished_at': self.finished_at,
+            'cancel_requested': self.cancel_requested
+        }
+        if self.finished_at is not None:
+            data['duration_seconds'] = round(self.finished_at - self.submitted_at, 3)
+        if self.error is not None:
+            data['error'] = self.error
+        if include_result and self.state == 'completed':
+            data['result'] = self.result
+        return data
+
+
+class JobQueue:
+    """Bounded background job runner on a process pool
+
+    CPU-bound work runs in worker processes so it never holds the web
+    process's GIL. At most max_pending jobs and fan-out tasks may be
+    queued or running; finished jobs are kept for result_ttl seconds. Queued jobs can be
+    cancelled outright; a job already running in a worker finishes, but
+    its result is discarded.
+    """
+
+    def __init__(self, max_workers=2, max_pending=32, result_ttl=600.0, start_method='spawn'):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self.start_method = start_method
+        self._jobs = {}
+        self._batch_pending = 0
+        self._lock = threading.Lock()
+        # Notified whenever a job or fan-out task finishes and frees a slot
+        self._slot_free = threading.Condition(self._lock)
+        self._executor = None
+        self._stats = {
+            'submitted': 0,
+            'completed': 0,
+            'failed': 0,
+            'cancelled': 0,
+            'rejected': 0,
+            'expired': 0,
+            'batch_tasks': 0
+        }
+
+    def _get_executor(self):
+        # Workers are started on first submit, not at app start
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                mp_context=multiprocessing.get_context(self.start_method)
+            )
+        return self._executor
+
+    def _purge(self):
+        """Drop finished jobs whose results have outlived the TTL (lock held)"""
+        now = time.time()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.expires_at is not None and job.expires_at <= now]
+        for job_id in expired:
+            del self._jobs[job_id]
+        self._stats['expired'] += len(expired)
+
+    def _pending(self):
+        return self._batch_pending + sum(1 for job in self._jobs.values() if not job.done)
+
+    def _finish(self, job, state, result=None, error=None):
+        """Record a final state (lock held)"""
+        job.state = state
+        job.result = result
+        job.error = error
+        job.finished_at = time.time()
+        job.expires_at = job.finished_at + self.result_ttl
+        self._stats[state] += 1
+        self._slot_free.notify_all()
+
+    def _on_done(self, job, future):
+        with self._lock:
+            if job.done:
+                return
+            if future.cancelled() or job.cancel_requested:
+                self._finish(job, 'cancelled')
+                return
+            error = future.exception()
+            if error is not None:
+                self._finish(job, 'failed', error=f'{type(error).__name__}: {error}')
+            else:
+                self._finish(job, 'completed', result=future.result())
+
+    def _submit(self, fn, args):
+        """Hand fn(*args) to the executor (lock held)"""
+        try:
+            return self._get_executor().submit(fn, *args)
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for new work
+            self._executor = None
+            return self._get_executor().submit(fn, *args)
+
+    def submit(self, fn, *args, kind='job'):
+        """Queue fn(*args) on a worker process and return its Job"""
+        with self._lock:
+            self._purge()
+            if self._pending() >= self.max_pending:
+                self._stats['rejected'] += 1
+                raise QueueFullError(f'Job queue is full ({self.max_pending} pending)')
+            job = Job(kind)
+            future = self._submit(fn, args)
+            job.future = future
+            self._jobs[job.id] = job
+            self._stats['submitted'] += 1
+        future.add_done_callback(lambda f: self._on_done(job, f))
+        return job
+
+    def _batch_done(self, future):
+        with self._lock:
+            self._batch_pending -= 1
+            self._slot_free.notify_all()
+
+    def imap_unordered(self, fn, arg_tuples, window=None):
+        """Run fn(*args) for each tuple on the workers, yielding (index, future) as each finishes
+
+        For one caller's fan-out (no Job records are kept). Tasks count
+        against max_pending while queued or running; at most window of
+        them (default max_workers) are submitted at a time, and a full
+        queue makes the fan-out wait for a free slot rather than flood
+        the executor. Closing the generator early cancels tasks that have
+        not started.
+        """
+        window = window or self.max_workers
+        tasks = enumerate(arg_tuples)
+        in_flight = {}
+        exhausted = False
+        try:
+            while True:
+                submitted = []
+                with self._lock:
+                    while not exhausted and len(in_flight) < window:
+                        if self._pending() >= self.max_pending:
+                            if in_flight:
+                                break
+                            self._slot_free.wait()
+                            continue
+                        task = next(tasks, None)
+                        if task is None:
+                            exhausted = True
+                            break
+                        index, args = task
+                        future = self._submit(fn, args)
+                        in_flight[future] = index
+                        submitted.append(future)
+                        self._batch_pending += 1
+                        self._stats['batch_tasks'] += 1
+                # Outside the lock: a callback on an already finished future runs synchronously
+                for future in submitted:
+                    future.add_done_callback(self._batch_done)
+                if not in_flight:
+                    return
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield in_flight.pop(future), future
+        finally:
+            for future in in_flight:
+                future.cancel()
+
+    def get(self, job_id):
+        """Return a live or unexpired job, or None"""
+        with self._lock:
+            self._purge()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id):
+        """Cancel a job; returns the job, or None if it is unknown"""
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return job
+            job.cancel_requested = True
+        # Outside the lock: a successful cancel runs _on_done synchronously
+        job.future.cancel()
+        return job
+
+    def stats(self):
+        """Snapshot of queue depth and job counters"""
+        with self._lock:
+            self._purge()
+            snapshot = dict(self._stats)
+            snapshot['pending'] = self._pending()
+            snapshot['stored'] = len(self._jobs)
+        snapshot['max_pending'] = self.max_pending
+        snapshot['max_workers'] = self.max_workers
+        snapshot['result_ttl_seconds'] = self.result_ttl
+        return snapshot
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes, cancelling jobs that have not started"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+
+# Process-wide queue shared by all blueprints
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def init_job_queue(**kwargs):
+    """Create (or replace) the shared job queue"""
+    global _queue
+    with _queue_lock:
+        if _queue is not None:
+            _queue.shutdown(wait=False)
+        _queue = JobQueue(**kwargs)
+    return _queue
+
+
+def get_job_queue():
+    """Return the shared job queue, creating it from Config on first use"""
+    global _queue
+    if _queue is None:
+        from config import Config
+        with _queue_lock:
+            if _queue is None:
+                _queue = JobQueue(
+                    max_workers=Config.JOB_WORKERS,
+                    max_pending=Config.JOB_MAX_PENDING,
+                    result_ttl=Config.JOB_RESULT_TTL
+                )
+    return _queue
@@ -0,0 +1,193 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import current_app, request
+
+from utils.db_pool import get_pool
+from data.migrations import get_data_version
+
+
+class CachedResponse:
+    """Serialized response body plus the data version it was built from"""
+
+    __slots__ = ('body', 'mimetype', 'etag', 'data_version', 'expires_at', 'size')
+
+    def __init__(self, body, mimetype, etag, data_version, expires_at):
+        self.body = body
+        self.mimetype = mimetype
+        self.etag = etag
+        self.data_version = data_version
+        self.expires_at = expires_at
+        self.size = len(body)
+
+
+class ResponseCache:
+    """In-process LRU of response bodies bounded by total bytes and a TTL
+
+    Entries remember the data version they were built against; a lookup under
+    a newer version drops the stale entry instead of serving it.
+    """
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=60.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self._stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0,
+            'expirations': 0,
+            'invalidations': 0,
+            'not_modified': 0,
+            'uncacheable': 0
+        }
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+
+    def get(self, key, data_version):
+        """Return a fresh entry for key at data_version, or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            if entry.data_version != data_version:
+                self._remove(key)
+                self._stats['invalidations'] += 1
+                self._stats['misses'] += 1
+                return None
+            if entry.expires_at <= time.monotonic():
+                self._remove(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry
+
+    def put(self, key, body, mimetype, data_version):
+        """Store a response body, evicting least recently used entries to fit"""
+        entry = CachedResponse(
+            body, mimetype, make_etag(body), data_version, time.monotonic() + self.ttl
+        )
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if entry.size > self.max_bytes:
+                self._stats['uncacheable'] += 1
+                return entry
+            while self._bytes + entry.size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= evicted.size
+                self._stats['evictions'] += 1
+            self._entries[key] = entry
+            self._bytes += entry.size
+        return entry
+
+    def record_not_modified(self):
+        with self._lock:
+            self._stats['not_modified'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self):
+        """Snapshot of cache counters and occupancy"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['entries'] = len(self._entries)
+            snapshot['bytes'] = self._bytes
+        snapshot['max_bytes'] = self.max_bytes
+        snapshot['ttl_seconds'] = self.ttl
+        lookups = snapshot['hits'] + snapshot['misses']
+        snapshot['hit_rate'] = round(snapshot['hits'] / lookups, 4) if lookups else 0.0
+        return snapshot
+
+
+def make_etag(body):
+    """Strong validator derived from the exact response bytes"""
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+def request_cache_key():
+    """Endpoint plus normalized query args and JSON body"""
+    args = sorted((k, v) for k in request.args for v in request.args.getlist(k))
+    body = request.get_json(silent=True) if request.method == 'POST' else None
+    return (
+        request.method,
+        request.path,
+        json.dumps(args),
+        json.dumps(body, sort_keys=True, default=str)
+    )
+
+
+# Process-wide cache shared by all blueprints
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def init_response_cache(**kwargs):
+    """Create (or replace) the shared response cache"""
+    global _cache
+    with _cache_lock:
+        _cache = ResponseCache(**kwargs)
+    return _cache
+
+
+def get_response_cache():
+    """Return the shared cache, creating it from Config on first use"""
+    global _cache
+    if _cache is None:
+        from config import Config
+        with _cache_lock:
+            if _cache is None:
+                _cache = ResponseCache(
+                    max_bytes=Config.RESPONSE_CACHE_MAX_BYTES,
+                    ttl=Config.RESPONSE_CACHE_TTL
+                )
+    return _cache
+
+
+def cached_response(view):
+    """Serve a read endpoint from the response cache with ETag revalidation
+
+    Only 200 responses are cached. GET requests carrying a matching
+    If-None-Match get 304 Not Modified.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        cache = get_response_cache()
+        key = request_cache_key()
+        with get_pool().connection() as conn:
+            data_version = get_data_version(conn)
+
+        entry = cache.get(key, data_version)
+        status = 'HIT'
+        if entry is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            entry = cache.put(key, response.get_data(), response.mimetype, data_version)
+            status = 'MISS'
+
+        response = current_app.response_class(entry.body, mimetype=entry.mimetype)
+        response.set_etag(entry.etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Cache'] = status
+        if request.method in ('GET', 'HEAD') and entry.etag in request.if_none_match:
+            cache.record_not_modified()
+            response.status_code = 304
+            response.set_data(b'')
+        return response
+
+    return wrapper
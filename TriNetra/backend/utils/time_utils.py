@@ -0,0 +1,31 @@
+import calendar
+from datetime import datetime, timedelta
+
+# Epoch convention shared with the ts_epoch column: naive ISO timestamps are
+# read as UTC wall-clock time (same as SQLite's strftime('%s', ...)), aware
+# ones are converted to UTC first.
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_epoch(value):
+    """Convert an ISO string or datetime to integer epoch seconds (None if unparseable)"""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is not None:
+        return int(value.timestamp())
+    return calendar.timegm(value.timetuple())
+
+
+def from_epoch(epoch):
+    """Convert epoch seconds back to a naive datetime"""
+    return _EPOCH + timedelta(seconds=int(epoch))
@@ -471,7 +471,24 @@ Generated by TriNetra Auto-SAR System (Demo Mode)
 
     // CHRONOS API calls
     async getTimelineData(scenario = 'all', timeQuantum = '1m') {
-        return this.request(`/chronos/timeline?scenario=${scenario}&time_quantum=${timeQuantum}`);
+        // The timeline comes back in keyset pages; follow next_cursor until the
+        // whole range is loaded (range totals only come with the first page)
+        const endpoint = `/chronos/timeline?scenario=${scenario}&time_quantum=${timeQuantum}`;
+        const response = await this.request(endpoint);
+        let page = response;
+        while (page.status === 'success' && page.has_more && page.next_cursor) {
+            page = await this.request(`${endpoint}&cursor=${encodeURIComponent(page.next_cursor)}`);
+            if (page.status !== 'success') {
+                throw new Error(page.message || 'Failed to load timeline page');
+            }
+            response.data.push(...page.data);
+        }
+        if (response.status === 'success' && response.data) {
+            response.returned = response.data.length;
+            response.has_more = false;
+            response.next_cursor = null;
+        }
+        return response;
     }
 
     async getPatternAnalysis() {